@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+doc2pdf 벤치마크: LibreOffice 대신 같은 줄 프로토콜을 쓰는 대역 변환기로 풀 동작과 처리량 확인
+
+사용:
+    python bench_doc2pdf.py --docs 400 --workers 4 --startup 1.5 --per_doc 0.05 --hang 0.01
+
+- 대역 변환기(serve): 시작 시 --startup초(soffice 기동 비용), 문서마다 --per_doc초 소요 후 작은 PDF 작성,
+  --hang 확률로 응답 없이 멈춤 → 풀이 타임아웃 후 워커를 재시작하는지 확인
+- 비교: 문서마다 변환기를 새로 띄우는 방식(기존 soffice 호출) vs 상주 워커 풀
+  --crash 확률로 "restart"를 응답하고 종료(soffice/UNO 브리지 상실) → 풀이 워커를 새로 띄워 같은 문서를 재시도하는지 확인
+  --start_fail 확률로 "ready" 없이 종료(재시작 실패) → 꺼낸 문서가 실패로 집계되고 그 워커만 멈추는지 확인
+- 확인: 출력이 하위 폴더 구조를 유지하는지, 재실행 시 모두 건너뛰는지
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from doc2pdf import convert_folder, iter_docs, pdf_path_for
+
+PDF_STUB = b"%PDF-1.4\n1 0 obj<<>>endobj\ntrailer<<>>\n%%EOF\n"
+
+
+def serve(args):
+    Path(args.profile).mkdir(parents=True, exist_ok=True)
+    time.sleep(args.startup)
+    rng = random.Random(os.getpid())
+    if rng.random() < args.start_fail:
+        print("simulated start failure", flush=True)
+        return
+    print("ready", flush=True)
+    for line in sys.stdin:
+        src, _, dst = line.rstrip("\n").partition("\t")
+        if rng.random() < args.hang:
+            time.sleep(3600)
+        if rng.random() < args.crash:
+            print("restart DisposedException: simulated bridge loss", flush=True)
+            return
+        time.sleep(args.per_doc)
+        with open(dst + ".part", "wb") as f:
+            f.write(PDF_STUB)
+        os.replace(dst + ".part", dst)
+        print("ok", flush=True)
+
+
+def make_docs(root: Path, n: int, rng: random.Random):
+    for i in range(n):
+        sub = root / f"dept{i % 5}" / f"y{2020 + i % 3}"
+        sub.mkdir(parents=True, exist_ok=True)
+        (sub / f"doc_{i:05d}{'.docx' if i % 4 else '.doc'}").write_bytes(rng.randbytes(256))
+    (root / "~$lockfile.docx").write_bytes(b"")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd")
+    p_serve = sub.add_parser("serve")
+    p_serve.add_argument("--profile", type=str, required=True)
+    for p in (parser, p_serve):
+        p.add_argument("--startup", type=float, default=1.5)
+        p.add_argument("--per_doc", type=float, default=0.05)
+        p.add_argument("--hang", type=float, default=0.01)
+        p.add_argument("--crash", type=float, default=0.01)
+        p.add_argument("--start_fail", type=float, default=0.0)
+    parser.add_argument("--docs", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    parser.add_argument("--baseline_docs", type=int, default=20, help="문서마다 새로 띄우는 방식으로 잴 문서 수")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.cmd == "serve":
+        serve(args)
+        return
+
+    stand_in = [sys.executable, str(Path(__file__).resolve()), "serve",
+                "--startup", str(args.startup), "--per_doc", str(args.per_doc)]
+    with tempfile.TemporaryDirectory() as tmp:
+        src_dir, out_dir = Path(tmp) / "word", Path(tmp) / "pdf"
+        make_docs(src_dir, args.docs, random.Random(args.seed))
+
+        # 기존 방식: 문서마다 변환기를 새로 기동
+        base_src, base_dir = Path(tmp) / "word_base", Path(tmp) / "pdf_base"
+        make_docs(base_src, args.baseline_docs, random.Random(args.seed))
+        t0 = time.perf_counter()
+        for src in iter_docs(base_src):
+            dst = pdf_path_for(src, base_src, base_dir)
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            p = subprocess.Popen(stand_in + ["--hang", "0", "--crash", "0", "--start_fail", "0", "--profile", str(Path(tmp) / "p_base")],
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            p.communicate(f"{src}\t{dst}\n")
+        per_launch = 60.0 * args.baseline_docs / (time.perf_counter() - t0)
+        print(f"[per-doc launch] {args.baseline_docs} docs  {per_launch:.1f} docs/min")
+
+        r = convert_folder(src_dir, out_dir, workers=args.workers, timeout=args.timeout,
+                           worker_cmd=stand_in + ["--hang", str(args.hang), "--crash", str(args.crash),
+                                              "--start_fail", str(args.start_fail)])
+        print(f"[pool x{args.workers}] converted {r['converted']}, failed {r['failed']} (timeouts), "
+              f"restarts {r['restarts']}  {r['docs_per_min']:.1f} docs/min  (x{r['docs_per_min'] / per_launch:.1f})")
+
+        docs = list(iter_docs(src_dir))
+        ok = [d for d in docs if pdf_path_for(d, src_dir, out_dir).exists()]
+        assert len(ok) == r["converted"], (len(ok), r["converted"])
+        assert r["converted"] + r["failed"] == len(docs), ("문서 누락", r["converted"], r["failed"], len(docs))
+        assert not list(out_dir.rglob("*.part")), "leftover .part files"
+        print(f"[check] {len(ok)}/{len(docs)} PDFs in mirrored folders, no partial files")
+
+        r2 = convert_folder(src_dir, out_dir, workers=args.workers, timeout=args.timeout,
+                            worker_cmd=stand_in + ["--hang", "0", "--crash", "0"])
+        assert r2["skipped"] == len(ok) and r2["converted"] == r["failed"], r2
+        print(f"[rerun] skipped {r2['skipped']}, converted {r2['converted']} (이전 실패분)")
+
+
+if __name__ == "__main__":
+    main()
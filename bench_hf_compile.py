@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+HF_COMPILE 벤치마크: 정적 KV 캐시 + 컴파일된 decode vs 기본 동적 캐시 (같은 이미지, 같은 Step1 프롬프트)
+
+사용:
+    HF_COMPILE=true python bench_hf_compile.py --image_dir ./data/images --limit 20 --project 10000
+
+- 모델 로드 시간과 버킷별 warm-up(컴파일) 시간을 따로 기록
+- 이미지마다 두 모드를 번갈아 실행(순서 교대)해 decode tok/s, decode/호출 시간, 출력 문자열 일치 여부 비교
+- 호출당 절감 시간으로 손익분기 이미지 수(= warm-up / 절감)와 --project장 폴더 실행 시 예상 총 시간 출력
+"""
+import argparse
+import time
+from pathlib import Path
+
+import vlm_client
+from config import HF_COMPILE, HF_MAX_NEW_TOKENS
+
+SUPPORTED_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+
+
+def run(path: str, compiled: bool, prompts) -> dict:
+    vlm_client._HF_COMPILE_READY = compiled
+    t0 = time.perf_counter()
+    raw = vlm_client._call_hf(path, prompts["system"], prompts["user"])
+    st = raw["hf_stats"]
+    return {"sec": time.perf_counter() - t0, "decode_sec": st["decode_sec"], "tok_s": st["decode_tok_s"],
+            "new_tokens": st["new_tokens"], "kv_cache": st["kv_cache"], "text": raw["message"]["content"]}
+
+
+def _mean(vals):
+    vals = [v for v in vals if v is not None]
+    return sum(vals) / len(vals) if vals else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image_dir", type=str, required=True)
+    parser.add_argument("--limit", type=int, default=20, help="Max images (0 = all)")
+    parser.add_argument("--project", type=int, default=10000, help="예상 시간을 계산할 폴더 이미지 수")
+    args = parser.parse_args()
+    if not HF_COMPILE:
+        print("HF_COMPILE=true로 실행하세요 (로드 시 warm-up 시간을 재기 위해).")
+        return
+
+    images = sorted(str(p) for p in Path(args.image_dir).iterdir() if p.suffix.lower() in SUPPORTED_EXTS)
+    images = images[:args.limit] if args.limit > 0 else images
+    if not images:
+        print(f"이미지가 없습니다: {args.image_dir}")
+        return
+
+    t0 = time.perf_counter()
+    vlm_client._ensure_hf_loaded()
+    load_sec = time.perf_counter() - t0
+    if not vlm_client._HF_COMPILE_READY:
+        return
+    warmup = vlm_client.HF_COMPILE_STATS.get("warmup_sec", 0.0)
+    prompts = vlm_client.prompt_set()
+    print(f"[HF compile bench] {len(images)} image(s), HF_MAX_NEW_TOKENS={HF_MAX_NEW_TOKENS}  "
+          f"load {load_sec - warmup:.1f}s + warm-up {warmup:.1f}s {vlm_client.HF_COMPILE_STATS['buckets']}")
+    print(f"   {'image':<28}{'cache':>13}{'tok':>6}{'dyn tok/s':>11}{'cmp tok/s':>11}{'dyn s':>8}{'cmp s':>8}{'same':>6}")
+    rows = []
+    for i, path in enumerate(images):
+        order = (False, True) if i % 2 == 0 else (True, False)
+        res = {mode: run(path, mode, prompts) for mode in order}
+        dyn, cmp_ = res[False], res[True]
+        rows.append((dyn, cmp_))
+        print(f"   {Path(path).name[:27]:<28}{cmp_['kv_cache']:>13}{cmp_['new_tokens']:>6}"
+              f"{(dyn['tok_s'] or float('nan')):>11.2f}{(cmp_['tok_s'] or float('nan')):>11.2f}"
+              f"{dyn['sec']:>8.2f}{cmp_['sec']:>8.2f}{'y' if dyn['text'] == cmp_['text'] else 'n':>6}")
+    vlm_client._HF_COMPILE_READY = True
+
+    dyn_sec, cmp_sec = _mean([d["sec"] for d, _ in rows]), _mean([c["sec"] for _, c in rows])
+    saving = dyn_sec - cmp_sec
+    same = sum(d["text"] == c["text"] for d, c in rows)
+    print(f"\n[summary] decode tok/s dynamic {_mean([d['tok_s'] for d, _ in rows]):.2f} → "
+          f"compiled {_mean([c['tok_s'] for _, c in rows]):.2f}, decode s {_mean([d['decode_sec'] for d, _ in rows]):.2f} → "
+          f"{_mean([c['decode_sec'] for _, c in rows]):.2f}")
+    print(f"   per image {dyn_sec:.2f}s → {cmp_sec:.2f}s (saving {saving:+.2f}s), identical outputs {same}/{len(rows)}")
+    if saving > 0:
+        print(f"   break-even after {warmup / saving:.0f} image(s) (warm-up {warmup:.1f}s)")
+    else:
+        print("   compiled mode did not save time per image on this machine")
+    n = args.project
+    print(f"   projected {n} images: dynamic {n * dyn_sec / 60:.1f} min, compiled {(warmup + n * cmp_sec) / 60:.1f} min "
+          f"(incl. warm-up)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+keyword_index 벤치마크: 합성 Step1 JSON N개 → 색인 생성 / 증분 갱신 / top-k 조회 지연
+
+사용:
+    python bench_keyword_index.py --charts 100000 --queries 200
+
+- 임시 폴더에 key_phrases만 가진 JSON을 만들고 전체 색인 → 일부 추가/수정/삭제 후 증분 갱신
+- 용어 분포: 기본은 Zipf(흔한 도메인 용어 + 드문 합성어), --dense는 모든 용어가 흔한 최악 조건
+- 전체 색인 직후: 무작위 질의마다 전체 문서를 직접 훑는 BM25 계산 결과와 top-k id가 같은지 확인
+- 증분 갱신 후: 결과에 삭제/수정 전 문서가 섞이지 않는지 확인
+"""
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, List
+
+from keyword_index import BM25_B, BM25_K1, KeywordIndex, doc_terms, normalize_phrase, tokenize, update_index
+
+DOMAIN = [
+    "염기도", "점도", "반비례", "온도", "증가", "감소", "슬래그", "용융", "결정화", "상평형", "유동성", "탈황",
+    "CaO", "SiO2", "Al2O3", "MgO", "FeO", "CaO/SiO2 비율", "XRD 패턴", "열팽창 계수", "압축 강도", "수화 반응",
+    "시간에 따른 변화", "Arrhenius plot", "활성화 에너지", "1500°C", "조성 변화", "점도 모델", "액상선 온도",
+]
+SYLLABLES = "가나다라마바사아자차카타파하강녹도류문변상성연열용인자전조질탄평합화"
+
+
+def make_vocab(rng: random.Random, size: int) -> List[str]:
+    # 도메인 용어 + 합성 복합어 (실제 key_phrases처럼 소수의 흔한 용어와 다수의 드문 용어)
+    vocab = list(DOMAIN)
+    while len(vocab) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        vocab.append(word if rng.random() < 0.7 else f"{word} {rng.choice(DOMAIN)}")
+    return vocab
+
+
+class PhraseSampler:
+    def __init__(self, rng: random.Random, vocab_size: int, dense: bool):
+        self.rng = rng
+        self.vocab = make_vocab(rng, len(DOMAIN) if dense else vocab_size)
+        # dense: 도메인 용어만(모든 용어가 흔함, 최악 조건) / 기본: Zipf 분포
+        weights = [1.0] * len(self.vocab) if dense else [1.0 / (r + 1) for r in range(len(self.vocab))]
+        self.cum_weights = list(accumulate(weights))
+
+    def phrase(self) -> str:
+        return " ".join(self.rng.choices(self.vocab, cum_weights=self.cum_weights, k=self.rng.randint(1, 3)))
+
+
+def make_phrases(sampler: PhraseSampler, n: int) -> List[str]:
+    return [sampler.phrase() for _ in range(n)]
+
+
+def write_jsons(json_dir: Path, start: int, count: int, sampler: PhraseSampler):
+    for i in range(start, start + count):
+        data = {"is_chart": True, "title": {"text": f"chart {i}"},
+                "key_phrases": make_phrases(sampler, sampler.rng.randint(10, 15))}
+        (json_dir / f"chart_{i:07d}.json").write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def load_docs(json_dir: Path, stems_by_id: Dict[str, int]) -> Dict[int, tuple]:
+    docs = {}
+    for p in json_dir.glob("*.json"):
+        phrases = [normalize_phrase(x) for x in json.loads(p.read_text(encoding="utf-8"))["key_phrases"]]
+        docs[stems_by_id[p.stem]] = doc_terms(phrases)
+    return docs
+
+
+def brute_force(docs: Dict[int, tuple], query_terms: List[str], k: int) -> List[int]:
+    n = len(docs)
+    avg_len = sum(length for _, length in docs.values()) / n
+    scores = {}
+    for t in query_terms:
+        holders = [i for i, (terms, _) in docs.items() if t in terms]
+        if not holders:
+            continue
+        idf = math.log(1.0 + (n - len(holders) + 0.5) / (len(holders) + 0.5))
+        for i in holders:
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * docs[i][1] / avg_len)
+            scores[i] = scores.get(i, 0.0) + idf * (BM25_K1 + 1.0) / (1.0 + norm)
+    return [i for i, _ in sorted(scores.items(), key=lambda kv: (-round(kv[1], 6), kv[0]))[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--charts", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--check", type=int, default=5, help="brute-force로 검증할 질의 수 (작은 --charts 권장)")
+    parser.add_argument("--vocab", type=int, default=20000, help="합성 용어 수 (Zipf 분포)")
+    parser.add_argument("--dense", action="store_true", help="흔한 도메인 용어만 사용 (최악 조건)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    sampler = PhraseSampler(rng, args.vocab, args.dense)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir, index_dir = Path(tmp) / "json", Path(tmp) / "index"
+        json_dir.mkdir()
+        t0 = time.perf_counter()
+        write_jsons(json_dir, 0, args.charts, sampler)
+        print(f"[gen] {args.charts} JSON  {time.perf_counter() - t0:.1f}s")
+
+        r = update_index(json_dir, index_dir)
+        size = sum(f.stat().st_size for f in index_dir.rglob("*") if f.is_file())
+        print(f"[build] live {r['live']}  {r['sec']:.2f}s  index {size / 2**20:.1f}MB")
+        queries = [sampler.phrase() for _ in range(args.queries)]
+
+        if args.check:
+            # 삭제 문서가 없는 상태에서는 df/idf가 정확하므로 brute-force와 순위까지 같아야 함
+            state = json.loads((index_dir / "state.json").read_text(encoding="utf-8"))
+            docs = load_docs(json_dir, {stem: v[0] for stem, v in state.items()})
+            index = KeywordIndex(index_dir)
+            for q in queries[:args.check]:
+                got = [r["id"] for r in index.search(q, args.k)]
+                want = brute_force(docs, sorted(set(tokenize(q))), args.k)
+                assert got == want, (q, got, want)
+            print(f"[check] {args.check} queries match brute-force top-{args.k}")
+
+        # 증분: 1% 추가, 0.5% 수정, 0.5% 삭제
+        n_new = max(1, args.charts // 100)
+        write_jsons(json_dir, args.charts, n_new, sampler)
+        for i in rng.sample(range(args.charts), max(1, args.charts // 200)):
+            write_jsons(json_dir, i, 1, sampler)
+            st = (json_dir / f"chart_{i:07d}.json").stat()
+            os.utime(json_dir / f"chart_{i:07d}.json", ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+        for i in rng.sample(range(args.charts), max(1, args.charts // 200)):
+            path = json_dir / f"chart_{i:07d}.json"
+            if path.exists():
+                path.unlink()
+        r = update_index(json_dir, index_dir)
+        print(f"[update] +{r['added']}  deleted {r['deleted']}  live {r['live']}  segments {r['segments']}  {r['sec']:.2f}s")
+        r = update_index(json_dir, index_dir)
+        print(f"[no-op update] +{r['added']}  {r['sec']:.2f}s")
+
+        t0 = time.perf_counter()
+        index = KeywordIndex(index_dir)
+        print(f"[open] {1000 * (time.perf_counter() - t0):.1f}ms")
+
+        lat = []
+        for q in queries:
+            t0 = time.perf_counter()
+            index.search(q, args.k)
+            lat.append(1000 * (time.perf_counter() - t0))
+        lat.sort()
+        print(f"[query] {len(lat)} queries  p50 {lat[len(lat) // 2]:.1f}ms  p95 {lat[int(0.95 * (len(lat) - 1))]:.1f}ms"
+              f"  max {lat[-1]:.1f}ms")
+
+        if args.check:
+            # 증분 갱신 후: 삭제/수정 전 문서가 결과에 섞이지 않는지 (df는 삭제 문서 포함 근사라 순위 비교는 생략)
+            for q in queries[:args.check]:
+                for r in index.search(q, args.k):
+                    path = Path(r["json_path"])
+                    assert path.exists(), (q, r["stem"])
+                    current = [normalize_phrase(x) for x in json.loads(path.read_text(encoding="utf-8"))["key_phrases"]]
+                    assert current == r["key_phrases"], (q, r["stem"])
+            print(f"[check] {args.check} queries return only live, up-to-date charts after update")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+onnx_vision 일치도 + 지연 벤치마크: 같은 pixel_values에 대해 PyTorch 비전 타워 vs ONNX Runtime 경로
+
+사용:
+    HF_DEVICE_MAP=cpu python bench_onnx_vision.py --image_dir ./data/images --limit 10 --repeat 3
+    HF_DEVICE_MAP=cpu python bench_onnx_vision.py --sizes 448,1024,2048 --generate
+
+- 이미지가 없으면 --sizes 긴 변의 합성 차트 이미지를 사용
+- 일치도: 이미지 임베딩 최대 절대 오차(max_abs), 토큰별 코사인 유사도 최솟값(min_cos) → --min_cos 미만이면 실패
+- 지연: 이미지별 repeat회 중 최솟값(첫 호출의 export/세션 준비 제외), 긴 변 구간별 평균과 배속
+- --generate: 두 경로로 Step1 프롬프트 generate() 결과 문자열이 같은지 확인
+"""
+import argparse
+import time
+from pathlib import Path
+
+import torch
+from PIL import Image, ImageDraw
+
+import vlm_client
+from config import HF_IMAGE_MAX_SIDE, HF_VISION_ONNX_DIR, HF_VISION_ONNX_THREADS
+from onnx_vision import attach_onnx_vision, detach_onnx_vision, find_visual
+
+SUPPORTED_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+
+
+def synthetic_chart(long_side: int, seed: int) -> Image.Image:
+    g = torch.Generator().manual_seed(seed)
+    w, h = long_side, long_side * 3 // 4
+    img = Image.new("RGB", (w, h), "white")
+    draw = ImageDraw.Draw(img)
+    draw.line([(w // 10, h // 10), (w // 10, h * 9 // 10), (w * 9 // 10, h * 9 // 10)], fill="black", width=max(1, w // 400))
+    for series in range(3):
+        ys = torch.cumsum(torch.randn(20, generator=g), 0)
+        ys = (ys - ys.min()) / (ys.max() - ys.min() + 1e-6)
+        pts = [(w // 10 + i * (w * 8 // 10) // 19, int(h * 0.85 - y * h * 0.7)) for i, y in enumerate(ys.tolist())]
+        draw.line(pts, fill=("red", "blue", "green")[series], width=max(1, w // 300))
+    return img
+
+
+def vision_inputs(img: Image.Image):
+    out = vlm_client._HF_PROCESSOR.image_processor(images=[img], return_tensors="pt")
+    return out["pixel_values"], out["image_grid_thw"]
+
+
+def timed(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with torch.no_grad():
+            out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image_dir", type=str, default="")
+    parser.add_argument("--limit", type=int, default=10, help="Max images (0 = all)")
+    parser.add_argument("--sizes", type=str, default="448,1024,2048", help="합성 이미지 긴 변 (image_dir가 없을 때)")
+    parser.add_argument("--max_side", type=int, default=HF_IMAGE_MAX_SIDE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min_cos", type=float, default=0.999)
+    parser.add_argument("--generate", action="store_true", help="generate() 출력 문자열까지 비교")
+    args = parser.parse_args()
+
+    vlm_client._ensure_hf_loaded()
+    model = vlm_client._HF_MODEL
+    detach_onnx_vision(model)
+    owner, attr = find_visual(model)
+    visual = getattr(owner, attr)
+    tower = attach_onnx_vision(model, HF_VISION_ONNX_DIR, threads=HF_VISION_ONNX_THREADS)
+    if tower is None:
+        return
+    detach_onnx_vision(model)
+
+    if args.image_dir:
+        paths = sorted(p for p in Path(args.image_dir).iterdir() if p.suffix.lower() in SUPPORTED_EXTS)
+        paths = paths[:args.limit] if args.limit > 0 else paths
+        images = [(p.name, vlm_client._safe_open_image(str(p), max_side=args.max_side)) for p in paths]
+    else:
+        images = [(f"synthetic-{s}", synthetic_chart(s, i)) for i, s in enumerate(int(x) for x in args.sizes.split(","))]
+
+    print(f"[onnx-vision bench] {len(images)} image(s), repeat {args.repeat}, dtype {visual.patch_embed.proj.weight.dtype}, "
+          f"threads {torch.get_num_threads()} (torch) / {HF_VISION_ONNX_THREADS or 'default'} (ort)")
+    print(f"   {'image':<28}{'grid':>14}{'patches':>9}{'torch s':>9}{'onnx s':>9}{'x':>6}{'max_abs':>10}{'min_cos':>9}")
+    rows, failed = [], 0
+    for name, img in images:
+        pixels, grid = vision_inputs(img)
+        pixels = pixels.to(visual.patch_embed.proj.weight.dtype)
+        ref, t_torch = timed(lambda: visual(pixels, grid_thw=grid), args.repeat)
+        got, t_onnx = timed(lambda: tower(pixels, grid_thw=grid), args.repeat)
+        ref, got = ref.float(), got.float()
+        max_abs = float((ref - got).abs().max())
+        min_cos = float(torch.nn.functional.cosine_similarity(ref, got, dim=-1).min())
+        ok = min_cos >= args.min_cos
+        failed += not ok
+        rows.append((max(img.size), t_torch, t_onnx))
+        print(f"   {name[:27]:<28}{'x'.join(str(v) for v in grid[0].tolist()):>14}{int(grid.prod()):>9}"
+              f"{t_torch:>9.3f}{t_onnx:>9.3f}{t_torch / t_onnx:>6.2f}{max_abs:>10.2e}{min_cos:>9.5f}{'' if ok else '  FAIL'}")
+
+    buckets = {}
+    for long_side, t_torch, t_onnx in rows:
+        edge = 512
+        while edge < long_side:
+            edge *= 2
+        buckets.setdefault(edge, []).append((t_torch, t_onnx))
+    print(f"   {'long side ≤':<12}{'images':>7}{'torch s':>9}{'onnx s':>9}{'x':>6}")
+    for edge in sorted(buckets):
+        b = buckets[edge]
+        t_torch, t_onnx = sum(x[0] for x in b) / len(b), sum(x[1] for x in b) / len(b)
+        print(f"   {edge:<12}{len(b):>7}{t_torch:>9.3f}{t_onnx:>9.3f}{t_torch / t_onnx:>6.2f}")
+
+    if args.generate:
+        prompts = vlm_client.prompt_set()
+        same = 0
+        for name, img in images:
+            path = Path("./out/onnx_vision_bench") / f"{name}.png"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            img.save(path)
+            texts = []
+            for module in (visual, tower):
+                setattr(owner, attr, module)
+                texts.append(vlm_client._call_hf(str(path), prompts["system"], prompts["user"])["message"]["content"])
+            setattr(owner, attr, visual)
+            same += texts[0] == texts[1]
+            print(f"   [generate] {name}: {'same' if texts[0] == texts[1] else 'DIFFERENT'}")
+        print(f"   [generate] identical outputs {same}/{len(images)}")
+
+    assert failed == 0, f"{failed} image(s) below min_cos {args.min_cos}"
+    print(f"[check] all {len(images)} image(s) min_cos ≥ {args.min_cos}")
+
+
+if __name__ == "__main__":
+    main()
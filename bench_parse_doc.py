@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+parse_doc 벤치마크: 단일 패스 lexer(build_final_jsons.parse_doc) vs 이전 줄 단위 다중 정규식 구현
+
+사용:
+    python bench_parse_doc.py --lines 200000 --repeat 3
+
+- 제목/캡션/표/이미지/CRLF/들여쓰기 캡션/표 없는 표 캡션 등을 섞은 대용량 합성 .mmd 생성
+- 두 구현의 결과(text_blocks, figures, tables)가 완전히 같은지 확인 후 시간 비교
+"""
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from build_final_jsons import (
+    FIG_CAPTION_RE, HEADING_RE, MD_IMAGE_RE, TABLE_CAPTION_RE,
+    FigureItem, TableItem, normalize_section_path, parse_doc, parse_markdown_tables,
+)
+
+
+# 이전 구현 (비교 기준) — 줄마다 strip + 정규식 3종, 표 캡션마다 최대 25줄 재스캔
+
+def parse_doc_reference(mmd_path: Path, raw: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[FigureItem], List[TableItem]]:
+    filename = mmd_path.name
+    doc_id = mmd_path.stem
+
+    if raw is None:
+        raw = mmd_path.read_text(encoding="utf-8", errors="ignore")
+    lines = raw.splitlines(True)
+
+    headings_stack: List[Tuple[int, str]] = []
+    text_blocks: List[Dict[str, Any]] = []
+    figures: List[FigureItem] = []
+    tables: List[TableItem] = []
+
+    current_lines: List[str] = []
+    current_title: Optional[str] = None
+    current_section_path: Optional[str] = None
+
+    def flush_text_block():
+        nonlocal current_lines, current_title, current_section_path
+        content = "".join(current_lines).strip()
+        if content:
+            text_blocks.append({
+                "title": current_title,
+                "section_path": current_section_path,
+                "content": content
+            })
+        current_lines = []
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        h = HEADING_RE.match(line.strip("\n"))
+        if h:
+            flush_text_block()
+
+            level = len(h.group(1))
+            title = h.group(2).strip()
+
+            while headings_stack and headings_stack[-1][0] >= level:
+                headings_stack.pop()
+            headings_stack.append((level, title))
+
+            current_title = title
+            current_section_path = normalize_section_path(headings_stack)
+            i += 1
+            continue
+
+        cap = FIG_CAPTION_RE.match(line.strip())
+        if cap:
+            img_no = cap.group(1).strip()
+            caption_rest = (cap.group(2) or "").strip()
+            caption_full = f"Fig. {img_no}" + (f": {caption_rest}" if caption_rest else "")
+
+            image_link = None
+            for k in range(1, 4):
+                if i + k >= len(lines):
+                    break
+                mimg = MD_IMAGE_RE.search(lines[i + k])
+                if mimg:
+                    image_link = mimg.group(1).strip()
+                    break
+
+            figures.append(FigureItem(
+                doc_id=doc_id,
+                filename=filename,
+                section_path=current_section_path,
+                img_no=str(img_no),
+                caption=caption_full,
+                image_link=image_link
+            ))
+
+            # 캡션은 텍스트에 넣지 않음
+            i += 1
+            continue
+
+        tcap = TABLE_CAPTION_RE.match(line.strip())
+        if tcap:
+            table_no = tcap.group(1).strip()
+            caption_rest = (tcap.group(2) or "").strip()
+            caption_full = f"Table {table_no}" + (f": {caption_rest}" if caption_rest else "")
+
+            table_md = None
+            next_i = i + 1
+            scan_limit = min(len(lines), i + 25)
+            j = i + 1
+            while j < scan_limit:
+                maybe_table, j2 = parse_markdown_tables(lines, j)
+                if maybe_table:
+                    table_md = maybe_table
+                    next_i = j2
+                    break
+                j += 1
+
+            if table_md is None:
+                table_md = ""
+
+            tables.append(TableItem(
+                doc_id=doc_id,
+                filename=filename,
+                section_path=current_section_path,
+                table_no=str(table_no),
+                caption=caption_full,
+                table_md=table_md
+            ))
+
+            i = next_i
+            continue
+
+        current_lines.append(line)
+        i += 1
+
+    flush_text_block()
+    return text_blocks, figures, tables
+
+
+def make_synthetic_mmd(n_lines: int, seed: int = 0, dense: bool = False, other_eol: bool = False) -> str:
+    """
+    - 기본: 실제 OCR 교재 비율에 가깝게 제목/캡션/표가 드문 문서
+    - dense=True: 제목/캡션/표와 캡션-표 사이 잡음 줄을 많이 섞은 문서 (동일성 검증용)
+    - other_eol=True: "\r", "\u2028" 등 "\n" 외의 줄 경계도 섞음 (lexer의 대체 경로 검증용)
+    """
+    rnd = random.Random(seed)
+    scale = 2.5 if dense else 1.0
+    p_heading, p_fig, p_table, p_image = (0.012 * scale, 0.02 * scale, 0.026 * scale, 0.031 * scale)
+    lead_words = ["슬래그", "점도", "염기도", "CaO", "SiO2", "Al2O3", "temperature", "viscosity", "basicity", "flow",
+                  "see", "table", "figure", "fig.", "the", "of", "and", "1.2", "3"]
+    words = lead_words * 10 + ["|", "#", "![]"]
+    out: List[str] = []
+    while len(out) < n_lines:
+        r = rnd.random()
+        eol = "\r\n" if rnd.random() < 0.05 else "\n"
+        if other_eol and rnd.random() < 0.02:
+            eol = rnd.choice(["\r", "\x0c", "\u2028", "\x85"])
+        if r < p_heading:
+            level = rnd.randint(1, 4)
+            out.append("#" * level + f" {rnd.randint(1, 9)}.{rnd.randint(1, 9)} Section {len(out)}" + eol)
+        elif r < p_fig:
+            indent = " " * rnd.randint(0, 2)
+            fig = rnd.choice(["Fig.", "Figure", "FIG.", "fig"])
+            out.append(f"{indent}{fig} {rnd.randint(1, 20)}.{rnd.randint(1, 9)}: caption {len(out)}" + eol)
+            for _ in range(rnd.randint(0, 3)):
+                out.append(rnd.choice(["", "text line", f"![](images/{len(out)}.jpg)"]) + eol)
+        elif r < p_table:
+            out.append(f"Table {rnd.randint(1, 20)}.{rnd.randint(1, 9)} composition {len(out)}" + eol)
+            for _ in range(rnd.randint(0, 30 if dense or rnd.random() < 0.2 else 2)):
+                out.append(rnd.choice(["", "note line", "# heading inside", "Fig. 1.1 inner", "| x |"]) + eol)
+            if rnd.random() < 0.7:
+                cols = rnd.randint(2, 5)
+                out.append("| " + " | ".join(f"h{c}" for c in range(cols)) + " |" + eol)
+                out.append("|" + "|".join([" --- "] * cols) + "|" + eol)
+                for _ in range(rnd.randint(0, 8)):
+                    out.append("| " + " | ".join(str(rnd.randint(0, 99)) for _ in range(cols)) + " |" + eol)
+        elif r < p_image:
+            out.append(f"![](images/{len(out)}.png)" + eol)
+        elif r < p_image + 0.15:
+            out.append(eol)
+        else:
+            first = rnd.choice(words if rnd.random() < 0.03 else lead_words)
+            out.append(" ".join([first] + [rnd.choice(words) for _ in range(rnd.randint(2, 29))]) + eol)
+    return "".join(out)
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dense", action="store_true", help="Use a heading/caption/table-heavy document for timing")
+    parser.add_argument("--seeds", type=int, default=5, help="Number of extra small random docs for equivalence check")
+    args = parser.parse_args()
+
+    path = Path("synthetic.mmd")
+    for seed in range(args.seeds):
+        raw = make_synthetic_mmd(2000, seed=seed + 1, dense=seed % 3 != 2, other_eol=seed % 2 == 1)
+        assert parse_doc(path, raw) == parse_doc_reference(path, raw), f"output mismatch (seed={seed + 1})"
+
+    raw = make_synthetic_mmd(args.lines, dense=args.dense)
+    new_out = parse_doc(path, raw)
+    ref_out = parse_doc_reference(path, raw)
+    assert new_out == ref_out, "output mismatch on large document"
+
+    t_ref = _best_of(lambda: parse_doc_reference(path, raw), args.repeat)
+    t_new = _best_of(lambda: parse_doc(path, raw), args.repeat)
+    text_blocks, figures, tables = new_out
+    print(f"lines={args.lines}  size={len(raw.encode('utf-8')) / 1e6:.1f}MB  "
+          f"text_blocks={len(text_blocks)} figures={len(figures)} tables={len(tables)}  (outputs identical)")
+    print(f"reference : {t_ref:.3f}s")
+    print(f"lexer     : {t_new:.3f}s")
+    print(f"speedup   : {t_ref / t_new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
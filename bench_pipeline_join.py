@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+pipeline.py 조인 확인: PDF 한 개를 ocr → figures → step1 → step2 → final(--join)까지 흘려 images_sum에 결과가 붙는지 검사
+
+사용:
+    python bench_pipeline_join.py --pages 3
+
+- 페이지마다 "Fig. N" 캡션 + 서로 다른 래스터 그림이 있는 합성 PDF 생성
+- OCR 모델 대신 대역(model.infer와 같은 산출물: page_XXXX/images/0.jpg 크롭, result_ori.mmd grounding, 그림 링크가 있는 md)을 쓰고
+  렌더 풀/체크포인트/md 병합/pdf_figures/runner 저장/build_final_jsons 조인은 실제 코드를 그대로 사용
+- Step1/Step2 VLM 호출만 대역(키워드 page-N, 요약 "summary page-N")으로 바꿈
+- 확인: 모든 그림 레코드에 해당 페이지의 keyword/summary/chart_metadata가 채워지는지 (파일명이 같은 images/0.jpg끼리 섞이지 않는지)
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import shutil
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+FIG_RECT = (120, 200, 420, 400)   # 페이지 좌표(pt) — 그림 위치
+
+
+class StandInOCR:
+    """model.infer 대역: 렌더된 페이지에서 그림 박스를 잘라 images/0.jpg, result_ori.mmd를 저장하고 md를 반환"""
+
+    def __init__(self, box):
+        self.box = box   # grounding 좌표 (0~999 정규화)
+
+    def infer(self, tokenizer, prompt, image_file, output_path, save_results=True, **kwargs):
+        from PIL import Image
+        out = Path(output_path)
+        page = int(out.name.split("_")[1])
+        (out / "images").mkdir(parents=True, exist_ok=True)
+        with Image.open(image_file) as img:
+            w, h = img.size
+            x1, y1, x2, y2 = self.box
+            img.convert("RGB").crop((x1 * w / 999, y1 * h / 999, x2 * w / 999, y2 * h / 999)).save(out / "images" / "0.jpg")
+        (out / "result_ori.mmd").write_text(
+            f"<|ref|>image<|/ref|><|det|>[[{x1}, {y1}, {x2}, {y2}]]<|/det|>\nFig. {page}: chart {page}\n", encoding="utf-8")
+        return f"# {page}. Section {page}\n\nFig. {page}: chart {page}\n\n![](images/0.jpg)\n\nbody text of page {page}\n"
+
+
+def make_pdf(path: Path, pages: int):
+    import fitz
+    from PIL import Image, ImageDraw
+    doc = fitz.open()
+    for n in range(1, pages + 1):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 120), f"Fig. {n}: chart {n}", fontsize=14)
+        img = Image.new("RGB", (600, 400), (255, 255, 255))
+        draw = ImageDraw.Draw(img)
+        for i in range(20):
+            draw.line([(i * 30, 400 - ((i * 37 * n) % 380)), ((i + 1) * 30, 400 - (((i + 1) * 37 * n) % 380))],
+                      fill=(200, 40 * n % 255, 60), width=4)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        page.insert_image(fitz.Rect(*FIG_RECT), stream=buf.getvalue())
+    doc.save(path)
+    doc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--work", type=str, default="./out/pipeline_join_bench")
+    args = parser.parse_args()
+
+    work = Path(args.work)
+    shutil.rmtree(work, ignore_errors=True)
+    (work / "pdf").mkdir(parents=True)
+    # config.py는 import 시점에 환경 변수를 읽으므로 모듈을 불러오기 전에 출력 위치를 지정
+    for key, sub in (("OUTPUT_JSON_DIR", "json"), ("OUTPUT_RAW_DIR", "raw"), ("OUTPUT_SUMMARY_DIR", "summary"),
+                     ("OUTPUT_FIGURE_DIR", "figures")):
+        os.environ[key] = str(work / sub)
+    os.environ["PIPELINE_PROGRESS_SEC"] = "0"
+
+    import pipeline
+    import runner
+    import runner_summary
+    from build_final_jsons import run as build_final
+    from schemas import ChartMetadata, SourceRef
+
+    pdf_path = work / "pdf" / "sample.pdf"
+    make_pdf(pdf_path, args.pages)
+
+    ds = importlib.import_module("deepseek-ocr")
+    ds.base_output_dir = work / "ocr"
+    ds.base_output_dir.mkdir(parents=True)
+    page_w, page_h = 595, 842
+    box = [round(FIG_RECT[0] / page_w * 999), round(FIG_RECT[1] / page_h * 999),
+           round(FIG_RECT[2] / page_w * 999), round(FIG_RECT[3] / page_h * 999)]
+    ds.load_model = lambda device=None: (StandInOCR(box), None)
+
+    def step1_stand_in(image_path, source=None, with_summary=None):
+        page = source.page_number if source is not None else None
+        meta = ChartMetadata(is_chart=True, chart_type="line", key_phrases=[f"page-{page}"], confidence=0.9,
+                             source=source or SourceRef(image_path=image_path))
+        return meta, "{}", {}, {"gen_sec": 0.0, "struct_sec": 0.0}
+
+    def step2_stand_in(image_path, keywords):
+        return f"summary {keywords[0]}", {}
+
+    runner.infer_chart_metadata_cascade = step1_stand_in
+    runner_summary.generate_semantic_summary = step2_stand_in
+    for d in ("json", "raw", "summary"):
+        (work / d).mkdir(parents=True, exist_ok=True)
+
+    pools: list = []
+    ocr = pipeline.Stage("ocr", pipeline.make_ocr_fn(ds, pools), 1)
+    figures = pipeline.Stage("figures", pipeline.make_figures_fn(ds), 1)
+    step1 = pipeline.Stage("step1", pipeline.make_step1_fn(nullcontext()), 2)
+    step2 = pipeline.Stage("step2", pipeline.make_step2_fn(nullcontext()), 1)
+    ocr.to(figures).to(step1).to(step2)
+    t0 = time.perf_counter()
+    try:
+        pipeline.Pipeline([ocr, figures, step1, step2], progress_sec=0).run([pdf_path])
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+    build_final(ds.base_output_dir, work / "final_out", pattern="*_*-*.md", incremental=True,
+                graph_json_dir=work / "json", graph_summary_dir=work / "summary")
+    sec = time.perf_counter() - t0
+
+    records = json.loads((work / "final_out" / "final" / "images_sum_final.json").read_text(encoding="utf-8"))
+    by_id = {r["id"]: r for r in records}
+    joined = 0
+    for n in range(1, args.pages + 1):
+        rec = by_id.get(f"sample_1-{args.pages}#fig{n}")
+        assert rec is not None, f"fig{n} missing from images_sum_final ({sorted(by_id)})"
+        assert rec["keyword"] == [f"page-{n}"], f"fig{n}: keyword {rec['keyword']} (image_link {rec['image_link']})"
+        assert rec["summary"] == f"summary page-{n}", f"fig{n}: summary {rec['summary']!r}"
+        assert rec["chart_metadata"]["source"]["page_number"] == n
+        joined += 1
+    print(f"[check] {joined}/{args.pages} figures joined with their own page's Step1/Step2 results "
+          f"({len(list((work / 'json').glob('*.json')))} Step1 JSONs)  {sec:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+vector_index 벤치마크: 합성 벡터 N개 → append / brute-force vs IVF 검색 지연과 recall@k
+
+사용:
+    python bench_vector_index.py --rows 200000 --dim 384 --ivf 512 --nprobe 16
+
+- 군집 구조가 있는 단위 벡터를 만들어 VectorStore에 배치 단위로 append (실제 임베딩 시간 제외)
+- 질의는 임의 행 근처의 벡터, IVF 결과를 brute-force top-k와 비교해 recall 계산
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from vector_index import VectorIndex, VectorStore, _normalize_rows, train_ivf
+
+
+class FixedEmbedder:
+    """질의 문자열 대신 미리 만든 벡터를 돌려주는 벤치용 임베더"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"bench-{dim}"
+        self.next = None
+
+    def embed(self, texts):
+        return self.next[None, :]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=4096)
+    parser.add_argument("--ivf", type=int, default=512)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    centers = _normalize_rows(rng.standard_normal((args.clusters, args.dim)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(Path(tmp))
+        emb = FixedEmbedder(args.dim)
+        store.reset(emb.name, args.dim)
+        t0 = time.perf_counter()
+        for s in range(0, args.rows, args.batch):
+            n = min(args.batch, args.rows - s)
+            vecs = _normalize_rows(centers[rng.integers(0, args.clusters, n)] + 0.6 * rng.standard_normal((n, args.dim)) / np.sqrt(args.dim))
+            store.append(vecs, [{"id": f"r{s + i}", "source": "text", "ref": None, "sha1": "", "preview": ""} for i in range(n)])
+        print(f"[append] {args.rows} x {args.dim} float16  {time.perf_counter() - t0:.2f}s  "
+              f"({args.rows * args.dim * 2 / 2**20:.0f}MB)")
+
+        queries = _normalize_rows(np.asarray(store.vectors()[rng.integers(0, args.rows, args.queries)], dtype=np.float32)
+                                  + 0.3 * rng.standard_normal((args.queries, args.dim)) / np.sqrt(args.dim))
+
+        def run(index: VectorIndex, nprobe: int):
+            lat, ids = [], []
+            for q in queries:
+                emb.next = q
+                t = time.perf_counter()
+                ids.append([r["id"] for r in index.search("", args.k, nprobe=nprobe)])
+                lat.append(1000 * (time.perf_counter() - t))
+            lat.sort()
+            return ids, lat
+
+        exact, lat = run(VectorIndex(Path(tmp), emb), 0)
+        print(f"[brute] p50 {lat[len(lat) // 2]:.1f}ms  p95 {lat[int(0.95 * (len(lat) - 1))]:.1f}ms")
+
+        if args.ivf:
+            t0 = time.perf_counter()
+            train_ivf(store, args.ivf)
+            print(f"[ivf train] nlist {args.ivf}  {time.perf_counter() - t0:.2f}s")
+            approx, lat = run(VectorIndex(Path(tmp), emb), args.nprobe)
+            recall = np.mean([len(set(a) & set(e)) / max(1, len(e)) for a, e in zip(approx, exact)])
+            print(f"[ivf nprobe={args.nprobe}] p50 {lat[len(lat) // 2]:.1f}ms  p95 {lat[int(0.95 * (len(lat) - 1))]:.1f}ms"
+                  f"  recall@{args.k} {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
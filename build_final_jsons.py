@@ -1,9 +1,14 @@
+import os
 import re
 import json
+import hashlib
+from bisect import bisect_left
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+from md_pages import load_page_index, read_page_range, slice_page_range
+
 
 # =========================
 # Regex helpers
@@ -20,6 +25,8 @@ TABLE_REF_RE = re.compile(r"\btable\s*([0-9]+(?:\.[0-9]+)?)\b", re.IGNORECASE)
 MD_IMAGE_RE = re.compile(r"!\[[^\]]*\]\(([^)]+)\)")
 MD_TABLE_HEADER_RE = re.compile(r"^\s*\|.*\|\s*$")
 MD_TABLE_SEP_RE = re.compile(r"^\s*\|\s*:?-{2,}\s*(?:\|\s*:?-{2,}\s*)+\|\s*$")
+# deepseek-ocr.py 페이지 체크포인트(page_XXXX.md) — 문서 *.md와 같은 폴더 아래에 있으므로 입력에서 제외
+PAGE_CHECKPOINT_RE = re.compile(r"^page_\d{4}\.md$")
 
 
 @dataclass
@@ -81,12 +88,110 @@ def parse_markdown_tables(lines: List[str], start_idx: int) -> Tuple[Optional[st
     return "\n".join(buf).strip() + "\n", i
 
 
-def parse_doc(mmd_path: Path) -> Tuple[List[Dict[str, Any]], List[FigureItem], List[TableItem]]:
+# =========================
+# Line lexer
+# =========================
+
+LN_HEADING = 1
+LN_FIG_CAPTION = 2
+LN_TABLE_CAPTION = 3
+
+TABLE_CAPTION_SCAN = 25   # 표 캡션 뒤 표를 찾는 범위(캡션 포함 줄 수)
+FIG_IMAGE_LOOKAHEAD = 3   # 그림 캡션 뒤 이미지 링크를 찾는 줄 수
+
+# 제목/캡션/표 행이 될 수 있는 줄의 시작 (원래 정규식의 필요조건만 검사, 최종 판정은 원래 정규식으로)
+# 줄 앞의 "\n"을 리터럴 접두어로 두어 정규식 엔진이 "\n" 위치만 빠르게 건너뛰며 검사하게 함
+LINE_LEAD_RE = re.compile(r"\n(?:#|[^\S\n]*(?:\||(?i:fig\.|figure|table)[^\S\n]*[0-9]))")
+# 줄 경계가 "\n"만이 아닐 때의 후보 판정: 첫 비공백 문자
+LEAD_CHARS = frozenset("#|fFtT")
+
+
+@dataclass
+class LexedLines:
+    events: List[Tuple[int, int, "re.Match"]]   # (줄 번호, LN_*, 매치) — 제목/캡션 줄, 줄 번호 오름차순
+    image_links: Dict[int, Optional[str]]        # 줄 번호 → 첫 markdown 이미지 링크 (그림 캡션 뒤 줄만)
+    table_starts: List[int]                      # 표 블록(헤더 행 + 구분 행) 시작 줄, 오름차순
+    table_end: Dict[int, int]                    # 표 블록 시작 줄 → 블록 끝(미포함)
+
+
+def _newline_only(raw: str, lines: List[str]) -> bool:
+    # str.splitlines는 "\r", "\x0b", "\u2028" 등도 줄 경계로 보므로, 줄 수가 "\n" 개수와 같을 때만 "\n" 기준 스캔 사용
+    return len(lines) == raw.count("\n") + (not raw.endswith("\n") and bool(raw))
+
+
+def _candidate_lines(raw: str, lines: List[str], newline_only: bool) -> List[int]:
+    if not newline_only:
+        return [i for i, line in enumerate(lines) if line.lstrip()[:1] in LEAD_CHARS]
+    # 본문 전체를 정규식 한 번으로 훑고, 후보 위치의 줄 번호는 "\n" 개수로 계산
+    out = [0] if lines and LINE_LEAD_RE.match("\n" + lines[0]) else []
+    i = pos = 0
+    for m in LINE_LEAD_RE.finditer(raw):
+        start = m.start()
+        i += raw.count("\n", pos, start) + 1
+        pos = start + 1
+        out.append(i)
+    return out
+
+
+def lex_lines(raw: str, lines: List[str]) -> LexedLines:
+    """
+    모든 줄을 한 번만 분류합니다.
+    - 후보 줄(LINE_LEAD_RE)에만 기존 정규식을 적용 → 이전 구현과 동일한 판정
+    - 일반 본문 줄은 분류 루프에 들어오지 않음
+    - 표 블록 시작/끝, 이미지 링크 위치를 미리 계산해 캡션 처리 시 재스캔하지 않음
+    """
+    events: List[Tuple[int, int, re.Match]] = []
+    rows: Dict[int, bool] = {}   # 표 행 줄 번호 → 구분 행 여부
+    newline_only = _newline_only(raw, lines)
+    for i in _candidate_lines(raw, lines, newline_only):
+        line = lines[i]
+        c = line.lstrip()[:1]
+        if c == "#":
+            h = HEADING_RE.match(line.strip("\n")) if line[:1] == "#" else None
+            if h:
+                events.append((i, LN_HEADING, h))
+        elif c == "|":
+            if MD_TABLE_HEADER_RE.match(line):
+                rows[i] = bool(MD_TABLE_SEP_RE.match(line))
+        elif c == "f" or c == "F":
+            cap = FIG_CAPTION_RE.match(line.strip())
+            if cap:
+                events.append((i, LN_FIG_CAPTION, cap))
+        elif c == "t" or c == "T":
+            cap = TABLE_CAPTION_RE.match(line.strip())
+            if cap:
+                events.append((i, LN_TABLE_CAPTION, cap))
+
+    # 이미지 링크는 그림 캡션 뒤 FIG_IMAGE_LOOKAHEAD 줄에서만 쓰이므로 그 줄들만 태깅
+    image_links: Dict[int, Optional[str]] = {}
+    n = len(lines)
+    for i, kind, _ in events:
+        if kind != LN_FIG_CAPTION:
+            continue
+        for k in range(i + 1, min(n, i + 1 + FIG_IMAGE_LOOKAHEAD)):
+            if k not in image_links:
+                mimg = MD_IMAGE_RE.search(lines[k]) if "![" in lines[k] else None
+                image_links[k] = mimg.group(1).strip() if mimg else None
+
+    # 표 블록: 행 i + 구분 행 i+1, 이후 연속된 행까지
+    run_end: Dict[int, int] = {}
+    for i in sorted(rows, reverse=True):
+        run_end[i] = run_end.get(i + 1, i + 1)
+    table_starts = [i for i in sorted(rows) if rows.get(i + 1)]
+    table_end = {i: run_end[i] for i in table_starts}
+
+    return LexedLines(events=events, image_links=image_links, table_starts=table_starts, table_end=table_end)
+
+
+def parse_doc(mmd_path: Path, raw: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[FigureItem], List[TableItem]]:
     filename = mmd_path.name
     doc_id = mmd_path.stem
 
-    raw = mmd_path.read_text(encoding="utf-8", errors="ignore")
+    if raw is None:
+        raw = mmd_path.read_text(encoding="utf-8", errors="ignore")
     lines = raw.splitlines(True)
+    n = len(lines)
+    lexed = lex_lines(raw, lines)
 
     headings_stack: List[Tuple[int, str]] = []
     text_blocks: List[Dict[str, Any]] = []
@@ -108,15 +213,18 @@ def parse_doc(mmd_path: Path) -> Tuple[List[Dict[str, Any]], List[FigureItem], L
             })
         current_lines = []
 
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        h = HEADING_RE.match(line.strip("\n"))
-        if h:
+    # pos: 아직 본문으로 넘기지 않은 첫 줄. 제목/캡션 사이의 줄은 통째로 본문에 추가
+    pos = 0
+    for i, kind, m in lexed.events:
+        if i < pos:
+            continue  # 표 캡션 처리에서 건너뛴 줄
+        current_lines.extend(lines[pos:i])
+
+        if kind == LN_HEADING:
             flush_text_block()
 
-            level = len(h.group(1))
-            title = h.group(2).strip()
+            level = len(m.group(1))
+            title = m.group(2).strip()
 
             while headings_stack and headings_stack[-1][0] >= level:
                 headings_stack.pop()
@@ -124,22 +232,17 @@ def parse_doc(mmd_path: Path) -> Tuple[List[Dict[str, Any]], List[FigureItem], L
 
             current_title = title
             current_section_path = normalize_section_path(headings_stack)
-            i += 1
-            continue
+            pos = i + 1
 
-        cap = FIG_CAPTION_RE.match(line.strip())
-        if cap:
-            img_no = cap.group(1).strip()
-            caption_rest = (cap.group(2) or "").strip()
+        elif kind == LN_FIG_CAPTION:
+            img_no = m.group(1).strip()
+            caption_rest = (m.group(2) or "").strip()
             caption_full = f"Fig. {img_no}" + (f": {caption_rest}" if caption_rest else "")
 
             image_link = None
-            for k in range(1, 4):
-                if i + k >= len(lines):
-                    break
-                mimg = MD_IMAGE_RE.search(lines[i + k])
-                if mimg:
-                    image_link = mimg.group(1).strip()
+            for k in range(i + 1, min(n, i + 1 + FIG_IMAGE_LOOKAHEAD)):
+                if lexed.image_links.get(k) is not None:
+                    image_link = lexed.image_links[k]
                     break
 
             figures.append(FigureItem(
@@ -152,29 +255,22 @@ def parse_doc(mmd_path: Path) -> Tuple[List[Dict[str, Any]], List[FigureItem], L
             ))
 
             # 캡션은 텍스트에 넣지 않음
-            i += 1
-            continue
+            pos = i + 1
 
-        tcap = TABLE_CAPTION_RE.match(line.strip())
-        if tcap:
-            table_no = tcap.group(1).strip()
-            caption_rest = (tcap.group(2) or "").strip()
+        else:
+            table_no = m.group(1).strip()
+            caption_rest = (m.group(2) or "").strip()
             caption_full = f"Table {table_no}" + (f": {caption_rest}" if caption_rest else "")
 
-            table_md = None
-            next_i = i + 1
-            scan_limit = min(len(lines), i + 25)
-            j = i + 1
-            while j < scan_limit:
-                maybe_table, j2 = parse_markdown_tables(lines, j)
-                if maybe_table:
-                    table_md = maybe_table
-                    next_i = j2
-                    break
-                j += 1
-
-            if table_md is None:
-                table_md = ""
+            # 캡션 뒤 TABLE_CAPTION_SCAN 줄 안에서 처음 시작하는 표 블록 (사이의 줄은 버림)
+            table_md = ""
+            pos = i + 1
+            k = bisect_left(lexed.table_starts, i + 1)
+            if k < len(lexed.table_starts) and lexed.table_starts[k] < min(n, i + TABLE_CAPTION_SCAN):
+                t = lexed.table_starts[k]
+                end = lexed.table_end[t]
+                table_md = "\n".join(ln.rstrip("\n") for ln in lines[t:end]).strip() + "\n"
+                pos = end
 
             tables.append(TableItem(
                 doc_id=doc_id,
@@ -185,12 +281,7 @@ def parse_doc(mmd_path: Path) -> Tuple[List[Dict[str, Any]], List[FigureItem], L
                 table_md=table_md
             ))
 
-            i = next_i
-            continue
-
-        current_lines.append(line)
-        i += 1
-
+    current_lines.extend(lines[pos:])
     flush_text_block()
     return text_blocks, figures, tables
 
@@ -346,47 +437,302 @@ def build_tables_str_final(tables: List[TableItem]) -> List[Dict[str, Any]]:
     return out
 
 
+# 출력 키 → 파일명(확장자 제외)
+OUTPUT_NAMES = {
+    "texts": "texts_final",
+    "tables_str": "tables_str_final",
+    "tables_unstr": "tables_unstr_final",
+    "images_formula": "images_formula_final",
+    "images_sum": "images_sum_final",
+    "images_trans": "images_trans_final",
+}
+
+
 def write_json(path: Path, data: Any):
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
-def run(mmd_dir: Path, out_dir: Path):
-    mmd_files = sorted(mmd_dir.rglob("*.mmd"))
-    if not mmd_files:
-        raise FileNotFoundError(f"No .mmd files found under: {mmd_dir}")
-
-    all_texts: List[Dict[str, Any]] = []
-    all_tables_str: List[Dict[str, Any]] = []
-    all_tables_unstr: List[Dict[str, Any]] = []
-    all_images_formula: List[Dict[str, Any]] = []
-    all_images_sum: List[Dict[str, Any]] = []
-    all_images_trans: List[Dict[str, Any]] = []
-
-    for mmd_path in mmd_files:
-        text_blocks, figures, tables = parse_doc(mmd_path)
-        doc_id = mmd_path.stem
-        filename = mmd_path.name
+def write_json_array_stream(path: Path, records):
+    """
+    레코드를 하나씩 받아 json.dumps(list, indent=2)와 바이트 단위로 동일한 JSON 배열을 씁니다.
+    (전체 리스트를 메모리에 올리지 않음)
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        empty = True
+        for rec in records:
+            f.write("\n  " if empty else ",\n  ")
+            f.write("\n  ".join(json.dumps(rec, ensure_ascii=False, indent=2).split("\n")))
+            empty = False
+        f.write("]" if empty else "\n]")
+
+
+def iter_jsonl(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def jsonl_to_json(jsonl_path: Path, json_path: Path):
+    write_json_array_stream(json_path, iter_jsonl(jsonl_path))
+
+
+def read_doc_text(mmd_path: Path, pages: Optional[Tuple[int, int]] = None) -> str:
+    # deepseek-ocr.py가 남긴 페이지 인덱스(<md>.index.json)가 있으면 해당 페이지 구간만 seek해서 읽음
+    # 인덱스가 없으면 <!-- Page N --> 마커로 잘라내고, 마커도 없으면 페이지 제한을 지킬 수 없으므로 실패
+    if pages is None:
+        return mmd_path.read_text(encoding="utf-8", errors="ignore")
+    if load_page_index(mmd_path) is not None:
+        return read_page_range(mmd_path, pages[0], pages[1])
+    print(f"[pages] {mmd_path.name}: no page index, slicing on <!-- Page N --> markers")
+    try:
+        return slice_page_range(mmd_path.read_text(encoding="utf-8", errors="ignore"), pages[0], pages[1])
+    except ValueError:
+        raise ValueError(f"--pages {pages[0]}-{pages[1]}: {mmd_path} has no page index or page markers") from None
+
+
+def parse_page_range(spec: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not spec:
+        return None
+    first, _, last = spec.partition("-")
+    return int(first), int(last or first)
+
+
+def process_doc(mmd_path: Path, pages: Optional[Tuple[int, int]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    text_blocks, figures, tables = parse_doc(mmd_path, read_doc_text(mmd_path, pages))
+    doc_id = mmd_path.stem
+    filename = mmd_path.name
 
-        all_texts.extend(chunk_text_blocks(
+    return {
+        "texts": chunk_text_blocks(
             doc_id=doc_id,
             filename=filename,
             text_blocks=text_blocks,
             figures=figures,
             tables=tables,
             max_chars=2500
-        ))
+        ),
+        "images_sum": build_images_sum_final(figures),
+        "tables_str": build_tables_str_final(tables),
+    }
+
+
+def iter_doc_results(mmd_files: List[Path], pages: Optional[Tuple[int, int]] = None, workers: int = 1):
+    """
+    문서별 결과를 mmd_files 순서대로 yield 합니다.
+    - workers > 1이면 프로세스 풀에서 병렬 파싱하되, 결과는 입력 순서로 받아 직렬 실행과 동일한 출력 보장
+    """
+    if workers <= 1 or len(mmd_files) <= 1:
+        for mmd_path in mmd_files:
+            yield process_doc(mmd_path, pages)
+        return
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    # 제출 창을 workers * 4개로 제한 → 앞 문서가 느려도 완료된 결과가 무한정 쌓이지 않음
+    window = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for mmd_path in mmd_files:
+            pending.append(pool.submit(process_doc, mmd_path, pages))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
 
-        all_images_sum.extend(build_images_sum_final(figures))
-        all_tables_str.extend(build_tables_str_final(tables))
+# =========================
+# Incremental rebuild (manifest)
+# =========================
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1   # 파싱/청킹 규칙이 바뀌면 올려서 기존 manifest 무효화
+STEP1_QUEUE_NAME = "step1_queue.txt"
+JOIN_FIELDS = ("text", "keyword", "summary", "chart_metadata")   # figure_join.FigureJoiner.apply가 채우는 필드
+
+
+def _doc_sha1(path: Path, prev: Optional[Dict[str, Any]] = None) -> Tuple[str, os.stat_result]:
+    # 크기/mtime이 그대로면 이전 해시 재사용 (수천 개 파일 재해싱 방지)
+    st = path.stat()
+    if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+        return prev["sha1"], st
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest(), st
+
+
+def load_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+class _PreviousOutputs:
+    """
+    이전 실행의 출력 파일을 문서 순서대로 읽으며, 변경 없는 문서의 레코드를 그대로 꺼냅니다.
+    (출력은 문서 순서로 기록되므로 manifest의 문서별 id 개수만큼 순차로 읽으면 됨)
+    """
+
+    def __init__(self, final_dir: Path, output_format: str, docs: List[Dict[str, Any]]):
+        self.iters = {}
+        for k, name in OUTPUT_NAMES.items():
+            if output_format == "jsonl":
+                self.iters[k] = iter_jsonl(final_dir / f"{name}.jsonl")
+            else:
+                self.iters[k] = iter(json.loads((final_dir / f"{name}.json").read_text(encoding="utf-8")))
+        self.docs = docs
+        self.pos = 0
+
+    def take(self, doc_path: str) -> Dict[str, List[Dict[str, Any]]]:
+        while self.pos < len(self.docs):
+            entry = self.docs[self.pos]
+            self.pos += 1
+            records = {k: [next(it) for _ in entry["ids"].get(k, [])] for k, it in self.iters.items()}
+            if entry["path"] != doc_path:
+                continue
+            for k, recs in records.items():
+                if [r.get("id") for r in recs] != entry["ids"].get(k, []):
+                    raise ValueError(f"Previous outputs do not match {MANIFEST_NAME} ({doc_path}); rerun without --incremental")
+            return records
+        raise ValueError(f"{doc_path} not found in previous outputs; rerun without --incremental")
+
+
+def run(mmd_dir: Path, out_dir: Path, pattern: str = "*.mmd", pages: Optional[Tuple[int, int]] = None,
+        workers: int = 1, output_format: str = "json", also_json: bool = False, incremental: bool = False,
+        graph_json_dir: Optional[Path] = None, graph_summary_dir: Optional[Path] = None):
+    """
+    output_format:
+    - json : 전체 결과를 모아 *_final.json(배열)로 저장
+    - jsonl: 문서가 끝날 때마다 *_final.jsonl에 레코드를 한 줄씩 append (메모리 사용량은 문서 단위로 제한)
+             also_json=True면 마지막에 jsonl에서 동일한 *_final.json을 스트리밍으로 생성
+    incremental:
+    - final/manifest.json(문서 경로 → 내용 해시, 출력 레코드 id)을 기준으로 새로 생겼거나 바뀐 문서만 다시 파싱
+    - 나머지 문서의 레코드는 이전 출력에서 그대로 가져와 끼워 넣음 → 전체 재빌드와 동일한 결과, 청크 id 유지
+    - 이번 실행에서 추가/변경/삭제된 레코드 id는 final/delta.json에 기록 (임베딩 재색인용)
+      변경에는 재사용 문서라도 조인 결과(Step1 JSON/요약)가 바뀐 images_sum 레코드가 포함됨
+    graph_json_dir:
+    - 주어지면 images_sum 레코드를 Step1 JSON(+ graph_summary_dir의 Step2 요약)과 조인 (figure_join.py)
+    - Step1 결과가 없는 그림은 final/step1_queue.txt에 기록 → INPUT_MODE=queue python runner.py
+    """
+    mmd_files = sorted(p for p in mmd_dir.rglob(pattern) if not PAGE_CHECKPOINT_RE.match(p.name))
+    if not mmd_files:
+        raise FileNotFoundError(f"No {pattern} files found under: {mmd_dir}")
 
     final_dir = out_dir / "final"
-    write_json(final_dir / "texts_final.json", all_texts)
-    write_json(final_dir / "tables_str_final.json", all_tables_str)
-    write_json(final_dir / "tables_unstr_final.json", all_tables_unstr)
-    write_json(final_dir / "images_formula_final.json", all_images_formula)
-    write_json(final_dir / "images_sum_final.json", all_images_sum)
-    write_json(final_dir / "images_trans_final.json", all_images_trans)
+    params = {"version": MANIFEST_VERSION, "pattern": pattern, "pages": list(pages) if pages else None,
+              "format": output_format, "join": graph_json_dir is not None}
+
+    previous = load_manifest(final_dir / MANIFEST_NAME) if incremental else None
+    if previous is not None and previous.get("params") != params:
+        print(f"[incremental] parameters changed ({previous.get('params')} → {params}) → full rebuild")
+        previous = None
+    if previous is not None:
+        ext = "jsonl" if output_format == "jsonl" else "json"
+        if not all((final_dir / f"{name}.{ext}").exists() for name in OUTPUT_NAMES.values()):
+            print("[incremental] previous outputs missing → full rebuild")
+            previous = None
+    prev_docs = {d["path"]: d for d in (previous or {}).get("docs", [])}
+
+    entries: List[Dict[str, Any]] = []
+    for mmd_path in mmd_files:
+        doc_path = mmd_path.relative_to(mmd_dir).as_posix()
+        sha1, st = _doc_sha1(mmd_path, prev_docs.get(doc_path))
+        entries.append({"path": doc_path, "sha1": sha1, "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+
+    reuse = {e["path"] for e in entries if e["path"] in prev_docs and prev_docs[e["path"]]["sha1"] == e["sha1"]}
+    if reuse:
+        old_order = [d["path"] for d in previous["docs"] if d["path"] in reuse]
+        if old_order != [e["path"] for e in entries if e["path"] in reuse]:
+            print("[incremental] document order changed → full rebuild")
+            reuse = set()
+    if incremental:
+        removed_docs = len(set(prev_docs) - {e["path"] for e in entries})
+        print(f"[incremental] reuse {len(reuse)}, reparse {len(entries) - len(reuse)}, removed {removed_docs}")
+
+    reparse_files = [p for p, e in zip(mmd_files, entries) if e["path"] not in reuse]
+    fresh = iter_doc_results(reparse_files, pages, workers)
+    prev_outputs = _PreviousOutputs(final_dir, output_format, previous["docs"]) if reuse else None
+
+    joiner = None
+    if graph_json_dir is not None:
+        from figure_join import FigureJoiner, GraphIndex
+        index = GraphIndex.build(graph_json_dir, graph_summary_dir)
+        print(f"[join] indexed {index.count} Step1 JSONs from {graph_json_dir}")
+        joiner = FigureJoiner(index)
+
+    join_changed: set = set()   # 재사용 문서 중 조인 결과(Step1 JSON/요약)가 바뀐 레코드 id → delta.json "updated"
+
+    def iter_results():
+        for e in entries:
+            reused = e["path"] in reuse
+            result = prev_outputs.take(e["path"]) if reused else next(fresh)
+            if joiner is not None:
+                # 재사용 레코드도 매번 다시 조인 (그래프 파서 결과는 문서와 별개로 갱신됨)
+                base_dir = (mmd_dir / e["path"]).parent
+                joined = []
+                for rec in result.get("images_sum", []):
+                    before = {k: rec.get(k) for k in JOIN_FIELDS} if reused else None
+                    rec = joiner.apply(rec, base_dir)
+                    if reused and before != {k: rec.get(k) for k in JOIN_FIELDS}:
+                        join_changed.add(rec.get("id"))
+                    joined.append(rec)
+                result["images_sum"] = joined
+            e["ids"] = {k: [r.get("id") for r in result.get(k, [])] for k in OUTPUT_NAMES}
+            yield result
+
+    results = iter_results()
+
+    if output_format == "jsonl":
+        final_dir.mkdir(parents=True, exist_ok=True)
+        # 이전 jsonl을 읽으면서 써야 하므로 재사용 시에는 임시 파일에 쓰고 마지막에 교체
+        suffix = ".jsonl.tmp" if reuse else ".jsonl"
+        files = {k: open(final_dir / f"{name}{suffix}", "w", encoding="utf-8") for k, name in OUTPUT_NAMES.items()}
+        try:
+            for result in results:
+                for k, f in files.items():
+                    for rec in result.get(k, []):
+                        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    f.flush()
+        finally:
+            for f in files.values():
+                f.close()
+        if reuse:
+            for name in OUTPUT_NAMES.values():
+                os.replace(final_dir / f"{name}.jsonl.tmp", final_dir / f"{name}.jsonl")
+        if also_json:
+            for name in OUTPUT_NAMES.values():
+                jsonl_to_json(final_dir / f"{name}.jsonl", final_dir / f"{name}.json")
+    else:
+        outputs: Dict[str, List[Dict[str, Any]]] = {k: [] for k in OUTPUT_NAMES}
+        for result in results:
+            for k, records in result.items():
+                outputs[k].extend(records)
+
+        for k, name in OUTPUT_NAMES.items():
+            write_json(final_dir / f"{name}.json", outputs[k])
+
+    # manifest는 매 실행마다 갱신 → 다음 실행부터 --incremental 가능
+    if incremental:
+        old_ids = {i for d in prev_docs.values() if d["path"] not in reuse for ids in d["ids"].values() for i in ids}
+        new_ids = {i for e in entries if e["path"] not in reuse for ids in e["ids"].values() for i in ids}
+        write_json(final_dir / "delta.json", {
+            "added": sorted(new_ids - old_ids),
+            "updated": sorted((new_ids & old_ids) | join_changed),
+            "removed": sorted(old_ids - new_ids),
+        })
+    write_json(final_dir / MANIFEST_NAME, {"params": params, "docs": entries})
+    if joiner is not None:
+        joiner.write_queue(final_dir / STEP1_QUEUE_NAME)
+        print(joiner.report())
 
 
 if __name__ == "__main__":
@@ -394,5 +740,29 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--mmd_dir", type=str, required=True, help="Directory containing .mmd files")
     parser.add_argument("--out_dir", type=str, required=True, help="Output directory (will create out_dir/final/...)")
+    parser.add_argument("--pattern", type=str, default="*.mmd", help="Input file glob (e.g. *_*-*.md for deepseek-ocr.py output, as pipeline.py uses; "
+                             "page_XXXX.md checkpoints are always skipped)")
+    parser.add_argument("--pages", type=str, default=None,
+                        help="Page range like 10-50; read via <file>.index.json when present")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parse/chunk documents in N processes (0 = os.cpu_count()); output is identical to 1")
+    parser.add_argument("--format", type=str, default="json", choices=["json", "jsonl"],
+                        help="json: one array per output file / jsonl: stream records per document")
+    parser.add_argument("--also_json", action="store_true", help="With --format jsonl, also write the *_final.json arrays")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Re-parse only new/changed/deleted files according to final/manifest.json")
+    parser.add_argument("--join", action="store_true",
+                        help="Join figures with Step1 JSONs / Step2 summaries (keyword, summary, chart_metadata)")
+    parser.add_argument("--json_dir", type=str, default=None, help="Step1 JSON dir for --join (default: OUTPUT_JSON_DIR)")
+    parser.add_argument("--summary_dir", type=str, default=None,
+                        help="Step2 summary dir for --join (default: OUTPUT_SUMMARY_DIR)")
     args = parser.parse_args()
-    run(Path(args.mmd_dir), Path(args.out_dir))
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    graph_json_dir = graph_summary_dir = None
+    if args.join:
+        from config import OUTPUT_JSON_DIR, OUTPUT_SUMMARY_DIR
+        graph_json_dir = Path(args.json_dir or OUTPUT_JSON_DIR)
+        graph_summary_dir = Path(args.summary_dir or OUTPUT_SUMMARY_DIR)
+    run(Path(args.mmd_dir), Path(args.out_dir), pattern=args.pattern, pages=parse_page_range(args.pages),
+        workers=workers, output_format=args.format, also_json=args.also_json, incremental=args.incremental,
+        graph_json_dir=graph_json_dir, graph_summary_dir=graph_summary_dir)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Step1+Step2 두 번 호출 vs 한 번 호출(STEP1_WITH_SUMMARY) 비교
+
+사용:
+    python compare_combined.py --image_dir ./data/images --limit 20 --out ./out/compare_combined.jsonl
+
+- 같은 이미지에 대해 두 경로를 모두 실행하고 이미지별 지연 시간(초)을 기록
+- 품질 지표(대리값):
+    kw_jaccard       : 두 경로 key_phrases 집합의 Jaccard 유사도
+    sent_ok          : 요약 문장 수가 SUMMARY_MIN_SENT~SUMMARY_MAX_SENT 범위인지
+    kw_coverage      : 요약 본문에 등장하는 key_phrases 비율
+    summary_sim      : 두 요약의 문자열 유사도(difflib)
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from config import BACKEND, SUMMARY_MIN_SENT, SUMMARY_MAX_SENT
+from vlm_client import infer_chart_metadata_from_image, generate_semantic_summary
+
+SUPPORTED_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+SENT_SPLIT_RE = re.compile(r"(?<=[.!?。])\s+|\n+")
+
+
+def _sentences(text: str) -> int:
+    return len([s for s in SENT_SPLIT_RE.split(text or "") if s.strip()])
+
+
+def _jaccard(a: List[str], b: List[str]) -> float:
+    sa = {x.strip().lower() for x in a if x.strip()}
+    sb = {x.strip().lower() for x in b if x.strip()}
+    if not sa and not sb:
+        return 1.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def _coverage(keywords: List[str], text: str) -> float:
+    if not keywords:
+        return 0.0
+    low = (text or "").lower()
+    return sum(1 for k in keywords if k.strip() and k.strip().lower() in low) / len(keywords)
+
+
+def _quality(keywords: List[str], summary: str) -> Dict[str, Any]:
+    n = _sentences(summary)
+    return {
+        "sentences": n,
+        "sent_ok": SUMMARY_MIN_SENT <= n <= SUMMARY_MAX_SENT,
+        "kw_coverage": round(_coverage(keywords, summary), 3),
+    }
+
+
+def run_two_call(image_path: str) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    meta, _, _, _ = infer_chart_metadata_from_image(image_path, with_summary=False)
+    t1 = time.perf_counter()
+    summary = ""
+    if meta.key_phrases:
+        summary, _ = generate_semantic_summary(image_path, meta.key_phrases)
+    t2 = time.perf_counter()
+    return {"sec": round(t2 - t0, 3), "step1_sec": round(t1 - t0, 3), "step2_sec": round(t2 - t1, 3),
+            "key_phrases": meta.key_phrases, "summary": summary}
+
+
+def run_combined(image_path: str) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    meta, _, _, timings = infer_chart_metadata_from_image(image_path, with_summary=True)
+    t1 = time.perf_counter()
+    return {"sec": round(t1 - t0, 3), "key_phrases": meta.key_phrases, "summary": meta.semantic_summary or "",
+            "keywords_retry": bool(timings.get("keywords_retry"))}
+
+
+def _mean(rows: List[Dict[str, Any]], key: str) -> float:
+    vals = [float(r[key]) for r in rows]
+    return sum(vals) / len(vals) if vals else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image_dir", type=str, required=True, help="Directory containing chart images")
+    parser.add_argument("--limit", type=int, default=0, help="Max images (0 = all)")
+    parser.add_argument("--out", type=str, default="./out/compare_combined.jsonl")
+    args = parser.parse_args()
+
+    images = sorted(str(p) for p in Path(args.image_dir).iterdir() if p.suffix.lower() in SUPPORTED_EXTS)
+    if args.limit > 0:
+        images = images[:args.limit]
+    if not images:
+        print(f"이미지가 없습니다: {args.image_dir}")
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    print(f"[Compare two-call vs combined] {len(images)} image(s)  (backend={BACKEND})")
+    rows = []
+    with open(args.out, "w", encoding="utf-8") as f:
+        for img in images:
+            print(f"  - {img}")
+            try:
+                two = run_two_call(img)
+                one = run_combined(img)
+            except Exception as e:
+                print(f"    * 실패: {e}")
+                continue
+            q_two = _quality(two["key_phrases"], two["summary"])
+            q_one = _quality(one["key_phrases"], one["summary"])
+            row = {
+                "image": img,
+                "two_call_sec": two["sec"],
+                "combined_sec": one["sec"],
+                "speedup": round(two["sec"] / one["sec"], 3) if one["sec"] > 0 else None,
+                "kw_jaccard": round(_jaccard(two["key_phrases"], one["key_phrases"]), 3),
+                "summary_sim": round(difflib.SequenceMatcher(None, two["summary"], one["summary"]).ratio(), 3),
+                "two_call": {**two, **q_two},
+                "combined": {**one, **q_one},
+            }
+            rows.append(row)
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            print(f"    + two-call {two['sec']:.2f}s (step1 {two['step1_sec']:.2f}s + step2 {two['step2_sec']:.2f}s)"
+                  f" | combined {one['sec']:.2f}s | kw_jaccard {row['kw_jaccard']:.2f}"
+                  f" | sent_ok {q_two['sent_ok']}/{q_one['sent_ok']}")
+
+    if not rows:
+        return
+    n = len(rows)
+    two_sec, one_sec = _mean(rows, "two_call_sec"), _mean(rows, "combined_sec")
+    print(f"\n[summary] {n} image(s) → {args.out}")
+    print(f"   latency   two-call {two_sec:.2f}s  combined {one_sec:.2f}s  "
+          f"(x{two_sec / one_sec if one_sec else 0:.2f})")
+    print(f"   kw_jaccard {_mean(rows, 'kw_jaccard'):.3f}  summary_sim {_mean(rows, 'summary_sim'):.3f}")
+    for name in ("two_call", "combined"):
+        sub = [r[name] for r in rows]
+        print(f"   {name:<9} sent_ok {sum(1 for r in sub if r['sent_ok'])}/{n}  "
+              f"kw_coverage {_mean(sub, 'kw_coverage'):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+프롬프트 변형(prompt_registry.py) 비교
+
+사용:
+    python compare_prompts.py tokens                                   # 변형별 프롬프트 토큰 수 (백엔드별 토크나이저)
+    python compare_prompts.py ab --image_dir ./data/images --limit 30 --variants v1,compact-v1
+
+- tokens: HF_MODEL_ID / OLLAMA_TOKENIZER_ID / OPENROUTER_TOKENIZER_ID 토크나이저로 각 프롬프트의 텍스트 토큰 수를 셉니다.
+          (이미지 토큰은 이미지 크기에 따라 달라 제외, transformers가 없으면 근사치 ≈)
+- ab    : 같은 이미지 표본에 대해 변형마다 Step1을 실행하고 (이미지마다 순서를 돌려 캐시 영향 완화)
+          지연, 실제 입력 토큰(응답 usage), JSON 파싱 성공률, 첫 변형 대비 구조 필드 일치율(json_agree)과
+          key_phrases Jaccard(kw_jaccard)를 기록
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from config import (
+    BACKEND, HF_MODEL_ID, HF_TRUST_REMOTE_CODE, OLLAMA_TOKENIZER_ID, OPENROUTER_TOKENIZER_ID,
+    KEYWORDS_MIN, KEYWORDS_MAX, SUMMARY_MIN_SENT, SUMMARY_MAX_SENT,
+)
+from prompt_registry import PROMPT_VARIANTS, get_variant
+
+SUPPORTED_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+TOKENIZER_IDS = {"hf": HF_MODEL_ID, "ollama": OLLAMA_TOKENIZER_ID, "openrouter": OPENROUTER_TOKENIZER_ID}
+# 요약 프롬프트 토큰 계산용 대표 키워드 (실제 호출은 Step1 결과를 사용)
+SAMPLE_KEYWORDS = ["염기도–점도 반비례", "온도 상승–점도 감소", "임계온도 1450℃", "최적 Al2O3 15–20%", "슬래그 유동성 곡선",
+                   "MgO 증가–유동성 개선", "CaO/SiO2 비–슬래그 점도", "고온 영역", "저온 점성 상승 구간", "탈황 효율–염기도 영향",
+                   "상변화 전이점", "혼합조성 비교"]
+STRUCT_FIELDS = [("is_chart",), ("chart_type",), ("orientation",), ("title", "text"), ("x_axis", "name"), ("x_axis", "unit"),
+                 ("y_axis", "name"), ("y_axis", "unit"), ("data_series_count",)]
+
+
+# =========================
+# Token counts
+# =========================
+
+def _approx_tokens(text: str) -> int:
+    # Qwen BPE 근사: 한글 음절 ≈ 1토큰, 그 외 비ASCII 문자 ≈ 1토큰, ASCII ≈ 4바이트당 1토큰
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+class TokenCounter:
+    def __init__(self, tokenizer_id: str):
+        self.tokenizer_id = tokenizer_id
+        self.tok = None
+        try:
+            from transformers import AutoTokenizer
+            self.tok = AutoTokenizer.from_pretrained(tokenizer_id, trust_remote_code=HF_TRUST_REMOTE_CODE)
+        except Exception as e:
+            print(f"[tokens] {tokenizer_id}: 토크나이저를 불러오지 못해 근사치 사용 ({e.__class__.__name__}: {e})")
+
+    @property
+    def exact(self) -> bool:
+        return self.tok is not None
+
+    def count(self, text: str) -> int:
+        if self.tok is None:
+            return _approx_tokens(text)
+        return len(self.tok(text, add_special_tokens=False)["input_ids"])
+
+    def count_chat(self, system: str, user: str) -> int:
+        # 채팅 템플릿 포함 (이미지 자리표시 토큰은 제외)
+        if self.tok is not None and getattr(self.tok, "chat_template", None):
+            messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+            return len(self.tok.apply_chat_template(messages, tokenize=True, add_generation_prompt=True))
+        return self.count(system) + self.count(user)
+
+
+def variant_prompts(name: str) -> Dict[str, tuple]:
+    v = get_variant(name)
+    return {
+        "step1": (v.system, v.make_user(KEYWORDS_MIN, KEYWORDS_MAX)),
+        "combined": (v.system, v.make_combined(KEYWORDS_MIN, KEYWORDS_MAX, SUMMARY_MIN_SENT, SUMMARY_MAX_SENT)),
+        "keywords_only": (v.system, v.make_keywords_only(KEYWORDS_MIN, KEYWORDS_MAX)),
+        "summary": (v.summary_system, v.make_summary(SAMPLE_KEYWORDS, SUMMARY_MIN_SENT, SUMMARY_MAX_SENT)),
+    }
+
+
+def cmd_tokens(args):
+    variants = args.variants.split(",") if args.variants else list(PROMPT_VARIANTS)
+    backends = args.backends.split(",")
+    # 같은 토크나이저를 쓰는 백엔드는 한 번만 계산
+    by_tok: Dict[str, List[str]] = {}
+    for b in backends:
+        by_tok.setdefault(TOKENIZER_IDS[b], []).append(b)
+    for tok_id, names in by_tok.items():
+        counter = TokenCounter(tok_id)
+        mark = "" if counter.exact else "≈"
+        print(f"\n[tokens] {tok_id}  (backend: {', '.join(names)}){'  근사치' if mark else ''}")
+        print(f"   {'variant':<14}{'prompt':<15}{'system':>8}{'user':>8}{'chat':>8}{'vs ' + variants[0]:>14}")
+        base: Dict[str, int] = {}
+        for name in variants:
+            for kind, (system, user) in variant_prompts(name).items():
+                chat = counter.count_chat(system, user)
+                base.setdefault(kind, chat)
+                delta = f"{100.0 * (chat - base[kind]) / base[kind]:+.1f}%" if base[kind] else "-"
+                cells = [f"{mark}{n}" for n in (counter.count(system), counter.count(user), chat)]
+                print(f"   {name:<14}{kind:<15}{cells[0]:>8}{cells[1]:>8}{cells[2]:>8}{delta:>14}")
+
+
+# =========================
+# A/B runs
+# =========================
+
+def _get(d: Dict[str, Any], path: tuple):
+    for key in path:
+        d = (d or {}).get(key)
+    return d.strip().lower() if isinstance(d, str) else d
+
+
+def _jaccard(a: List[str], b: List[str]) -> float:
+    sa = {x.strip().lower() for x in a if x.strip()}
+    sb = {x.strip().lower() for x in b if x.strip()}
+    if not sa and not sb:
+        return 1.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def _json_agree(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    same = sum(1 for f in STRUCT_FIELDS if _get(a, f) == _get(b, f))
+    la = {x.strip().lower() for x in ((a.get("legend") or {}).get("labels") or [])}
+    lb = {x.strip().lower() for x in ((b.get("legend") or {}).get("labels") or [])}
+    return (same + int(la == lb)) / (len(STRUCT_FIELDS) + 1)
+
+
+def run_variant(image_path: str, variant: str) -> Dict[str, Any]:
+    from schemas import to_json_dict
+    from vlm_client import infer_chart_metadata_from_image
+    t0 = time.perf_counter()
+    meta, _, _, timings = infer_chart_metadata_from_image(image_path, with_summary=False, variant=variant)
+    sec = time.perf_counter() - t0
+    return {"sec": round(sec, 3), "prompt_tokens": timings.get("prompt_tokens"),
+            "parse_ok": not timings.get("json_parse_error") or bool(timings.get("json_salvaged")),
+            "keywords_retry": bool(timings.get("keywords_retry")),
+            "kw_in_range": KEYWORDS_MIN <= len(meta.key_phrases) <= KEYWORDS_MAX,
+            "meta": to_json_dict(meta)}
+
+
+def _pct(vals: List[float], q: float) -> float:
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(round(q * (len(vals) - 1))))]
+
+
+def cmd_ab(args):
+    variants = args.variants.split(",")
+    for v in variants:
+        get_variant(v)
+    images = sorted(str(p) for p in Path(args.image_dir).iterdir() if p.suffix.lower() in SUPPORTED_EXTS)
+    if args.limit > 0:
+        images = images[:args.limit]
+    if not images:
+        print(f"이미지가 없습니다: {args.image_dir}")
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    print(f"[Prompt A/B] {len(images)} image(s) × {', '.join(variants)}  (backend={BACKEND}, baseline={variants[0]})")
+    rows = []
+    with open(args.out, "w", encoding="utf-8") as f:
+        for i, img in enumerate(images):
+            print(f"  - {img}")
+            results: Dict[str, Dict[str, Any]] = {}
+            order = variants[i % len(variants):] + variants[:i % len(variants)]
+            try:
+                for v in order:
+                    results[v] = run_variant(img, v)
+            except Exception as e:
+                print(f"    * 실패: {e}")
+                continue
+            base = results[variants[0]]["meta"]
+            for v in variants:
+                r = results[v]
+                r["json_agree"] = round(_json_agree(base, r["meta"]), 3)
+                r["kw_jaccard"] = round(_jaccard(base.get("key_phrases") or [], r["meta"].get("key_phrases") or []), 3)
+            row = {"image": img, "variants": results}
+            rows.append(row)
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            print("    + " + " | ".join(f"{v} {results[v]['sec']:.2f}s tok {results[v]['prompt_tokens']}"
+                                         f" agree {results[v]['json_agree']:.2f} kw {results[v]['kw_jaccard']:.2f}"
+                                         for v in variants))
+
+    if not rows:
+        return
+    n = len(rows)
+    print(f"\n[summary] {n} image(s) → {args.out}")
+    print(f"   {'variant':<14}{'mean s':>8}{'p95 s':>8}{'prompt tok':>12}{'parse_ok':>10}{'kw ok':>8}"
+          f"{'json_agree':>12}{'kw_jaccard':>12}")
+    for v in variants:
+        sub = [r["variants"][v] for r in rows]
+        secs = [x["sec"] for x in sub]
+        toks = [x["prompt_tokens"] for x in sub if x["prompt_tokens"] is not None]
+        print(f"   {v:<14}{sum(secs) / n:>8.2f}{_pct(secs, 0.95):>8.2f}"
+              f"{(f'{sum(toks) / len(toks):.0f}' if toks else '-'):>12}"
+              f"{sum(x['parse_ok'] for x in sub) / n:>10.2f}{sum(x['kw_in_range'] for x in sub) / n:>8.2f}"
+              f"{sum(x['json_agree'] for x in sub) / n:>12.3f}{sum(x['kw_jaccard'] for x in sub) / n:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_tok = sub.add_parser("tokens", help="변형별 프롬프트 토큰 수")
+    p_tok.add_argument("--variants", type=str, default="", help="쉼표 구분 (기본: 등록된 전체)")
+    p_tok.add_argument("--backends", type=str, default="hf,ollama,openrouter")
+    p_ab = sub.add_parser("ab", help="이미지 표본으로 변형별 Step1 A/B")
+    p_ab.add_argument("--image_dir", type=str, required=True)
+    p_ab.add_argument("--limit", type=int, default=0, help="Max images (0 = all)")
+    p_ab.add_argument("--variants", type=str, default="v1,compact-v1", help="쉼표 구분, 첫 번째가 기준")
+    p_ab.add_argument("--out", type=str, default="./out/compare_prompts.jsonl")
+    args = parser.parse_args()
+    if args.cmd == "tokens":
+        cmd_tokens(args)
+    else:
+        cmd_ab(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,26 @@ HF_TRUST_REMOTE_CODE = os.environ.get("HF_TRUST_REMOTE_CODE", "true").lower() ==
 HF_MAX_NEW_TOKENS = int(os.environ.get("HF_MAX_NEW_TOKENS", "512"))
 HF_USE_FLASH_ATTN = os.environ.get("HF_USE_FLASH_ATTN", "false").lower() == "true"
 HF_OFFLOAD_FOLDER = os.environ.get("HF_OFFLOAD_FOLDER", "")
+HF_IMAGE_MAX_SIDE = int(os.environ.get("HF_IMAGE_MAX_SIDE", "2048"))   # 긴 변 기준 입력 해상도 상한 (비전 토큰 수 결정)
+# N번째 HF 호출만 torch.profiler로 감싸 chrome trace 저장 (0=끔)
+HF_PROFILE_CALL = int(os.environ.get("HF_PROFILE_CALL", "0"))
+HF_PROFILE_DIR = os.environ.get("HF_PROFILE_DIR", "./out/profile")
+# 비전 타워 윈도 블록을 ONNX Runtime CPU로 실행 (onnx_vision.py, 처음 한 번 export 후 캐시)
+HF_VISION_ONNX = os.environ.get("HF_VISION_ONNX", "false").lower() == "true"
+HF_VISION_ONNX_DIR = os.environ.get("HF_VISION_ONNX_DIR", "./out/onnx_vision")
+HF_VISION_ONNX_THREADS = int(os.environ.get("HF_VISION_ONNX_THREADS", "0"))   # 0 = onnxruntime 기본값
+# 정적 KV 캐시 + torch.compile decode 단계 (로드 시 버킷별 warm-up). 버킷 = 프롬프트+HF_MAX_NEW_TOKENS 캐시 길이
+HF_COMPILE = os.environ.get("HF_COMPILE", "false").lower() == "true"
+HF_COMPILE_BUCKETS = os.environ.get("HF_COMPILE_BUCKETS", "2048,4096,8192")
+HF_COMPILE_MODE = os.environ.get("HF_COMPILE_MODE", "")   # 비우면 CUDA: reduce-overhead, 그 외: default
+# 현재 이미지를 generate하는 동안 다음 K장의 디코드/템플릿/텐서화를 스레드 풀에서 준비 (0=끔, runner.py)
+HF_PREFETCH = int(os.environ.get("HF_PREFETCH", "0"))
+HF_PREFETCH_WORKERS = int(os.environ.get("HF_PREFETCH_WORKERS", "2"))
 
 # Ollama
 OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "qwen2.5vl:3b")
+OLLAMA_TOKENIZER_ID = os.environ.get("OLLAMA_TOKENIZER_ID", HF_MODEL_ID)    # 프롬프트 토큰 계산용 (compare_prompts.py)
 
 # OpenRouter
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
@@ -23,16 +39,44 @@ OPENROUTER_BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.
 OPENROUTER_HTTP_REFERER = os.environ.get("OPENROUTER_HTTP_REFERER", "https://example.com")
 OPENROUTER_TITLE = os.environ.get("OPENROUTER_TITLE", "RAG Chart Analyzer")
 OPENROUTER_FORCE_JSON = os.environ.get("OPENROUTER_FORCE_JSON", "true").lower() == "true"
+OPENROUTER_TOKENIZER_ID = os.environ.get("OPENROUTER_TOKENIZER_ID", HF_MODEL_ID)  # 프롬프트 토큰 계산용 (compare_prompts.py)
+
+# Hedging (ollama/openrouter): 1차 요청이 최근 지연의 HEDGE_PERCENTILE 분위수를 넘기면 복제 요청을 보내 먼저 온 유효 응답 사용
+HEDGE_ENABLE = os.environ.get("HEDGE_ENABLE", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MAX_RATIO = float(os.environ.get("HEDGE_MAX_RATIO", "0.05"))    # 복제 요청 수 / 전체 호출 수 상한
+HEDGE_TARGETS = os.environ.get("HEDGE_TARGETS", "")   # 쉼표 구분 ollama@<host> | openrouter@<model> (비우면 같은 엔드포인트로 복제)
+HEDGE_WARMUP = int(os.environ.get("HEDGE_WARMUP", "20"))              # 분위수를 쓰기 전 최소 표본 수
+HEDGE_INITIAL_SEC = float(os.environ.get("HEDGE_INITIAL_SEC", "60"))  # 표본이 모이기 전 복제 대기 시간
+
+# Cascade: Step1을 BACKEND(저비용 모델)로 먼저 돌리고 기준 미달 결과만 CASCADE_BACKEND로 다시 실행 (비우면 끔)
+CASCADE_BACKEND = os.environ.get("CASCADE_BACKEND", "").lower()              # ollama | openrouter | hf
+CASCADE_MIN_CONFIDENCE = float(os.environ.get("CASCADE_MIN_CONFIDENCE", "0.5"))
+CASCADE_MIN_KEYWORDS = int(os.environ.get("CASCADE_MIN_KEYWORDS", "5"))      # 차트인데 key_phrases가 이보다 적으면 승격
+CASCADE_QUALITY_FLAGS = [f.strip() for f in os.environ.get("CASCADE_QUALITY_FLAGS", "cropped_or_cutoff").split(",") if f.strip()]
 
 # Input
-INPUT_MODE = os.environ.get("INPUT_MODE", "folder").lower()   # folder | single
+INPUT_MODE = os.environ.get("INPUT_MODE", "folder").lower()   # folder | single | pdf | queue
 INPUT_IMAGE_DIR = os.environ.get("INPUT_IMAGE_DIR", "./data/images")
 INPUT_IMAGE_PATH = os.environ.get("INPUT_IMAGE_PATH", "./data/sample.png")
+INPUT_PDF_DIR = os.environ.get("INPUT_PDF_DIR", "./data/docs")                 # INPUT_MODE=pdf
+PDF_OCR_DIR = os.environ.get("PDF_OCR_DIR", "./data/output")                   # deepseek-ocr.py 출력(grounding 박스)
+PDF_FIGURE_MIN_SIDE = int(os.environ.get("PDF_FIGURE_MIN_SIDE", "128"))
+PDF_FIGURE_DPI = int(os.environ.get("PDF_FIGURE_DPI", "200"))                  # 벡터 그림 영역 clip 렌더 DPI
+INPUT_QUEUE_FILE = os.environ.get("INPUT_QUEUE_FILE", "./out/final/step1_queue.txt")  # INPUT_MODE=queue (build_final_jsons --join)
+SHARD = os.environ.get("SHARD", "")    # "i/N": 상대 경로 해시로 N대 중 i번째 몫만 처리 (runner.py/runner_summary.py --shard)
 
 # Output
 OUTPUT_JSON_DIR = os.environ.get("OUTPUT_JSON_DIR", "./out/json")
 OUTPUT_RAW_DIR = os.environ.get("OUTPUT_RAW_DIR", "./out/raw")
 OUTPUT_SUMMARY_DIR = os.environ.get("OUTPUT_SUMMARY_DIR", "./out/summary")
+OUTPUT_FIGURE_DIR = os.environ.get("OUTPUT_FIGURE_DIR", "./out/figures")       # PDF에서 추출한 그림
+OUTPUT_INDEX_DIR = os.environ.get("OUTPUT_INDEX_DIR", "./out/index")           # key_phrases 역색인 (keyword_index.py)
+INDEX_MAX_SEGMENTS = int(os.environ.get("INDEX_MAX_SEGMENTS", "8"))            # 넘으면 전체 재구성
+OUTPUT_VECTOR_DIR = os.environ.get("OUTPUT_VECTOR_DIR", "./out/vindex")        # 요약/본문 청크 벡터 색인 (vector_index.py)
+VECTOR_EMBEDDER = os.environ.get("VECTOR_EMBEDDER", "hashing")  # hashing | st:<로컬 모델 경로> | <모듈>:<팩토리>
+VECTOR_DIM = int(os.environ.get("VECTOR_DIM", "1024"))          # hashing 임베더 차원
+VECTOR_BATCH = int(os.environ.get("VECTOR_BATCH", "64"))
 
 # Behavior
 SAVE_NON_CHART_JSON = True
@@ -43,6 +87,10 @@ KEYWORDS_MIN = int(os.environ.get("KEYWORDS_MIN", "10"))
 KEYWORDS_MAX = int(os.environ.get("KEYWORDS_MAX", "15"))
 SUMMARY_MIN_SENT = int(os.environ.get("SUMMARY_MIN_SENT", "3"))
 SUMMARY_MAX_SENT = int(os.environ.get("SUMMARY_MAX_SENT", "6"))
+# Step1 호출 한 번에 의미 요약까지 생성 → out/summary/*.summary.txt를 바로 저장 (runner_summary.py 생략 가능)
+STEP1_WITH_SUMMARY = os.environ.get("STEP1_WITH_SUMMARY", "false").lower() == "true"
+# 프롬프트 변형 (prompt_registry.py: v1 | compact-v1), compare_prompts.py로 토큰 수/품질 비교 후 선택
+PROMPT_VARIANT = os.environ.get("PROMPT_VARIANT", "v1")
 
 # Debug
 DEBUG = os.environ.get("DEBUG", "true").lower() == "true"
@@ -50,4 +98,33 @@ DEBUG_TRACE = os.environ.get("DEBUG_TRACE", "true").lower() == "true"
 
 
 # Deepseek-OCR-2
-DEEPSEEK_MODEL_ID = os.environ.get("DEEPSEEK_MODEL_ID", "/workspace/models/DeepSeek-OCR-2")
\ No newline at end of file
+DEEPSEEK_MODEL_ID = os.environ.get("DEEPSEEK_MODEL_ID", "/workspace/models/DeepSeek-OCR-2")
+DEEPSEEK_RENDER_WORKERS = int(os.environ.get("DEEPSEEK_RENDER_WORKERS", "2"))    # 페이지 렌더 프로세스 수
+DEEPSEEK_PREFETCH_PAGES = int(os.environ.get("DEEPSEEK_PREFETCH_PAGES", "4"))    # 미리 렌더해 둘 최대 페이지 수(메모리 상한)
+DEEPSEEK_SAVE_PAGE_PNG = os.environ.get("DEEPSEEK_SAVE_PAGE_PNG", "true").lower() == "true"
+DEEPSEEK_SCRATCH_DIR = os.environ.get("DEEPSEEK_SCRATCH_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else "")
+DEEPSEEK_WORKERS = int(os.environ.get("DEEPSEEK_WORKERS", "1"))                  # OCR 워커 프로세스 수(각자 모델 로드)
+DEEPSEEK_GPUS = os.environ.get("DEEPSEEK_GPUS", "0")                              # 워커에 순서대로 배정할 GPU 목록 (예: "0,1")
+DEEPSEEK_SHARD_PAGES = int(os.environ.get("DEEPSEEK_SHARD_PAGES", "32"))          # 워커 작업 단위 (PDF, 페이지 범위) 크기
+DEEPSEEK_MD_FSYNC_PAGES = int(os.environ.get("DEEPSEEK_MD_FSYNC_PAGES", "8"))    # 최종 md를 N페이지마다 fsync(+인덱스 갱신)
+# 빈 페이지 스킵 + 페이지별 DPI/crop 선택 (켜면 OCR 결과가 고정 DPI 실행과 달라지므로 기본 꺼짐, pipeline.py는 PIPELINE_OCR_ADAPTIVE)
+DEEPSEEK_ADAPTIVE = os.environ.get("DEEPSEEK_ADAPTIVE", "false").lower() == "true"
+DEEPSEEK_DPI_SPARSE = int(os.environ.get("DEEPSEEK_DPI_SPARSE", "150"))
+DEEPSEEK_DPI_DENSE = int(os.environ.get("DEEPSEEK_DPI_DENSE", "300"))
+
+# Pipeline orchestrator (pipeline.py): PDF → OCR → 그림 추출 → Step1 → Step2 → final JSON
+PIPELINE_OCR_ADAPTIVE = os.environ.get("PIPELINE_OCR_ADAPTIVE", "true").lower() == "true"  # pipeline.py OCR 단계의 DEEPSEEK_ADAPTIVE
+PIPELINE_OCR_WORKERS = int(os.environ.get("PIPELINE_OCR_WORKERS", "1"))         # 워커마다 DeepSeek-OCR 모델을 따로 로드 (보이는 GPU 수까지만, 장치당 하나)
+PIPELINE_FIGURE_WORKERS = int(os.environ.get("PIPELINE_FIGURE_WORKERS", "2"))
+PIPELINE_STEP1_WORKERS = int(os.environ.get("PIPELINE_STEP1_WORKERS", "1"))
+PIPELINE_STEP2_WORKERS = int(os.environ.get("PIPELINE_STEP2_WORKERS", "1"))
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "16"))           # 단계 사이 큐 상한 (backpressure)
+PIPELINE_PROGRESS_SEC = float(os.environ.get("PIPELINE_PROGRESS_SEC", "10"))    # 진행 상황 출력 주기
+PIPELINE_OUT_DIR = os.environ.get("PIPELINE_OUT_DIR", "./out")                    # final/*.json 출력 위치
+
+# Word → PDF 변환 (doc2pdf.py): 프로필을 따로 둔 상주 LibreOffice 워커 N개
+DOC2PDF_WORKERS = int(os.environ.get("DOC2PDF_WORKERS", "4"))
+DOC2PDF_TIMEOUT_SEC = float(os.environ.get("DOC2PDF_TIMEOUT_SEC", "120"))        # 문서 하나 변환 제한 (넘으면 워커 재시작)
+DOC2PDF_SOFFICE = os.environ.get("DOC2PDF_SOFFICE", "soffice")
+DOC2PDF_UNO_PYTHON = os.environ.get("DOC2PDF_UNO_PYTHON", "python3")            # uno 모듈이 있는 파이썬 (예: python3-uno)
+DOC2PDF_MAX_DOCS_PER_WORKER = int(os.environ.get("DOC2PDF_MAX_DOCS_PER_WORKER", "200"))  # 메모리 누적 방지용 주기적 재시작
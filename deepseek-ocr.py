@@ -1,31 +1,29 @@
 from pathlib import Path
-import fitz
-from transformers import AutoModel, AutoTokenizer
-from contextlib import redirect_stdout
-import torch
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import multiprocessing as mp
 from tqdm import tqdm
-import io
+import tempfile
+import threading
+import time
+import sys
 import os
 import re
 
-from config import DEEPSEEK_MODEL_ID
+from config import (
+    DEEPSEEK_MODEL_ID,
+    DEEPSEEK_RENDER_WORKERS, DEEPSEEK_PREFETCH_PAGES, DEEPSEEK_SAVE_PAGE_PNG, DEEPSEEK_SCRATCH_DIR,
+    DEEPSEEK_WORKERS, DEEPSEEK_GPUS, DEEPSEEK_SHARD_PAGES, DEEPSEEK_MD_FSYNC_PAGES,
+    DEEPSEEK_ADAPTIVE, DEEPSEEK_DPI_SPARSE, DEEPSEEK_DPI_DENSE,
+)
+from pdf_render import render_page
+from md_pages import PagedMarkdownWriter, load_page_index
 
-os.environ["CUDA_VISIBLE_DEVICES"] = "0"
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "0")
 
 model_name = DEEPSEEK_MODEL_ID
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-dtype = torch.bfloat16 if device.type == "cuda" else torch.float32
-
-tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
-model = AutoModel.from_pretrained(
-    model_name,
-    trust_remote_code=True,
-    torch_dtype=dtype,
-    attn_implementation="flash_attention_2",
-    device_map="cuda" if device.type == "cuda" else None,
-    use_safetensors=True,
-)
-model = model.to(device).eval()
 
 
 prompt = "<image>\n<|grounding|>Convert the document to markdown. The layout of the document may show both sides in one image or just one page in a image. \
@@ -37,31 +35,170 @@ prompt = "<image>\n<|grounding|>Convert the document to markdown. The layout of
 # -----------------------------------
 # pdf_path = Path("/root/graph_parsing/data/docs/Iron Making Text Book 2008.pdf")
 docs_dir = Path("/root/graph_parsing/data/docs")
-pdf_paths = sorted(docs_dir.glob("*.pdf"))
-if not pdf_paths:
-    raise FileNotFoundError(f"No PDF files found in: {docs_dir}")
 
 
 # 👉 페이지 범위 설정 (1-index 기준)
 START_PAGE = None     # None이면 처음부터
 END_PAGE = None     # None이면 끝까지
 
-DPI = 200 
-ZOOM = DPI / 72.0
+DPI = 200
+
+# 👉 페이지 유형별 렌더/추론 설정 (DEEPSEEK_ADAPTIVE=true 또는 process_shard(adaptive=True)일 때, blank 페이지는 OCR 생략)
+#    sparse: 글자가 적은 페이지 → 낮은 DPI + 전역 뷰만(crop 없음)
+#    dense : 표/그림/도면이 많은 페이지 → 높은 DPI + crop
+PAGE_PROFILES = {
+    "sparse": {"dpi": DEEPSEEK_DPI_SPARSE, "crop_mode": False},
+    "normal": {"dpi": DPI, "crop_mode": True},
+    "dense": {"dpi": DEEPSEEK_DPI_DENSE, "crop_mode": True},
+}
 
 base_output_dir = Path("data/output")
-base_output_dir.mkdir(parents=True, exist_ok=True)
 
-for pdf_path in tqdm(pdf_paths, desc="Processing PDFs"):
-    pdf_stem = pdf_path.stem
-    output_root = base_output_dir / pdf_stem
-    output_root.mkdir(parents=True, exist_ok=True)
+# model.infer가 저장한 그림 크롭 링크(images/N.jpg)는 page_XXXX/ 기준 → 문서 md(출력 루트) 기준으로 바꿔 체크포인트에 저장
+# (build_final_jsons --join이 이 링크로 pdf_figures가 Step1에 넘긴 같은 크롭 파일을 찾음)
+PAGE_IMAGE_LINK_RE = re.compile(r"(!\[[^\]]*\]\()images/")
+
+# (pdf_path, start_page, end_page) — 페이지 번호는 1-index, end 포함
+Shard = Tuple[Path, int, int]
+
+
+def load_model(device: Optional[str] = None):
+    # device: "cuda:N" 등 (None이면 기본 GPU, 없으면 CPU) — pipeline.py OCR 워커는 장치마다 하나씩
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+    dtype = torch.bfloat16 if device.type == "cuda" else torch.float32
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+    model = AutoModel.from_pretrained(
+        model_name,
+        trust_remote_code=True,
+        torch_dtype=dtype,
+        attn_implementation="flash_attention_2",
+        device_map=str(device) if device.type == "cuda" else None,
+        use_safetensors=True,
+    )
+    model = model.to(device).eval()
+    return model, tokenizer
+
+
+class _ThreadMutedStdout:
+    """
+    sys.stdout 대체: muted에 등록된 스레드의 출력만 버리고 나머지는 원래 스트림으로 보냄
+    - redirect_stdout은 프로세스 전체의 sys.stdout을 바꾸므로 pipeline.py의 다른 스레드 로그까지 가리고,
+      여러 스레드가 겹쳐 들어가고 나오면 이미 닫힌 스트림이 복원될 수 있음 → 한 번만 설치하고 스레드 단위로 음소거
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.muted = set()
+
+    def write(self, s):
+        if threading.get_ident() in self.muted:
+            return len(s)
+        return self.stream.write(s)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+_MUTE_LOCK = threading.Lock()
+
+
+@contextmanager
+def _mute_stdout():
+    # model.infer의 print 출력만 숨김 (현재 스레드 한정)
+    with _MUTE_LOCK:
+        if not isinstance(sys.stdout, _ThreadMutedStdout):
+            sys.stdout = _ThreadMutedStdout(sys.stdout)
+        out = sys.stdout
+    tid = threading.get_ident()
+    out.muted.add(tid)
+    try:
+        yield
+    finally:
+        out.muted.discard(tid)
+
+
+def ocr_page(model, tokenizer, image_file: str, page_out_dir: Path, crop_mode: bool = True) -> str:
+    with _mute_stdout():
+        res = model.infer(
+            tokenizer,
+            prompt=prompt,
+            image_file=image_file,
+            output_path=str(page_out_dir),
+            base_size=1024,
+            image_size=768,
+            crop_mode=crop_mode,
+            save_results=True,
+        )
+
+    if isinstance(res, str):
+        return res
+    return getattr(res, "text", None) or repr(res)
+
+
+def rebase_image_links(page_md: str, page_dir: str) -> str:
+    return PAGE_IMAGE_LINK_RE.sub(lambda m: f"{m.group(1)}{page_dir}/images/", page_md)
+
+
+def print_stage_report(pdf_name: str, stage_sec: dict, n_pages: int, wall_sec: float):
+    # render/png/encode는 렌더 워커에서 병렬로 소비된 시간, wait는 모델이 렌더를 기다린 시간
+    print(f"⏱️ Stage timing ({pdf_name}, {n_pages} pages, wall {wall_sec:.1f}s)")
+    for key in ("analyze", "render", "png", "encode", "wait", "scratch", "infer"):
+        sec = stage_sec.get(key, 0.0)
+        per_page = sec / n_pages if n_pages else 0.0
+        print(f"   - {key:<8}: {sec:8.2f}s  ({per_page:.3f}s/page)")
+    if wall_sec > 0:
+        print(f"   - GPU busy : {100.0 * stage_sec.get('infer', 0.0) / wall_sec:.1f}%  "
+              f"({60.0 * n_pages / wall_sec:.1f} pages/min)")
+
+
+def print_adaptive_report(kind_count: dict, kind_sec: dict):
+    # 절감량 추정: 모든 페이지를 normal 설정으로 돌렸을 때의 추론 시간 대비
+    inferred = sum(kind_count[k] for k in PAGE_PROFILES)
+    if not inferred:
+        base = 0.0
+    elif kind_count["normal"]:
+        base = kind_sec["normal"] / kind_count["normal"]
+    else:
+        base = sum(kind_sec.values()) / inferred
+    total_pages = inferred + kind_count["blank"]
+    actual = sum(kind_sec.values())
+    print("🧮 Adaptive pages: " + ", ".join(f"{k} {kind_count[k]}" for k in ("blank", *PAGE_PROFILES)))
+    print(f"   - skipped (blank): {kind_count['blank']}")
+    print(f"   - GPU seconds saved (est.): {total_pages * base - actual:.1f}s "
+          f"(baseline {total_pages * base:.1f}s @ {base:.2f}s/page, actual {actual:.1f}s)")
+
+
+# -----------------------------------
+# 🔹 페이지 체크포인트
+# -----------------------------------
+def output_root_for(pdf_path: Path) -> Path:
+    return base_output_dir / pdf_path.stem
+
+
+def page_result_path(output_root: Path, page_number: int) -> Path:
+    return output_root / f"page_{page_number:04d}.md"
 
-    print(f"\n📄 PDF: {pdf_path}")
-    print(f"📂 Output directory: {output_root.resolve()}")
 
-    doc = fitz.open(pdf_path)
-    total_pages = len(doc)
+def save_page_result(output_root: Path, page_number: int, page_md: str):
+    # 중간에 죽어도 반쯤 쓴 파일이 "완료"로 보이지 않도록 임시 파일 → rename
+    path = page_result_path(output_root, page_number)
+    tmp_path = path.with_suffix(".md.tmp")
+    tmp_path.write_text(page_md, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def resolve_page_range(pdf_path: Path) -> Tuple[int, int]:
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        total_pages = len(doc)
 
     # 페이지 범위 보정 (문서별로 total_pages 반영)
     start_page = 1 if START_PAGE is None else START_PAGE
@@ -71,47 +208,237 @@ for pdf_path in tqdm(pdf_paths, desc="Processing PDFs"):
         raise ValueError(
             f"Invalid page range for {pdf_path.name}: {start_page}~{end_page} (Total pages: {total_pages})"
         )
+    return start_page, end_page
+
+
+def plan_shards(pdf_paths: List[Path], shard_pages: int) -> List[Shard]:
+    shards: List[Shard] = []
+    for pdf_path in pdf_paths:
+        start_page, end_page = resolve_page_range(pdf_path)
+        for s in range(start_page, end_page + 1, max(1, shard_pages)):
+            shards.append((pdf_path, s, min(end_page, s + shard_pages - 1)))
+    return shards
+
+
+def process_shard(shard: Shard, model, tokenizer, pool: ProcessPoolExecutor, scratch_dir: str,
+                  assembler: Optional["MarkdownAssembler"] = None, adaptive: bool = DEEPSEEK_ADAPTIVE):
+    pdf_path, start_page, end_page = shard
+    pdf_stem = pdf_path.stem
+    output_root = output_root_for(pdf_path)
+    output_root.mkdir(parents=True, exist_ok=True)
 
-    print(f"📄 Processing pages {start_page} ~ {end_page} / {total_pages}")
+    # 재시작 시 이미 결과가 있는 페이지는 렌더/추론 모두 건너뜀
+    todo = [p for p in range(start_page, end_page + 1) if not page_result_path(output_root, p).exists()]
+    skipped = (end_page - start_page + 1) - len(todo)
+    print(f"\n📄 PDF: {pdf_path}  pages {start_page} ~ {end_page}  (done: {skipped}, todo: {len(todo)})")
+    if assembler is not None:
+        assembler.advance(pdf_path)
+    if not todo:
+        return
 
-    start_idx = start_page - 1
-    end_idx = end_page  # range 끝 미포함
+    profile_dpi = {k: v["dpi"] for k, v in PAGE_PROFILES.items()} if adaptive else None
 
-    all_markdown = []
+    def submit(page_number: int):
+        png_path = None
+        if DEEPSEEK_SAVE_PAGE_PNG:
+            png_path = str(output_root / f"page_{page_number:04d}.png")
+        return pool.submit(render_page, str(pdf_path), page_number - 1, DPI, png_path, profile_dpi)
 
-    for page_idx in tqdm(range(start_idx, end_idx), desc=f"Pages ({pdf_path.name})", leave=False):
-        page = doc.load_page(page_idx)
+    # 렌더 워커가 최대 DEEPSEEK_PREFETCH_PAGES장까지 앞서 렌더링 (bounded queue)
+    page_numbers = iter(todo)
+    pending = deque()
+    for page_number in page_numbers:
+        pending.append(submit(page_number))
+        if len(pending) >= max(1, DEEPSEEK_PREFETCH_PAGES):
+            break
 
-        mat = fitz.Matrix(ZOOM, ZOOM)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
+    stage_sec = defaultdict(float)
+    kind_count = defaultdict(int)
+    kind_sec = defaultdict(float)
+    t_start = time.perf_counter()
 
-        page_number = page_idx + 1
-        page_img_path = output_root / f"page_{page_number:04d}.png"
-        pix.save(str(page_img_path))
+    for _ in tqdm(todo, desc=f"Pages ({pdf_path.name} {start_page}-{end_page})", leave=False):
+        t0 = time.perf_counter()
+        rendered = pending.popleft().result()
+        stage_sec["wait"] += time.perf_counter() - t0
+        next_page = next(page_numbers, None)
+        if next_page is not None:
+            pending.append(submit(next_page))
+
+        for key in ("analyze", "render", "png", "encode"):
+            stage_sec[key] += rendered[f"{key}_sec"]
+
+        page_number = rendered["page_idx"] + 1
+        kind = (rendered["analysis"] or {}).get("kind", "normal")
+        kind_count[kind] += 1
+        if kind == "blank":
+            # 빈 페이지는 OCR 없이 빈 결과로 체크포인트 → 병합 시 마커만 남음
+            save_page_result(output_root, page_number, "")
+            if assembler is not None:
+                assembler.advance(pdf_path)
+            continue
 
         page_out_dir = output_root / f"page_{page_number:04d}"
         page_out_dir.mkdir(parents=True, exist_ok=True)
 
-        with open(os.devnull, "w") as fnull:
-            with redirect_stdout(fnull):
-                res = model.infer(
-                    tokenizer,
-                    prompt=prompt,
-                    image_file=str(page_img_path),
-                    output_path=str(page_out_dir),
-                    base_size=1024,
-                    image_size=768,
-                    crop_mode=True,
-                    save_results=True,
-                )
-
-        if isinstance(res, str):
-            page_md = res
+        # model.infer는 파일 경로만 받으므로, PNG를 저장하지 않는 경우 메모리 이미지를 tmpfs 스크래치 파일로 넘김
+        scratch_path = None
+        t1 = time.perf_counter()
+        if rendered["png_path"]:
+            image_file = rendered["png_path"]
         else:
-            page_md = getattr(res, "text", None) or repr(res)
+            fd, scratch_path = tempfile.mkstemp(suffix=".ppm", prefix=f"{pdf_stem}_p{page_number:04d}_",
+                                                dir=scratch_dir or None)
+            with os.fdopen(fd, "wb") as f:
+                f.write(rendered["image_bytes"])
+            image_file = scratch_path
+        rendered["image_bytes"] = None
+        t2 = time.perf_counter()
+        stage_sec["scratch"] += t2 - t1
+
+        try:
+            page_md = ocr_page(model, tokenizer, image_file, page_out_dir,
+                               crop_mode=PAGE_PROFILES.get(kind, PAGE_PROFILES["normal"])["crop_mode"])
+        finally:
+            if scratch_path:
+                os.remove(scratch_path)
+        infer_sec = time.perf_counter() - t2
+        stage_sec["infer"] += infer_sec
+        kind_sec[kind] += infer_sec
+
+        save_page_result(output_root, page_number, rebase_image_links(page_md, page_out_dir.name))
+        if assembler is not None:
+            assembler.advance(pdf_path)
+
+    print_stage_report(f"{pdf_path.name} {start_page}-{end_page}", stage_sec, len(todo),
+                       time.perf_counter() - t_start)
+    if adaptive:
+        print_adaptive_report(kind_count, kind_sec)
+
+
+def run_worker(worker_id: int, shards: List[Shard], gpu: str = "", assembler: Optional["MarkdownAssembler"] = None):
+    # torch import 전에 GPU를 고정해야 워커별로 다른 장치를 사용
+    if gpu:
+        os.environ["CUDA_VISIBLE_DEVICES"] = gpu
+
+    pool = ProcessPoolExecutor(max_workers=max(1, DEEPSEEK_RENDER_WORKERS), mp_context=mp.get_context("spawn"))
+    try:
+        model, tokenizer = load_model()
+        for shard in tqdm(shards, desc=f"Worker {worker_id} shards", position=worker_id):
+            process_shard(shard, model, tokenizer, pool, DEEPSEEK_SCRATCH_DIR, assembler)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# -----------------------------------
+# 🔹 병합 (스트리밍)
+# -----------------------------------
+class MarkdownAssembler:
+    """
+    page_XXXX.md 체크포인트를 페이지 순서대로 최종 md에 스트리밍으로 이어 붙입니다.
+    - 앞에서부터 연속으로 완료된 페이지까지만 append → 부분 결과도 순서가 보장됨
+    - 최종 md 옆에 페이지별 byte offset 인덱스(<md>.index.json)를 함께 유지
+    """
+
+    def __init__(self, fsync_every: int):
+        self.fsync_every = fsync_every
+        self._state: Dict[Path, dict] = {}
+        self._done = set()
+
+    def _init_state(self, pdf_path: Path):
+        start_page, end_page = resolve_page_range(pdf_path)
+        output_root = output_root_for(pdf_path)
+        md_path = output_root / f"{pdf_path.stem}_{start_page}-{end_page}.md"
+
+        # 이전 실행에서 이미 완성된 md는 다시 쓰지 않음
+        index = load_page_index(md_path)
+        if (index and index.get("complete") and md_path.exists()
+                and (index.get("start_page"), index.get("end_page")) == (start_page, end_page)
+                and md_path.stat().st_size == sum(e["length"] for e in index.get("pages", []))):
+            self._done.add(pdf_path)
+            return None
+
+        state = {"output_root": output_root, "md_path": md_path, "writer": None,
+                 "next": start_page, "start": start_page, "end": end_page}
+        self._state[pdf_path] = state
+        return state
+
+    def advance(self, pdf_path: Path) -> bool:
+        if pdf_path in self._done:
+            return True
+        state = self._state.get(pdf_path) or self._init_state(pdf_path)
+        if state is None:
+            return True
+
+        while state["next"] <= state["end"]:
+            path = page_result_path(state["output_root"], state["next"])
+            if not path.exists():
+                break
+            if state["writer"] is None:
+                state["writer"] = PagedMarkdownWriter(state["md_path"], state["start"], state["end"], self.fsync_every)
+            state["writer"].append(state["next"], path.read_text(encoding="utf-8"))
+            state["next"] += 1
+
+        if state["next"] > state["end"]:
+            state["writer"].close(complete=True)
+            del self._state[pdf_path]
+            self._done.add(pdf_path)
+            print(f"✅ Done. Saved to: {state['md_path'].resolve()}")
+            return True
+        return False
+
+    def close(self):
+        # 미완성 PDF는 부분 md + complete=false 인덱스로 남김
+        for pdf_path, state in self._state.items():
+            if state["writer"] is not None:
+                state["writer"].close(complete=False)
+            output_root = state["output_root"]
+            missing = [p for p in range(state["next"], state["end"] + 1) if not page_result_path(output_root, p).exists()]
+            print(f"⚠️ {pdf_path.name}: {len(missing)} page(s) missing (e.g. {missing[:10]}) → partial md up to "
+                  f"page {state['next'] - 1}, rerun to resume")
+        self._state.clear()
+
+
+def main():
+    pdf_paths = sorted(docs_dir.glob("*.pdf"))
+    if not pdf_paths:
+        raise FileNotFoundError(f"No PDF files found in: {docs_dir}")
+
+    base_output_dir.mkdir(parents=True, exist_ok=True)
+
+    shards = plan_shards(pdf_paths, DEEPSEEK_SHARD_PAGES)
+    num_workers = max(1, min(DEEPSEEK_WORKERS, len(shards)))
+    gpus = [g.strip() for g in DEEPSEEK_GPUS.split(",") if g.strip()]
+    print(f"🧩 {len(pdf_paths)} PDF(s), {len(shards)} shard(s), {num_workers} worker(s), GPUs={gpus or ['default']}")
+
+    # 샤드 i → 워커 i % N (PDF/페이지 순서대로 고르게 분산)
+    assignments = [shards[w::num_workers] for w in range(num_workers)]
+
+    assembler = MarkdownAssembler(DEEPSEEK_MD_FSYNC_PAGES)
+    if num_workers == 1:
+        run_worker(0, assignments[0], assembler=assembler)
+    else:
+        ctx = mp.get_context("spawn")
+        procs = []
+        for w in range(num_workers):
+            gpu = gpus[w % len(gpus)] if gpus else ""
+            p = ctx.Process(target=run_worker, args=(w, assignments[w], gpu), name=f"ocr-worker-{w}")
+            p.start()
+            procs.append(p)
+        # 워커가 도는 동안에도 완료된 페이지를 주기적으로 최종 md에 반영
+        while any(p.is_alive() for p in procs):
+            for p in procs:
+                p.join(timeout=5.0)
+            for pdf_path in pdf_paths:
+                assembler.advance(pdf_path)
+        failed = [p.name for p in procs if p.exitcode != 0]
+        if failed:
+            print(f"⚠️ Worker(s) failed: {failed} — 완료된 페이지는 보존되며 재실행 시 이어서 처리합니다.")
+
+    merged = sum(assembler.advance(pdf_path) for pdf_path in pdf_paths)
+    assembler.close()
+    print(f"📚 Merged {merged}/{len(pdf_paths)} PDF(s)")
 
-        all_markdown.append(f"\n\n<!-- Page {page_number} -->\n\n{page_md}")
 
-    final_md_path = output_root / f"{pdf_stem}_{start_page}-{end_page}.md"
-    final_md_path.write_text("".join(all_markdown), encoding="utf-8")
-    print(f"✅ Done. Saved to: {final_md_path.resolve()}")
+if __name__ == "__main__":
+    main()
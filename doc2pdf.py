@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+Word(.doc/.docx) → PDF 일괄 변환: 상주 LibreOffice 워커 풀
+
+사용:
+    python doc2pdf.py convert --input ./data/word --output ./data/docs -j 4
+    python doc2pdf.py convert --input ./data/word --output ./data/docs --overwrite
+
+- 문서마다 soffice를 새로 띄우지 않고, 워커 N개가 각자 soffice 하나를 띄워 둔 채 UNO로 변환
+  (워커마다 프로필 폴더(-env:UserInstallation)를 따로 두어 동시 실행 시 프로필 잠금 충돌 방지)
+- 입력 폴더의 하위 구조를 출력 폴더에 그대로 만들고, 이미 있는 PDF는 건너뜀 (--overwrite로 덮어쓰기)
+- 문서 하나가 DOC2PDF_TIMEOUT_SEC를 넘기면 해당 워커(soffice 포함)를 종료하고 새로 띄운 뒤 다음 문서로 진행
+- PDF는 .part로 쓴 뒤 이름을 바꾸므로 중단/타임아웃 후 재실행해도 반쯤 쓴 파일을 완료로 보지 않음
+
+워커 프로토콜 (serve 하위 명령, --worker_cmd로 다른 변환기로 대체 가능):
+    시작 후 "ready" 한 줄 → 요청 "원본<TAB>출력\\n"마다 "ok" 또는 "err <메시지>" 한 줄로 응답
+    변환기 자체가 망가졌으면(soffice 종료/UNO 브리지 해제, 연속 실패) "restart <메시지>"로 응답하고 종료
+    → 풀이 워커를 새로 띄워 같은 문서를 한 번 다시 시도
+"""
+import argparse
+import os
+import queue
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from config import (
+    INPUT_PDF_DIR,
+    DOC2PDF_WORKERS, DOC2PDF_TIMEOUT_SEC, DOC2PDF_SOFFICE, DOC2PDF_UNO_PYTHON, DOC2PDF_MAX_DOCS_PER_WORKER,
+)
+
+DOC_EXTS = {".doc", ".docx"}
+START_TIMEOUT_SEC = 60.0
+SERVE_MAX_CONSECUTIVE_ERRORS = 5   # 이만큼 연달아 실패하면 soffice 상태가 망가진 것으로 보고 serve 종료
+PROGRESS_EVERY = 50
+
+
+def iter_docs(input_dir: Path) -> Iterator[Path]:
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for fn in sorted(files):
+            # ~$로 시작하는 파일은 Word 잠금 파일
+            if os.path.splitext(fn)[1].lower() in DOC_EXTS and not fn.startswith("~$"):
+                yield Path(root) / fn
+
+
+def pdf_path_for(src: Path, input_dir: Path, output_dir: Path) -> Path:
+    return (output_dir / src.relative_to(input_dir)).with_suffix(".pdf")
+
+
+# =========================
+# Worker (pool 쪽)
+# =========================
+
+class ConverterWorker:
+    """워커 프로세스 하나. 요청을 한 번에 하나씩 보내고 응답을 timeout까지 기다립니다."""
+
+    def __init__(self, idx: int, cmd: List[str], profile_root: Path, timeout: float):
+        self.idx = idx
+        self.cmd = cmd
+        self.profile = profile_root / f"worker{idx}"
+        self.timeout = timeout
+        self.proc: Optional[subprocess.Popen] = None
+        self.lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.done = 0
+        self.restarts = 0
+        self.broken = False   # 재시작 실패 → run()이 이 워커를 멈춤
+
+    def _reader(self, proc: subprocess.Popen, lines: "queue.Queue[Optional[str]]"):
+        for line in proc.stdout:
+            lines.put(line.rstrip("\n"))
+        lines.put(None)
+
+    def start(self):
+        self.profile.mkdir(parents=True, exist_ok=True)
+        self.proc = subprocess.Popen(self.cmd + ["--profile", str(self.profile)], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, text=True, encoding="utf-8", bufsize=1,
+                                     start_new_session=(os.name == "posix"))
+        # 재시작 후 이전 프로세스의 늦은 응답이 섞이지 않도록 프로세스마다 새 큐
+        self.lines = queue.Queue()
+        threading.Thread(target=self._reader, args=(self.proc, self.lines), daemon=True).start()
+        reply = self._read(START_TIMEOUT_SEC)
+        if reply != "ready":
+            self.kill()
+            raise RuntimeError(f"worker{self.idx} failed to start: {reply!r}")
+        self.done = 0
+
+    def _read(self, timeout: float) -> Optional[str]:
+        try:
+            return self.lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def kill(self):
+        if self.proc is None:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(self.proc.pid, signal.SIGKILL)    # serve가 띄운 soffice까지 같은 세션
+            else:
+                self.proc.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.proc.wait()
+        self.proc = None
+
+    def restart(self, reset_profile: bool = False):
+        self.kill()
+        if reset_profile:
+            shutil.rmtree(self.profile, ignore_errors=True)
+        self.restarts += 1
+        self.start()
+
+    def _try_restart(self, reset_profile: bool = False) -> str:
+        # 재시작 실패를 예외 대신 메시지로 돌려줌 (꺼낸 문서를 실패로 기록할 수 있도록), 성공하면 ""
+        try:
+            self.restart(reset_profile=reset_profile)
+            return ""
+        except (RuntimeError, OSError) as e:
+            self.broken = True
+            return f"worker restart failed: {e}"
+
+    def stop(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=15)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+    def convert(self, src: Path, dst: Path, retry: bool = True) -> Tuple[bool, str]:
+        # 재시작 실패도 (False, "worker restart failed: ...")로 반환 → 꺼낸 문서는 항상 변환/실패 중 하나로 집계
+        if self.proc is None or self.proc.poll() is not None or self.done >= DOC2PDF_MAX_DOCS_PER_WORKER:
+            err = self._try_restart()
+            if err:
+                return False, err
+        try:
+            self.proc.stdin.write(f"{src}\t{dst}\n")
+            self.proc.stdin.flush()
+        except OSError as e:
+            err = self._try_restart()
+            return False, f"worker pipe closed: {e}" + (f"; {err}" if err else "")
+        reply = self._read(self.timeout)
+        self.done += 1
+        if reply is None:
+            # 멈춘 문서: soffice까지 종료하고 프로필도 새로 (잠금/복구 상태가 남는 것을 방지)
+            alive = self.proc is not None and self.proc.poll() is None
+            err = self._try_restart(reset_profile=True)
+            msg = f"timeout {self.timeout:.0f}s" if alive else "worker exited"
+            return False, msg + (f"; {err}" if err else "")
+        if reply == "ok":
+            return True, ""
+        if reply.startswith("restart "):
+            # 워커가 변환기를 잃고 종료함 → 새로 띄워 같은 문서를 한 번만 재시도 (문서가 원인이면 다시 실패)
+            err = self._try_restart()
+            if err:
+                return False, f"{reply[8:]}; {err}"
+            if retry:
+                return self.convert(src, dst, retry=False)
+            return False, reply[8:]
+        return False, reply[4:] if reply.startswith("err ") else reply
+
+
+def default_worker_cmd() -> List[str]:
+    return [DOC2PDF_UNO_PYTHON, str(Path(__file__).resolve()), "serve", "--soffice", DOC2PDF_SOFFICE]
+
+
+def convert_folder(input_dir: Path, output_dir: Path, workers: int = DOC2PDF_WORKERS,
+                   timeout: float = DOC2PDF_TIMEOUT_SEC, overwrite: bool = False,
+                   worker_cmd: Optional[List[str]] = None) -> dict:
+    """반환: {"total", "converted", "skipped", "failed", "restarts", "sec", "docs_per_min", "failures": [(경로, 사유)]}"""
+    t0 = time.perf_counter()
+    jobs: "queue.Queue[Tuple[Path, Path]]" = queue.Queue()
+    total = skipped = 0
+    for src in iter_docs(input_dir):
+        total += 1
+        dst = pdf_path_for(src, input_dir, output_dir)
+        if dst.exists() and not overwrite:
+            skipped += 1
+            continue
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        jobs.put((src, dst))
+    pending = jobs.qsize()
+    print(f"[doc2pdf] {total} docs, skip {skipped} (이미 있음), convert {pending} with {min(workers, pending)} worker(s)")
+    stats = {"total": total, "converted": 0, "skipped": skipped, "failed": 0, "restarts": 0, "failures": []}
+    if not pending:
+        stats.update(sec=time.perf_counter() - t0, docs_per_min=0.0)
+        return stats
+
+    lock = threading.Lock()
+    profile_root = Path(tempfile.mkdtemp(prefix="doc2pdf_profiles_"))
+    cmd = worker_cmd or default_worker_cmd()
+
+    def run(idx: int):
+        worker = ConverterWorker(idx, cmd, profile_root, timeout)
+        try:
+            worker.start()
+            while True:
+                try:
+                    src, dst = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                ok, msg = worker.convert(src, dst)
+                with lock:
+                    if ok:
+                        stats["converted"] += 1
+                    else:
+                        stats["failed"] += 1
+                        stats["failures"].append((str(src), msg))
+                        print(f"  * 실패: {src} ({msg})")
+                    n = stats["converted"] + stats["failed"]
+                    if n % PROGRESS_EVERY == 0:
+                        sec = time.perf_counter() - t0
+                        print(f"  [{n}/{pending}] {60.0 * n / sec:.1f} docs/min")
+                if worker.broken:
+                    # 재시작 실패: 이 문서는 실패로 기록됨, 남은 작업은 다른 워커(또는 아래 "no worker" 처리)로
+                    with lock:
+                        print(f"  * worker{idx} 중단: {msg}")
+                    break
+        except Exception as e:
+            with lock:
+                print(f"  * worker{idx} 중단: {e}")
+        finally:
+            worker.stop()
+            with lock:
+                stats["restarts"] += worker.restarts
+
+    threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(min(workers, pending))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    shutil.rmtree(profile_root, ignore_errors=True)
+
+    # 모든 워커가 시작에 실패했으면 남은 작업을 실패로 기록
+    while not jobs.empty():
+        src, _ = jobs.get_nowait()
+        stats["failed"] += 1
+        stats["failures"].append((str(src), "no worker"))
+    sec = time.perf_counter() - t0
+    stats.update(sec=sec, docs_per_min=60.0 * stats["converted"] / sec if sec > 0 else 0.0)
+    return stats
+
+
+# =========================
+# Worker (serve: LibreOffice + UNO)
+# =========================
+
+def serve(profile: Path, soffice: str):
+    # uno는 LibreOffice와 함께 설치되는 모듈 (DOC2PDF_UNO_PYTHON으로 실행)
+    import uno
+    from com.sun.star.beans import PropertyValue
+
+    def prop(name, value):
+        p = PropertyValue()
+        p.Name, p.Value = name, value
+        return p
+
+    pipe = f"doc2pdf_{os.getpid()}"
+    office = subprocess.Popen([soffice, "--headless", "--invisible", "--norestore", "--nologo", "--nodefault",
+                               "--nolockcheck", f"-env:UserInstallation={profile.resolve().as_uri()}",
+                               f"--accept=pipe,name={pipe};urp;StarOffice.ComponentContext"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+    deadline = time.time() + START_TIMEOUT_SEC
+    while True:
+        try:
+            ctx = resolver.resolve(f"uno:pipe,name={pipe};urp;StarOffice.ComponentContext")
+            break
+        except Exception:
+            if office.poll() is not None or time.time() > deadline:
+                print(f"err soffice did not start (exit {office.poll()})", flush=True)
+                office.kill()
+                return
+            time.sleep(0.2)
+    desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+    print("ready", flush=True)
+
+    def broken(e: Exception) -> bool:
+        # soffice가 죽었거나 UNO 브리지가 끊기면 이후 모든 호출이 실패하므로 계속 응답하지 않고 종료
+        name, msg = type(e).__name__, str(e).lower()
+        return office.poll() is not None or name == "DisposedException" or "disposed" in msg or "bridge" in msg
+
+    errors = 0
+    try:
+        for line in sys.stdin:
+            src, _, dst = line.rstrip("\n").partition("\t")
+            part = dst + ".part"
+            try:
+                doc = desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(src)), "_blank", 0,
+                                                   (prop("Hidden", True), prop("ReadOnly", True)))
+                if doc is None:
+                    raise RuntimeError("load failed")
+                try:
+                    doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(part)), (prop("FilterName", "writer_pdf_Export"),))
+                finally:
+                    doc.close(True)
+                os.replace(part, dst)
+                errors = 0
+                print("ok", flush=True)
+            except Exception as e:
+                if os.path.exists(part):
+                    os.remove(part)
+                errors += 1
+                msg = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+                if broken(e) or errors >= SERVE_MAX_CONSECUTIVE_ERRORS:
+                    print(f"restart {msg}", flush=True)
+                    return
+                print(f"err {msg}", flush=True)
+    finally:
+        try:
+            desktop.terminate()
+        except Exception:
+            pass
+        try:
+            office.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            office.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_conv = sub.add_parser("convert", help="폴더 단위 변환")
+    p_conv.add_argument("--input", type=str, required=True, help=".doc/.docx가 있는 폴더 (재귀)")
+    p_conv.add_argument("--output", type=str, default=INPUT_PDF_DIR, help="PDF 출력 폴더 (하위 구조 유지)")
+    p_conv.add_argument("-j", "--workers", type=int, default=DOC2PDF_WORKERS)
+    p_conv.add_argument("--timeout", type=float, default=DOC2PDF_TIMEOUT_SEC)
+    p_conv.add_argument("--overwrite", action="store_true")
+    p_conv.add_argument("--worker_cmd", type=str, default="", help="serve 대신 쓸 변환기 명령 (같은 줄 프로토콜)")
+    p_serve = sub.add_parser("serve", help="(내부용) LibreOffice 워커")
+    p_serve.add_argument("--profile", type=str, required=True)
+    p_serve.add_argument("--soffice", type=str, default=DOC2PDF_SOFFICE)
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        serve(Path(args.profile), args.soffice)
+        return
+    r = convert_folder(Path(args.input), Path(args.output), workers=args.workers, timeout=args.timeout,
+                       overwrite=args.overwrite, worker_cmd=shlex.split(args.worker_cmd) if args.worker_cmd else None)
+    print(f"[doc2pdf] converted {r['converted']}, skipped {r['skipped']}, failed {r['failed']}, "
+          f"worker restarts {r['restarts']}  {r['sec']:.1f}s  ({r['docs_per_min']:.1f} docs/min)")
+
+
+if __name__ == "__main__":
+    main()
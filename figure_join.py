@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 그림(images_sum_final) ↔ 그래프 파서 결과(Step1 JSON / Step2 요약) 조인
+- output_stem(): Step1 JSON/Step2 요약 파일명 규칙 (runner.py, runner_summary.py, pipeline.py 공통)
+- GraphIndex: out/json/*.json을 한 번 읽어 "정규화된 이미지 경로"와 "이미지 sha1" 두 키로 색인 → 그림마다 O(1) 조회
+- FigureJoiner: images_sum 레코드의 image_link를 색인에 맞춰 keyword(key_phrases), summary, chart_metadata를 채움
+- 아직 Step1 결과가 없는 그림은 재계산하지 않고 큐 파일(한 줄에 이미지 경로 하나)에 모아 runner.py(INPUT_MODE=queue)로 넘김
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from build_final_jsons import build_prefix
+
+
+def normalize_image_path(path: str, base_dir: Optional[Path] = None) -> str:
+    # 상대 경로는 base_dir(없으면 현재 디렉터리) 기준 → 절대 경로, 구분자/대소문자 정규화
+    p = Path(path)
+    if not p.is_absolute() and base_dir is not None:
+        p = Path(base_dir) / p
+    return os.path.normcase(os.path.normpath(os.path.abspath(p))).replace(os.sep, "/")
+
+
+def output_stem(image_path: str) -> str:
+    """
+    이미지 → Step1 출력 파일명(확장자 제외): `<파일명>_<정규화 경로 sha1 앞 10자리>`
+    - OCR 크롭(page_XXXX/images/0.jpg)이나 pdf_figures 그림처럼 파일명이 문서/페이지마다 겹쳐도 서로 덮어쓰지 않음
+    - Step2 요약(<stem>.summary.txt)과 GraphIndex.summary_for는 JSON 파일명의 stem을 그대로 따름
+    """
+    digest = hashlib.sha1(normalize_image_path(image_path).encode("utf-8")).hexdigest()[:10]
+    return f"{Path(image_path).stem}_{digest}"
+
+
+def file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _is_remote(link: str) -> bool:
+    return "://" in link or link.startswith("data:")
+
+
+class GraphIndex:
+    """
+    Step1 JSON 색인. 요약 텍스트는 조인될 때만 읽음 (JSON과 같은 stem의 <stem>.summary.txt, output_stem 규칙).
+    - source.image_sha1이 없는 JSON(폴더 모드 결과)은 이미지 파일이 남아 있으면 해시를 계산해 sha1 키도 등록
+    """
+
+    def __init__(self, summary_dir: Optional[Path] = None):
+        self.summary_dir = Path(summary_dir) if summary_dir else None
+        self.by_path: Dict[str, Dict[str, Any]] = {}
+        self.by_sha1: Dict[str, Dict[str, Any]] = {}
+        self.count = 0
+
+    @classmethod
+    def build(cls, json_dir: Path, summary_dir: Optional[Path] = None) -> "GraphIndex":
+        index = cls(summary_dir)
+        json_dir = Path(json_dir)
+        if not json_dir.is_dir():
+            return index
+        for json_path in sorted(json_dir.glob("*.json")):
+            try:
+                meta = json.loads(json_path.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            index.add(json_path, meta)
+        return index
+
+    def add(self, json_path: Path, meta: Dict[str, Any]):
+        source = meta.get("source") or {}
+        image_path = source.get("image_path") or ""
+        sha1 = source.get("image_sha1")
+        if not sha1 and image_path and os.path.isfile(image_path):
+            sha1 = file_sha1(Path(image_path))
+        entry = {"json_path": Path(json_path), "meta": meta}
+        if image_path:
+            self.by_path[normalize_image_path(image_path)] = entry
+        if sha1:
+            self.by_sha1[sha1] = entry
+        self.count += 1
+
+    def summary_for(self, entry: Dict[str, Any]) -> Optional[str]:
+        if "summary" not in entry:
+            summary = None
+            if self.summary_dir is not None:
+                path = self.summary_dir / f"{entry['json_path'].stem}.summary.txt"
+                if path.exists():
+                    summary = path.read_text(encoding="utf-8").strip() or None
+            entry["summary"] = summary
+        return entry["summary"]
+
+
+class FigureJoiner:
+    """
+    images_sum 레코드에 그래프 파서 결과를 채웁니다. 같은 레코드에 여러 번 적용해도 결과가 같음(증분 빌드 재사용 레코드용).
+    """
+
+    def __init__(self, index: GraphIndex):
+        self.index = index
+        self.queue: Dict[str, None] = {}   # 순서 유지 + 중복 제거
+        self.stats = {"figures": 0, "by_path": 0, "by_sha1": 0, "queued": 0, "unresolved": 0}
+
+    def lookup(self, image_link: Optional[str], base_dir: Path) -> Optional[Dict[str, Any]]:
+        if not image_link or _is_remote(image_link):
+            self.stats["unresolved"] += 1
+            return None
+        key = normalize_image_path(image_link, base_dir)
+        entry = self.index.by_path.get(key)
+        if entry is not None:
+            self.stats["by_path"] += 1
+            return entry
+        # 경로가 달라도(복사/이동된 그림) 내용이 같으면 sha1로 매칭
+        if os.path.isfile(key):
+            entry = self.index.by_sha1.get(file_sha1(Path(key)))
+            if entry is not None:
+                self.stats["by_sha1"] += 1
+                return entry
+            if key not in self.queue:
+                self.queue[key] = None
+                self.stats["queued"] += 1
+            return None
+        self.stats["unresolved"] += 1
+        return None
+
+    def apply(self, record: Dict[str, Any], base_dir: Path) -> Dict[str, Any]:
+        self.stats["figures"] += 1
+        entry = self.lookup(record.get("image_link"), base_dir)
+        meta = entry["meta"] if entry is not None else None
+        summary = self.index.summary_for(entry) if entry is not None else None
+
+        text = build_prefix(record.get("filename"), record.get("section_path")) + record["original"]
+        if summary:
+            text += "\n" + summary
+        record["text"] = text
+        record["keyword"] = list(meta.get("key_phrases") or []) if meta else []
+        record["summary"] = summary
+        record["chart_metadata"] = {k: v for k, v in meta.items() if k != "key_phrases"} if meta else None
+        return record
+
+    def write_queue(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("".join(f"{p}\n" for p in self.queue), encoding="utf-8")
+
+    def report(self) -> str:
+        s = self.stats
+        joined = s["by_path"] + s["by_sha1"]
+        return (f"[join] figures {s['figures']}, joined {joined} (path {s['by_path']}, sha1 {s['by_sha1']}), "
+                f"queued for Step1 {s['queued']}, unresolved {s['unresolved']}")
+
+
+def read_queue(path: Path) -> List[str]:
+    if not Path(path).exists():
+        return []
+    return [ln.strip() for ln in Path(path).read_text(encoding="utf-8").splitlines() if ln.strip()]
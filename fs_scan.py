@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+폴더 스트리밍 열거 + 노드 간 결정적 샤딩
+- iter_files(): os.scandir로 디렉터리를 하나씩 읽으며 바로 yield (전체 목록/정렬 없이 첫 파일부터 처리 시작)
+- Shard("i/N"): 루트 기준 상대 경로(posix 표기)의 안정 해시 % N == i 인 파일만 처리
+  → 조정자 없이 N대가 같은 공유 폴더를 중복 없이 나눠 처리 (마운트 위치가 달라도 상대 경로가 같으면 같은 샤드)
+- root_of(): 큐처럼 절대 경로 목록을 나눌 때 그 경로가 속한 입력 루트를 찾아 폴더 모드와 같은 상대 경로 키를 쓰도록 함
+"""
+import hashlib
+import os
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+
+class Shard(NamedTuple):
+    index: int
+    count: int
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def parse_shard(spec: Optional[str]) -> Optional[Shard]:
+    """"i/N" (0 ≤ i < N) → Shard, 빈 값이면 None(전체 처리)"""
+    if not spec:
+        return None
+    try:
+        index, count = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard {spec!r} (expected i/N, e.g. 0/4)") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"invalid shard {spec!r} (need 0 <= i < N)")
+    return Shard(index, count)
+
+
+def shard_of(rel_path: str, count: int) -> int:
+    # Python hash()는 프로세스마다 달라지므로 blake2b 사용
+    digest = hashlib.blake2b(rel_path.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def in_shard(path: str, root: Optional[str], shard: Optional[Shard]) -> bool:
+    if shard is None or shard.count == 1:
+        return True
+    rel = os.path.relpath(path, root) if root else path
+    return shard_of(rel.replace(os.sep, "/"), shard.count) == shard.index
+
+
+def root_of(path: str, roots: Iterable[str]) -> Optional[str]:
+    """path를 포함하는 루트 중 가장 깊은 것 (없으면 None → in_shard가 경로 그대로 해시)"""
+    target = os.path.normcase(os.path.abspath(path))
+    best = None
+    for root in roots:
+        if not root:
+            continue
+        base = os.path.normcase(os.path.abspath(root))
+        try:
+            if os.path.commonpath([target, base]) != base:
+                continue
+        except ValueError:   # 드라이브가 다름 (Windows)
+            continue
+        if best is None or len(base) > len(os.path.normcase(os.path.abspath(best))):
+            best = root
+    return best
+
+
+def iter_files(root: str, exts: Iterable[str], recursive: bool = True,
+               shard: Optional[Shard] = None) -> Iterator[str]:
+    """
+    root 아래 확장자가 exts인 파일 경로를 파일 시스템 순서대로 yield 합니다 (정렬하지 않음).
+    - 심볼릭 링크 디렉터리는 따라가지 않음 (os.walk 기본값과 동일), 읽을 수 없는 디렉터리는 건너뜀
+    """
+    exts = {e.lower() for e in exts}
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if os.path.splitext(entry.name)[1].lower() in exts and in_shard(entry.path, root, shard):
+                    yield entry.path
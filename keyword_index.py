@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""
+key_phrases 역색인 (Step1 JSON → 차트 검색)
+- 토큰: NFKC 정규화 후 영문/숫자 단어(소문자), 한글 어절 + 한글 2-gram, 화학식(CaO, SiO2, Al2O3 — 대소문자 유지)
+- 세그먼트 단위 저장: 새로 생긴/바뀐 JSON만 새 세그먼트로 추가, 바뀌거나 지워진 문서는 deleted로 표시
+  세그먼트가 INDEX_MAX_SEGMENTS를 넘거나 삭제 비율이 커지면 전체 재구성(compaction)
+- 세그먼트 파일 (조회 시 모두 mmap, 전체를 메모리에 올리지 않음):
+    terms.bin     용어 utf-8 바이트 연결
+    lexicon.bin   용어 정렬 순 고정 길이 레코드 (이진 탐색)
+    postings.bin  포스팅 리스트: 문서 번호 차분(gap)을 1/2/4바이트 폭으로, 흔한 용어는 더 작은 쪽인 비트맵으로
+    lens.bin      문서별 토큰 수(uint16, BM25 길이 보정) — 작아서 조회 시 메모리로 읽음
+    docs.jsonl / docs.off   결과 표시용 문서 정보와 줄 오프셋
+사용:
+    python keyword_index.py build                 # out/json → out/index (증분)
+    python keyword_index.py query "염기도–점도 반비례" -k 10
+"""
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import time
+import unicodedata
+from array import array
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import OUTPUT_JSON_DIR, OUTPUT_INDEX_DIR, INDEX_MAX_SEGMENTS
+
+INDEX_VERSION = 1
+LEX_REC = struct.Struct("<QIQIIB")      # term_off, term_len, post_off, post_len, df, width
+WIDTH_CODES = {1: "B", 2: "H", 4: "I"}
+WIDTH_BITMAP = 0                        # 세그먼트 문서 수만큼의 비트맵 (bit i = 로컬 문서 i)
+COMPACT_DELETED_RATIO = 0.25
+BM25_K1 = 1.2
+BM25_B = 0.5
+
+FORMULA_RE = re.compile(r"(?<![A-Za-z0-9])(?:[A-Z][a-z]?\d*){2,}(?![A-Za-z0-9])")
+WORD_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+HANGUL_RE = re.compile(r"[가-힣]+")
+
+
+# =========================
+# Tokenizer
+# =========================
+
+def normalize_phrase(text: str) -> str:
+    # 전각/첨자(SiO₂)/호환 문자 통일 + 공백 정리
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def _is_formula(tok: str) -> bool:
+    # 원소 기호 2개 이상 + (숫자 포함 또는 소문자 포함) → PDF/XRD 같은 약어는 제외
+    return any(c.isdigit() for c in tok) or any(c.islower() for c in tok)
+
+
+def tokenize(text: str) -> List[str]:
+    """문구 하나 → 색인 토큰 (중복 포함, 순서 유지)"""
+    text = normalize_phrase(text)
+    tokens = [m.group(0) for m in FORMULA_RE.finditer(text) if _is_formula(m.group(0))]
+    lower = text.lower()
+    tokens.extend(WORD_RE.findall(lower))
+    for run in HANGUL_RE.findall(lower):
+        if len(run) <= 2:
+            tokens.append(run)
+            continue
+        tokens.append(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def doc_terms(key_phrases: Iterable[str]) -> Tuple[List[str], int]:
+    # 문서 하나의 고유 용어(정렬)와 전체 토큰 수
+    tokens: List[str] = []
+    for phrase in key_phrases:
+        tokens.extend(tokenize(phrase))
+    return sorted(set(tokens)), len(tokens)
+
+
+# =========================
+# Segment write / read
+# =========================
+
+def _gap_array(ids: List[int]) -> Tuple[bytes, int]:
+    gaps = [ids[0]] + [b - a for a, b in zip(ids, ids[1:])]
+    top = max(gaps)
+    width = 1 if top < 1 << 8 else 2 if top < 1 << 16 else 4
+    arr = array(WIDTH_CODES[width], gaps)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes(), width
+
+
+def _bitmap_bytes(ids: Iterable[int], n_docs: int) -> bytearray:
+    bits = bytearray((n_docs + 7) // 8)
+    for i in ids:
+        bits[i >> 3] |= 1 << (i & 7)
+    return bits
+
+
+def _write_segment(seg_dir: Path, docs: List[Dict[str, Any]]):
+    """docs: [{"stem", "json_path", "title", "key_phrases", "terms", "length"}] (세그먼트 내 번호 = 리스트 순서)"""
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    postings: Dict[str, List[int]] = {}
+    for local_id, d in enumerate(docs):
+        for term in d["terms"]:
+            postings.setdefault(term, []).append(local_id)
+
+    terms_sorted = sorted(postings, key=lambda t: t.encode("utf-8"))
+    with open(seg_dir / "terms.bin", "wb") as ft, open(seg_dir / "postings.bin", "wb") as fp, \
+            open(seg_dir / "lexicon.bin", "wb") as fl:
+        term_off = post_off = 0
+        for term in terms_sorted:
+            tb = term.encode("utf-8")
+            ids = postings[term]
+            data, width = _gap_array(ids)
+            if (len(docs) + 7) // 8 < len(data):
+                data, width = _bitmap_bytes(ids, len(docs)), WIDTH_BITMAP
+            ft.write(tb)
+            fp.write(data)
+            fl.write(LEX_REC.pack(term_off, len(tb), post_off, len(data), len(ids), width))
+            term_off += len(tb)
+            post_off += len(data)
+
+    lens = array("H", (min(d["length"], 0xFFFF) for d in docs))
+    if sys.byteorder == "big":
+        lens.byteswap()
+    (seg_dir / "lens.bin").write_bytes(lens.tobytes())
+
+    offsets = array("Q")
+    with open(seg_dir / "docs.jsonl", "wb") as fd:
+        pos = 0
+        for d in docs:
+            line = json.dumps({"stem": d["stem"], "json_path": d["json_path"], "title": d.get("title"),
+                               "key_phrases": d["key_phrases"]}, ensure_ascii=False).encode("utf-8") + b"\n"
+            offsets.append(pos)
+            fd.write(line)
+            pos += len(line)
+        offsets.append(pos)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    (seg_dir / "docs.off").write_bytes(offsets.tobytes())
+
+
+def _mmap_file(path: Path):
+    if path.stat().st_size == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class Segment:
+    def __init__(self, seg_dir: Path, first_id: int, count: int):
+        self.dir = seg_dir
+        self.first_id = first_id
+        self.count = count
+        self.terms = _mmap_file(seg_dir / "terms.bin")
+        self.lexicon = _mmap_file(seg_dir / "lexicon.bin")
+        self.postings = _mmap_file(seg_dir / "postings.bin")
+        self.lens = array("H")
+        self.lens.frombytes((seg_dir / "lens.bin").read_bytes())
+        if sys.byteorder == "big":
+            self.lens.byteswap()
+        self.docs = _mmap_file(seg_dir / "docs.jsonl")
+        self.doc_off = _mmap_file(seg_dir / "docs.off")
+        self.n_terms = len(self.lexicon) // LEX_REC.size
+
+    def _term_at(self, i: int) -> Tuple[bytes, tuple]:
+        rec = LEX_REC.unpack_from(self.lexicon, i * LEX_REC.size)
+        return self.terms[rec[0]:rec[0] + rec[1]], rec
+
+    def lookup(self, term: str) -> Optional[tuple]:
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            t, rec = self._term_at(mid)
+            if t < key:
+                lo = mid + 1
+            elif t > key:
+                hi = mid
+            else:
+                return rec
+        return None
+
+    def bitmap(self, rec: tuple) -> int:
+        """포스팅 → 로컬 문서 번호 비트맵(int). 비트맵으로 저장된 용어는 복사 한 번, 나머지는 차분 복원 후 비트 세팅"""
+        _, _, post_off, post_len, _, width = rec
+        data = self.postings[post_off:post_off + post_len]
+        if width == WIDTH_BITMAP:
+            return int.from_bytes(data, "little")
+        arr = array(WIDTH_CODES[width])
+        arr.frombytes(data)
+        if sys.byteorder == "big":
+            arr.byteswap()
+        return int.from_bytes(_bitmap_bytes(accumulate(arr), self.count), "little")
+
+    def doc(self, local_id: int) -> Dict[str, Any]:
+        start, end = struct.unpack_from("<QQ", self.doc_off, local_id * 8)
+        return json.loads(self.docs[start:end])
+
+
+# =========================
+# Build (incremental)
+# =========================
+
+def _write_json_atomic(path: Path, obj: Any):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _scan_jsons(json_dir: Path) -> Dict[str, Tuple[str, int, int]]:
+    out = {}
+    if not json_dir.is_dir():
+        return out
+    with os.scandir(json_dir) as it:
+        for e in it:
+            if e.is_file() and e.name.lower().endswith(".json"):
+                st = e.stat()
+                out[e.name[:-5]] = (e.path, st.st_mtime_ns, st.st_size)
+    return out
+
+
+def _load_doc(stem: str, path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return None
+    phrases = [normalize_phrase(p) for p in (data.get("key_phrases") or []) if isinstance(p, str) and p.strip()]
+    if not phrases:
+        return None
+    terms, length = doc_terms(phrases)
+    title = (data.get("title") or {}).get("text") if isinstance(data.get("title"), dict) else None
+    return {"stem": stem, "json_path": path, "title": title, "key_phrases": phrases, "terms": terms, "length": length}
+
+
+def _empty_manifest() -> Dict[str, Any]:
+    return {"version": INDEX_VERSION, "next_id": 0, "next_seg": 0, "segments": [], "deleted": [],
+            "live": 0, "total_len": 0}
+
+
+def _load_manifest(index_dir: Path) -> Dict[str, Any]:
+    path = index_dir / "manifest.json"
+    if path.exists():
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+        if manifest.get("version") == INDEX_VERSION:
+            return manifest
+    return _empty_manifest()
+
+
+def update_index(json_dir: Path = Path(OUTPUT_JSON_DIR), index_dir: Path = Path(OUTPUT_INDEX_DIR),
+                 rebuild: bool = False, max_segments: int = INDEX_MAX_SEGMENTS) -> Dict[str, Any]:
+    """
+    json_dir의 Step1 JSON을 색인에 반영합니다. 바뀐 파일(mtime/size 기준)만 다시 읽습니다.
+    반환: {"added", "deleted", "segments", "live", "compacted", "sec"}
+    """
+    t0 = time.perf_counter()
+    json_dir, index_dir = Path(json_dir), Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(index_dir)
+    state_path = index_dir / "state.json"
+    # state: stem → [doc_id(-1=키워드 없음), mtime_ns, size, doc_len]
+    state: Dict[str, list] = {}
+    if state_path.exists() and (index_dir / "manifest.json").exists():
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+
+    scanned = _scan_jsons(json_dir)
+    deleted = set(manifest["deleted"])
+    changed = []
+    for stem, (path, mtime, size) in scanned.items():
+        old = state.get(stem)
+        if old is None or old[1] != mtime or old[2] != size:
+            changed.append(stem)
+    removed = [stem for stem in state if stem not in scanned]
+    for stem in changed + removed:
+        old = state.pop(stem, None)
+        if old is not None and old[0] >= 0:
+            deleted.add(old[0])
+            manifest["live"] -= 1
+            manifest["total_len"] -= old[3]
+
+    n_total = manifest["next_id"]
+    compact = rebuild or (changed and len(manifest["segments"]) + 1 > max_segments) or \
+        (n_total and len(deleted) / n_total > COMPACT_DELETED_RATIO)
+    if compact:
+        # 전체 재구성: 살아 있는 모든 문서를 새 세그먼트 하나로
+        old_segments = manifest["segments"]
+        manifest = {**_empty_manifest(), "next_seg": manifest["next_seg"]}
+        deleted = set()
+        state = {}
+        changed = sorted(scanned)
+    else:
+        old_segments = []
+        changed.sort()
+
+    docs = []
+    for stem in changed:
+        path, mtime, size = scanned[stem]
+        d = _load_doc(stem, path)
+        if d is None:
+            state[stem] = [-1, mtime, size, 0]
+            continue
+        d["mtime"], d["size"] = mtime, size
+        docs.append(d)
+    # 세그먼트 안에서는 짧은 문서부터 번호를 매김 → 번호가 작을수록 BM25 길이 보정값이 큼 (조회 시 top-k 조기 확정)
+    docs.sort(key=lambda d: (d["length"], d["stem"]))
+    for i, d in enumerate(docs):
+        state[d["stem"]] = [manifest["next_id"] + i, d["mtime"], d["size"], d["length"]]
+
+    if docs:
+        name = f"seg_{manifest['next_seg']:06d}"
+        _write_segment(index_dir / name, docs)
+        manifest["segments"].append({"name": name, "first_id": manifest["next_id"], "count": len(docs)})
+        manifest["next_seg"] += 1
+        manifest["next_id"] += len(docs)
+        manifest["live"] += len(docs)
+        manifest["total_len"] += sum(d["length"] for d in docs)
+    manifest["deleted"] = sorted(deleted)
+
+    # state → manifest 순서로 교체 (조회는 manifest만 읽음)
+    _write_json_atomic(state_path, state)
+    _write_json_atomic(index_dir / "manifest.json", manifest)
+    for seg in old_segments:
+        shutil.rmtree(index_dir / seg["name"], ignore_errors=True)
+
+    return {"added": len(docs), "deleted": len(deleted), "segments": len(manifest["segments"]),
+            "live": manifest["live"], "compacted": bool(compact), "sec": time.perf_counter() - t0}
+
+
+# =========================
+# Query
+# =========================
+
+class KeywordIndex:
+    """
+    mmap 기반 조회기. 색인이 갱신되면 새로 열어야 반영됩니다.
+    - 점수: tf를 0/1로 보는 BM25 → score(d) = L(d) · Σ idf(t), L(d)는 문서 길이만의 함수
+    - 세그먼트별로 문서를 질의 용어 포함 여부(마스크)에 따라 비트맵 연산(큰 int의 &, ^)으로 나누면
+      같은 마스크 안에서는 Σ idf가 같고, 번호가 길이 순이므로 가장 낮은 비트 k개가 그 마스크의 top-k
+    - 마스크를 Σ idf 내림차순으로 보다가 상한이 현재 k번째 점수보다 낮아지면 중단
+    """
+
+    def __init__(self, index_dir: Path = Path(OUTPUT_INDEX_DIR)):
+        self.dir = Path(index_dir)
+        self.manifest = _load_manifest(self.dir)
+        self.segments = [Segment(self.dir / s["name"], s["first_id"], s["count"]) for s in self.manifest["segments"]]
+        deleted = self.manifest["deleted"]
+        # 세그먼트별 삭제 문서 비트맵
+        self.dead = [int.from_bytes(_bitmap_bytes((d - seg.first_id for d in deleted
+                                                   if seg.first_id <= d < seg.first_id + seg.count), seg.count), "little")
+                     for seg in self.segments]
+        self.live = max(1, self.manifest["live"])
+        self.avg_len = max(1.0, self.manifest["total_len"] / self.live)
+
+    def _length_factor(self, length: int) -> float:
+        return (BM25_K1 + 1.0) / (1.0 + BM25_K1 * (1.0 - BM25_B + BM25_B * length / self.avg_len))
+
+    @staticmethod
+    def _masks(seg: "Segment", dead: int, recs: List[Optional[tuple]]) -> Dict[int, int]:
+        # 용어 포함 여부 마스크 → 로컬 문서 비트맵
+        regions: Dict[int, int] = {}
+        seen = 0
+        for j, rec in enumerate(recs):
+            if rec is None:
+                continue
+            bits = seg.bitmap(rec) & ~dead
+            nxt: Dict[int, int] = {}
+            for mask, region in regions.items():
+                inter = region & bits
+                if inter:
+                    nxt[mask | 1 << j] = inter
+                    region ^= inter
+                if region:
+                    nxt[mask] = region
+            fresh = bits & ~seen
+            if fresh:
+                nxt[1 << j] = fresh
+            seen |= bits
+            regions = nxt
+        return regions
+
+    @staticmethod
+    def _lowest_bits(bits: int, k: int) -> Iterable[int]:
+        while bits and k > 0:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+            k -= 1
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        terms = sorted(set(tokenize(query)))
+        if not terms or k <= 0:
+            return []
+        recs = [[seg.lookup(t) for t in terms] for seg in self.segments]
+        idf = []
+        for j in range(len(terms)):
+            df = sum(r[j][4] for r in recs if r[j] is not None)   # 삭제 문서 포함 근사
+            idf.append(math.log(1.0 + (self.live - df + 0.5) / (df + 0.5)) if df else 0.0)
+
+        l_max = self._length_factor(0)
+        candidates = []
+        for seg, dead, seg_recs in zip(self.segments, self.dead, recs):
+            regions = self._masks(seg, dead, seg_recs)
+            weighted = sorted(((sum(idf[j] for j in range(len(terms)) if mask >> j & 1), mask)
+                               for mask in regions), reverse=True)
+            top: List[Tuple[float, int]] = []
+            for weight, mask in weighted:
+                if len(top) >= k and weight * l_max < top[0][0]:
+                    break
+                for local_id in self._lowest_bits(regions[mask], k):
+                    item = (weight * self._length_factor(seg.lens[local_id]), -(seg.first_id + local_id))
+                    if len(top) < k:
+                        heapq.heappush(top, item)
+                    elif item > top[0]:
+                        heapq.heapreplace(top, item)
+                    else:
+                        break   # 같은 마스크 안에서는 뒤로 갈수록 점수가 같거나 낮음
+            candidates.extend(top)
+
+        results = []
+        for score, neg_id in heapq.nlargest(k, candidates):
+            seg = self._segment_of(-neg_id)
+            results.append({"id": -neg_id, "score": round(score, 4), **seg.doc(-neg_id - seg.first_id)})
+        return results
+
+    def _segment_of(self, doc_id: int) -> "Segment":
+        for seg in self.segments:
+            if seg.first_id <= doc_id < seg.first_id + seg.count:
+                return seg
+        raise KeyError(doc_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="key_phrases 역색인 생성/조회")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="Step1 JSON → 역색인 (증분)")
+    p_build.add_argument("--json_dir", type=str, default=OUTPUT_JSON_DIR)
+    p_build.add_argument("--index_dir", type=str, default=OUTPUT_INDEX_DIR)
+    p_build.add_argument("--rebuild", action="store_true", help="기존 세그먼트를 버리고 전체 재구성")
+    p_query = sub.add_parser("query", help="키워드 검색")
+    p_query.add_argument("text", type=str)
+    p_query.add_argument("-k", type=int, default=10)
+    p_query.add_argument("--index_dir", type=str, default=OUTPUT_INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        r = update_index(Path(args.json_dir), Path(args.index_dir), rebuild=args.rebuild)
+        print(f"[index] +{r['added']} docs, live {r['live']}, deleted {r['deleted']}, segments {r['segments']}"
+              f"{' (compacted)' if r['compacted'] else ''}  {r['sec']:.2f}s → {args.index_dir}")
+        return
+
+    t0 = time.perf_counter()
+    index = KeywordIndex(Path(args.index_dir))
+    t1 = time.perf_counter()
+    results = index.search(args.text, args.k)
+    t2 = time.perf_counter()
+    print(f"[query] {args.text!r} → {tokenize(args.text)}  open {1000 * (t1 - t0):.1f}ms, search {1000 * (t2 - t1):.1f}ms")
+    for r in results:
+        print(f"  {r['score']:7.3f}  {r['stem']}  {', '.join(r['key_phrases'][:6])}")
+
+
+if __name__ == "__main__":
+    main()
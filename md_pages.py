@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+페이지 단위 markdown 스트리밍 쓰기/읽기
+- PagedMarkdownWriter: 페이지가 끝날 때마다 `<!-- Page N -->` 마커와 함께 append, 주기적으로 flush + fsync
+- 인덱스 사이드카(`<md>.index.json`): 페이지별 byte offset/length → 전체 파일을 읽지 않고 페이지 범위만 seek
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PAGE_MARKER = "\n\n<!-- Page {page} -->\n\n"
+PAGE_MARKER_RE = re.compile(r"\n\n<!-- Page (\d+) -->\n\n")
+
+
+def index_path_for(md_path: Path) -> Path:
+    return md_path.with_name(md_path.name + ".index.json")
+
+
+def _write_json_atomic(path: Path, data: Any):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class PagedMarkdownWriter:
+    def __init__(self, md_path: Path, start_page: int, end_page: int, fsync_every: int = 8):
+        self.md_path = Path(md_path)
+        self.start_page = start_page
+        self.end_page = end_page
+        self.fsync_every = max(1, fsync_every)
+        self.pages: List[Dict[str, int]] = []
+        self._offset = 0
+        self._since_sync = 0
+        self.md_path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.md_path, "wb")
+
+    def append(self, page_number: int, page_md: str):
+        data = (PAGE_MARKER.format(page=page_number) + page_md).encode("utf-8")
+        self._f.write(data)
+        self._f.flush()
+        self.pages.append({"page": page_number, "offset": self._offset, "length": len(data)})
+        self._offset += len(data)
+        self._since_sync += 1
+        if self._since_sync >= self.fsync_every:
+            self.sync()
+
+    def sync(self, complete: bool = False):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        # 인덱스는 fsync된 내용까지만 가리키도록 본문 sync 이후에 갱신
+        _write_json_atomic(index_path_for(self.md_path), {
+            "md_file": self.md_path.name,
+            "start_page": self.start_page,
+            "end_page": self.end_page,
+            "complete": complete,
+            "pages": self.pages,
+        })
+        self._since_sync = 0
+
+    def close(self, complete: bool = True):
+        if self._f.closed:
+            return
+        self.sync(complete=complete)
+        self._f.close()
+
+
+def load_page_index(md_path: Path) -> Optional[Dict[str, Any]]:
+    path = index_path_for(Path(md_path))
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_page_range(md_path: Path, first_page: int, last_page: int) -> str:
+    """
+    인덱스 사이드카를 이용해 [first_page, last_page] 구간만 읽습니다(마커 포함).
+    인덱스가 없으면 FileNotFoundError.
+    """
+    index = load_page_index(md_path)
+    if index is None:
+        raise FileNotFoundError(f"No page index for: {md_path}")
+    entries = [e for e in index.get("pages", []) if first_page <= e["page"] <= last_page]
+    if not entries:
+        return ""
+    start = min(e["offset"] for e in entries)
+    end = max(e["offset"] + e["length"] for e in entries)
+    with open(md_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start).decode("utf-8", errors="ignore")
+
+
+def slice_page_range(text: str, first_page: int, last_page: int) -> str:
+    """
+    인덱스가 없을 때 `<!-- Page N -->` 마커로 [first_page, last_page] 구간을 잘라냅니다(마커 포함).
+    마커가 하나도 없으면 ValueError (페이지를 구분할 수 없음).
+    """
+    marks = [(int(m.group(1)), m.start()) for m in PAGE_MARKER_RE.finditer(text)]
+    if not marks:
+        raise ValueError("no <!-- Page N --> markers")
+    ends = [pos for _, pos in marks[1:]] + [len(text)]
+    return "".join(text[pos:end] for (page, pos), end in zip(marks, ends) if first_page <= page <= last_page)
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Qwen2.5-VL 비전 타워를 ONNX Runtime(CPUExecutionProvider)으로 실행 (HF_VISION_ONNX=true)
+- 윈도 어텐션 블록 구간(3B/7B: 32블록 중 28개)을 구간별 ONNX 그래프로 한 번 export → HF_VISION_ONNX_DIR에 캐시
+    · 윈도는 (윈도 수 W, 최대 길이 L)로 패딩해 배치 어텐션 → 이미지 크기/종횡비와 무관한 그래프 하나로 처리
+    · 그리드에 따라 달라지는 rotary cos/sin, 윈도 인덱스는 PyTorch에서 계산해 입력으로 넘김
+- 전체 어텐션 블록(fullatt_block_indexes), patch_embed, merger는 PyTorch 그대로 실행
+  (2048px 입력이면 시퀀스가 2만 패치를 넘어 ONNX로 내보낸 전체 어텐션은 S×S 점수 행렬을 메모리에 올림)
+- 결과 임베딩은 원래 visual 모듈 자리에서 그대로 반환 → 언어 모델/rope 인덱스/generate()는 변경 없음
+사용:
+    attach_onnx_vision(model, HF_VISION_ONNX_DIR)   # vlm_client._ensure_hf_loaded()에서 호출
+    python bench_onnx_vision.py --image_dir ./data/images --limit 10    # PyTorch 대비 일치도/지연
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+ONNX_OPSET = 17
+EXPORT_GRID = (1, 32, 48)          # export용 더미 그리드 (t, h, w) — 축은 모두 동적
+
+
+def find_visual(model) -> Tuple[nn.Module, str]:
+    # transformers 버전에 따라 model.visual 또는 model.model.visual
+    for owner in (model, getattr(model, "model", None)):
+        if owner is not None and isinstance(getattr(owner, "visual", None), nn.Module):
+            return owner, "visual"
+    raise RuntimeError("Qwen2.5-VL visual 모듈을 찾을 수 없습니다.")
+
+
+def _rotate_half(x: torch.Tensor) -> torch.Tensor:
+    x1, x2 = x[..., : x.shape[-1] // 2], x[..., x.shape[-1] // 2:]
+    return torch.cat((-x2, x1), dim=-1)
+
+
+def _apply_rotary(t: torch.Tensor, cos: torch.Tensor, sin: torch.Tensor) -> torch.Tensor:
+    # transformers apply_rotary_pos_emb_vision과 동일 (float32 계산 후 원래 dtype)
+    tf = t.float()
+    return (tf * cos.unsqueeze(-2) + _rotate_half(tf) * sin.unsqueeze(-2)).to(t.dtype)
+
+
+class WindowBlocks(nn.Module):
+    """연속된 윈도 어텐션 블록 구간. 윈도 분할을 인덱스 입력으로 받아 형태에 독립적인 그래프로 export"""
+
+    def __init__(self, blocks: List[nn.Module]):
+        super().__init__()
+        self.blocks = nn.ModuleList(blocks)
+
+    def _attn(self, blk, h, cos, sin, win_index, win_valid, win_inverse):
+        seq = h.shape[0]
+        heads = blk.attn.num_heads
+        q, k, v = blk.attn.qkv(h).reshape(seq, 3, heads, -1).permute(1, 0, 2, 3).unbind(0)
+        q, k = _apply_rotary(q, cos, sin), _apply_rotary(k, cos, sin)
+        n_win, win_len = win_index.shape
+        flat = win_index.reshape(-1)
+
+        def windows(t):
+            return t[flat].reshape(n_win, win_len, heads, -1).transpose(1, 2)
+
+        mask = win_valid[:, None, None, :]
+        out = F.scaled_dot_product_attention(windows(q), windows(k), windows(v), attn_mask=mask)
+        out = out.transpose(1, 2).reshape(n_win * win_len, -1)[win_inverse]
+        return blk.attn.proj(out)
+
+    def forward(self, hidden, cos, sin, win_index, win_valid, win_inverse):
+        for blk in self.blocks:
+            hidden = hidden + self._attn(blk, blk.norm1(hidden), cos, sin, win_index, win_valid, win_inverse)
+            hidden = hidden + blk.mlp(blk.norm2(hidden))
+        return hidden
+
+
+def window_inputs(cu_window_seqlens: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """cu_window_seqlens → (win_index [W, L], win_valid [W, L], win_inverse [S]) (패딩 자리는 0번 행을 가리키고 마스크로 제외)"""
+    cu = cu_window_seqlens.long()
+    starts, lengths = cu[:-1], cu[1:] - cu[:-1]
+    keep = lengths > 0
+    starts, lengths = starts[keep], lengths[keep]
+    win_len = int(lengths.max())
+    ar = torch.arange(win_len)
+    win_valid = ar[None, :] < lengths[:, None]
+    win_index = torch.where(win_valid, starts[:, None] + ar[None, :], torch.zeros_like(win_valid, dtype=torch.long))
+    seq = int(cu[-1])
+    win_of = torch.repeat_interleave(torch.arange(len(lengths)), lengths)
+    win_inverse = win_of * win_len + (torch.arange(seq) - torch.repeat_interleave(starts, lengths))
+    return win_index, win_valid, win_inverse
+
+
+def block_segments(n_blocks: int, full: List[int]) -> List[Tuple[str, int, int]]:
+    """[("onnx", a, b), ("torch", 7, 8), ...] — 전체 어텐션 블록을 경계로 윈도 블록 구간 분할"""
+    segs: List[Tuple[str, int, int]] = []
+    start = 0
+    for i in range(n_blocks + 1):
+        if i == n_blocks or i in full:
+            if i > start:
+                segs.append(("onnx", start, i))
+            if i < n_blocks:
+                segs.append(("torch", i, i + 1))
+            start = i + 1
+    return segs
+
+
+class _Prepared:
+    """rotary/윈도/seqlens 준비 + 윈도 순서 재배열 (transformers Qwen2_5_VisionTransformerPretrainedModel.forward 앞부분)"""
+
+    def __init__(self, visual, hidden: torch.Tensor, grid_thw: torch.Tensor):
+        unit = visual.spatial_merge_unit
+        seq = hidden.shape[0]
+        rotary = visual.rot_pos_emb(grid_thw)
+        window_index, cu_window = visual.get_window_index(grid_thw)
+        cu_window = torch.unique_consecutive(torch.tensor(cu_window, device=hidden.device, dtype=torch.int32))
+        self.window_index = window_index
+        self.hidden = hidden.reshape(seq // unit, unit, -1)[window_index].reshape(seq, -1)
+        rotary = rotary.reshape(seq // unit, unit, -1)[window_index].reshape(seq, -1)
+        emb = torch.cat((rotary, rotary), dim=-1)
+        self.cos, self.sin = emb.cos(), emb.sin()
+        cu = torch.repeat_interleave(grid_thw[:, 1] * grid_thw[:, 2], grid_thw[:, 0]).cumsum(0, dtype=torch.int32)
+        self.cu_seqlens = F.pad(cu, (1, 0), value=0)
+        self.cu_window = cu_window
+
+
+def export_segments(visual, out_dir: str, opset: int = ONNX_OPSET) -> List[str]:
+    """윈도 블록 구간을 float32 ONNX로 export (이미 있으면 건너뜀). 파일 경로 목록 반환"""
+    os.makedirs(out_dir, exist_ok=True)
+    full = list(getattr(visual, "fullatt_block_indexes", []))
+    segs = [s for s in block_segments(len(visual.blocks), full) if s[0] == "onnx"]
+    paths = [os.path.join(out_dir, f"blocks_{a:02d}_{b:02d}.onnx") for _, a, b in segs]
+    todo = [(s, p) for s, p in zip(segs, paths) if not os.path.exists(p)]
+    if not todo:
+        return paths
+
+    import copy
+    grid = torch.tensor([list(EXPORT_GRID)])
+    with torch.no_grad():
+        pixels = torch.zeros(int(grid.prod()), visual.patch_embed.proj.weight[0].numel(),
+                             dtype=visual.patch_embed.proj.weight.dtype, device=visual.patch_embed.proj.weight.device)
+        prep = _Prepared(visual, visual.patch_embed(pixels), grid)
+        sample = (prep.hidden.float().cpu(), prep.cos.float().cpu(), prep.sin.float().cpu()) + window_inputs(prep.cu_window.cpu())
+    names = ["hidden", "cos", "sin", "win_index", "win_valid", "win_inverse"]
+    dynamic = {"hidden": {0: "seq"}, "cos": {0: "seq"}, "sin": {0: "seq"}, "win_index": {0: "windows", 1: "win_len"},
+               "win_valid": {0: "windows", 1: "win_len"}, "win_inverse": {0: "seq"}, "out": {0: "seq"}}
+    for (_, a, b), path in todo:
+        t0 = time.perf_counter()
+        seg = WindowBlocks([copy.deepcopy(visual.blocks[i]).float().cpu() for i in range(a, b)]).eval()
+        tmp = path + ".part"
+        with torch.no_grad():
+            torch.onnx.export(seg, sample, tmp, input_names=names, output_names=["out"],
+                              dynamic_axes=dynamic, opset_version=opset, do_constant_folding=True)
+        os.replace(tmp, path)
+        del seg
+        print(f"    + [onnx-vision] export blocks {a}-{b - 1} → {path} ({time.perf_counter() - t0:.1f}s)")
+    return paths
+
+
+def cache_dir_for(model, root: str, opset: int = ONNX_OPSET) -> str:
+    # 모델 경로 + 비전 설정 + opset/torch 버전이 같으면 같은 캐시 재사용
+    cfg = model.config
+    vision_cfg = getattr(cfg, "vision_config", None)
+    key = json.dumps({"model": getattr(cfg, "_name_or_path", ""),
+                      "vision": vision_cfg.to_dict() if vision_cfg is not None else None,
+                      "opset": opset, "torch": torch.__version__.split("+")[0]}, sort_keys=True, default=str)
+    return os.path.join(root, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+
+
+class OnnxVisionTower(nn.Module):
+    """원래 visual 모듈을 대신해 같은 (pixel_values, grid_thw) → 이미지 임베딩 계약을 지키는 모듈"""
+
+    def __init__(self, visual, paths: List[str], threads: int = 0):
+        super().__init__()
+        import onnxruntime as ort
+        self.visual = visual
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            so.intra_op_num_threads = threads
+        full = list(getattr(visual, "fullatt_block_indexes", []))
+        sessions = iter([ort.InferenceSession(p, so, providers=["CPUExecutionProvider"]) for p in paths])
+        self.plan = [(kind, a, b, next(sessions) if kind == "onnx" else None)
+                     for kind, a, b in block_segments(len(visual.blocks), full)]
+        self.last_sec: Optional[float] = None
+        self.calls = 0
+
+    @property
+    def dtype(self) -> torch.dtype:
+        return self.visual.patch_embed.proj.weight.dtype
+
+    @property
+    def device(self) -> torch.device:
+        return self.visual.patch_embed.proj.weight.device
+
+    def get_dtype(self) -> torch.dtype:
+        return self.dtype
+
+    def forward(self, hidden_states: torch.Tensor, grid_thw: torch.Tensor, **kwargs) -> torch.Tensor:
+        t0 = time.perf_counter()
+        visual = self.visual
+        prep = _Prepared(visual, visual.patch_embed(hidden_states), grid_thw)
+        hidden = prep.hidden
+        feeds: Dict[str, Any] = {}
+        for kind, a, b, sess in self.plan:
+            if kind == "torch":
+                hidden = visual.blocks[a](hidden, cu_seqlens=prep.cu_seqlens, position_embeddings=(prep.cos, prep.sin))
+                continue
+            if not feeds:
+                win_index, win_valid, win_inverse = window_inputs(prep.cu_window.cpu())
+                feeds = {"cos": prep.cos.float().cpu().numpy(), "sin": prep.sin.float().cpu().numpy(),
+                         "win_index": win_index.numpy(), "win_valid": win_valid.numpy(),
+                         "win_inverse": win_inverse.numpy()}
+            out = sess.run(None, {"hidden": hidden.float().cpu().numpy(), **feeds})[0]
+            hidden = torch.from_numpy(out).to(device=hidden.device, dtype=hidden.dtype)
+        hidden = visual.merger(hidden)
+        hidden = hidden[torch.argsort(prep.window_index)]
+        self.last_sec = time.perf_counter() - t0
+        self.calls += 1
+        return hidden
+
+
+def attach_onnx_vision(model, root: str, threads: int = 0) -> Optional[OnnxVisionTower]:
+    """model의 visual을 OnnxVisionTower로 교체 (CPU에 올라간 경우만). 교체하지 않으면 None"""
+    owner, attr = find_visual(model)
+    visual = getattr(owner, attr)
+    if isinstance(visual, OnnxVisionTower):
+        return visual
+    if visual.patch_embed.proj.weight.device.type != "cpu":
+        print(f"[onnx-vision] visual이 {visual.patch_embed.proj.weight.device}에 있어 PyTorch 경로 유지 (CPU 전용)")
+        return None
+    out_dir = cache_dir_for(model, root)
+    paths = export_segments(visual, out_dir)
+    tower = OnnxVisionTower(visual, paths, threads=threads)
+    setattr(owner, attr, tower)
+    n_onnx = sum(b - a for kind, a, b, _ in tower.plan if kind == "onnx")
+    print(f"[onnx-vision] {n_onnx}/{len(visual.blocks)} blocks on ONNX Runtime CPU  (cache {out_dir})")
+    return tower
+
+
+def detach_onnx_vision(model):
+    """원래 PyTorch visual로 되돌림 (벤치/일치도 비교용)"""
+    owner, attr = find_visual(model)
+    tower = getattr(owner, attr)
+    if isinstance(tower, OnnxVisionTower):
+        setattr(owner, attr, tower.visual)
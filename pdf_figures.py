@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+PDF → 그림 직접 추출 (Step 1 입력용)
+- 임베디드 래스터 이미지: page.get_images()로 찾은 xref를 PDF 스트림에서 그대로 꺼냄(재렌더링 없음)
+- 벡터 그림 영역: DeepSeek OCR grounding 박스(<|ref|>image<|/ref|><|det|>[[x1,y1,x2,y2]]<|/det|>)만 clip 렌더링
+- OCR이 그 박스의 크롭(page_XXXX/images/N.jpg)을 이미 저장했으면 렌더링하지 않고 그 파일을 그대로 사용 (kind=ocr)
+  → OCR md의 그림 링크와 Step1 입력이 같은 파일이 되어 build_final_jsons --join으로 조인됨
+  (크롭이 덮는 임베디드 이미지는 같은 그림이므로 따로 추출하지 않음)
+- 각 그림에 SourceRef(source_pdf, page_number, bbox, image_sha1) 출처 정보를 붙여 바로 스트리밍
+"""
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
+
+import fitz
+
+from schemas import BBox, SourceRef
+
+# runner.SUPPORTED_EXTS와 동일 (여기서 runner를 import하면 VLM 클라이언트까지 로드되므로 복제)
+DIRECT_EXTS = {"png", "jpg", "jpeg", "bmp", "tif", "tiff", "webp"}
+
+GROUNDING_RE = re.compile(r"<\|ref\|>(.*?)<\|/ref\|>\s*<\|det\|>(.*?)<\|/det\|>", re.S)
+GROUNDING_SCALE = 999.0     # DeepSeek-OCR grounding 좌표는 0~999 정규화
+REGION_OVERLAP_SKIP = 0.7   # 임베디드 이미지가 이 비율 이상 덮는 grounding 영역은 중복으로 보고 스킵
+
+
+@dataclass
+class PdfFigure:
+    image_path: str
+    source: SourceRef
+    kind: str                # embedded | region | ocr
+    label: Optional[str] = None
+
+
+def _sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _bbox(rect) -> BBox:
+    return BBox(x0=round(rect.x0, 2), y0=round(rect.y0, 2), x1=round(rect.x1, 2), y1=round(rect.y1, 2))
+
+
+def _overlap_ratio(region, rect) -> float:
+    inter = fitz.Rect(region) & rect
+    if inter.is_empty:
+        return 0.0
+    return abs(inter) / (abs(region) or 1.0)
+
+
+def _embedded_image_bytes(doc, xref: int, smask: int) -> Tuple[bytes, str]:
+    info = doc.extract_image(xref)
+    ext = (info.get("ext") or "").lower()
+    if ext in DIRECT_EXTS and not smask:
+        return info["image"], ext
+    # JPX/JBIG2 등 지원하지 않는 포맷이나 알파 마스크가 있으면 해당 xref만 PNG로 변환
+    pix = fitz.Pixmap(doc, xref)
+    if smask:
+        pix = fitz.Pixmap(pix, fitz.Pixmap(doc, smask))
+    if pix.n - pix.alpha >= 4:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix.tobytes("png"), "png"
+
+
+def parse_grounding_boxes(text: str, labels: Set[str]) -> List[Tuple[str, List[float]]]:
+    out = []
+    for m in GROUNDING_RE.finditer(text or ""):
+        label = m.group(1).strip().lower()
+        if label not in labels:
+            continue
+        try:
+            boxes = json.loads(m.group(2))
+        except Exception:
+            continue
+        if boxes and not isinstance(boxes[0], list):
+            boxes = [boxes]
+        for b in boxes:
+            if isinstance(b, list) and len(b) == 4:
+                out.append((label, [float(v) for v in b]))
+    return out
+
+
+def _page_ocr_text(ocr_root: Optional[Path], page_number: int) -> str:
+    # deepseek-ocr.py 산출물: grounding 태그가 남아 있는 result_ori.mmd 우선, 없으면 페이지 체크포인트
+    if ocr_root is None:
+        return ""
+    for path in (ocr_root / f"page_{page_number:04d}" / "result_ori.mmd", ocr_root / f"page_{page_number:04d}.md"):
+        if path.exists():
+            return path.read_text(encoding="utf-8", errors="ignore")
+    return ""
+
+
+def _ocr_crop_path(ocr_root: Optional[Path], page_number: int, crop_no: int) -> Optional[Path]:
+    # DeepSeek-OCR은 image 라벨 박스만 순서대로 images/{0,1,...}.jpg로 크롭 저장
+    if ocr_root is None:
+        return None
+    path = ocr_root / f"page_{page_number:04d}" / "images" / f"{crop_no}.jpg"
+    return path if path.exists() else None
+
+
+def iter_pdf_figures(
+    pdf_path: Path,
+    out_dir: Path,
+    ocr_root: Optional[Path] = None,
+    min_side: int = 128,
+    region_dpi: int = 200,
+    region_labels: Optional[Set[str]] = None,
+) -> Iterator[PdfFigure]:
+    """
+    PDF 하나에서 그림을 페이지 순서대로 추출해 하나씩 yield 합니다.
+    - 같은 이미지(sha1)가 여러 페이지에 반복되면(로고 등) 처음 것만 사용
+    """
+    region_labels = region_labels or {"image", "figure", "chart"}
+    pdf_path = Path(pdf_path)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    seen: Set[str] = set()
+    zoom = region_dpi / 72.0
+
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            page_number = page.number + 1
+            stem = f"{pdf_path.stem}_p{page_number:04d}"
+            image_rects = []
+
+            # grounding 박스 → 페이지 좌표 영역 + (있으면) OCR 크롭 파일
+            page_rect = page.rect
+            regions = []
+            crop_no = 0
+            for label, (x1, y1, x2, y2) in parse_grounding_boxes(_page_ocr_text(ocr_root, page_number), region_labels):
+                crop = None
+                if label == "image":
+                    crop = _ocr_crop_path(ocr_root, page_number, crop_no)
+                    crop_no += 1
+                region = fitz.Rect(
+                    page_rect.x0 + x1 / GROUNDING_SCALE * page_rect.width,
+                    page_rect.y0 + y1 / GROUNDING_SCALE * page_rect.height,
+                    page_rect.x0 + x2 / GROUNDING_SCALE * page_rect.width,
+                    page_rect.y0 + y2 / GROUNDING_SCALE * page_rect.height,
+                ) & page_rect
+                regions.append((label, region, crop))
+            crop_rects = [region for _, region, crop in regions if crop is not None and not region.is_empty]
+
+            for n, item in enumerate(page.get_images(full=True)):
+                xref, smask, width, height = item[0], item[1], item[2], item[3]
+                if min(width, height) < min_side:
+                    continue
+                rects = page.get_image_rects(xref)
+                if not rects:
+                    continue
+                if any(_overlap_ratio(rects[0], c) >= REGION_OVERLAP_SKIP for c in crop_rects):
+                    continue   # OCR 크롭으로 대신 처리
+                image_rects.extend(rects)
+                data, ext = _embedded_image_bytes(doc, xref, smask)
+                sha1 = _sha1(data)
+                if sha1 in seen:
+                    continue
+                seen.add(sha1)
+
+                image_path = out_dir / f"{stem}_img{n}.{ext}"
+                image_path.write_bytes(data)
+                yield PdfFigure(
+                    image_path=str(image_path),
+                    source=SourceRef(source_pdf=str(pdf_path), page_number=page_number,
+                                     image_path=str(image_path), image_sha1=sha1, bbox=_bbox(rects[0])),
+                    kind="embedded",
+                )
+
+            for n, (label, region, crop) in enumerate(regions):
+                if region.is_empty or min(region.width, region.height) * zoom < min_side:
+                    continue
+                if crop is not None:
+                    data = crop.read_bytes()
+                    sha1 = _sha1(data)
+                    if sha1 in seen:
+                        continue
+                    seen.add(sha1)
+                    yield PdfFigure(
+                        image_path=str(crop),
+                        source=SourceRef(source_pdf=str(pdf_path), page_number=page_number,
+                                         image_path=str(crop), image_sha1=sha1, bbox=_bbox(region)),
+                        kind="ocr",
+                        label=label,
+                    )
+                    continue
+                if any(_overlap_ratio(region, r) >= REGION_OVERLAP_SKIP for r in image_rects):
+                    continue
+
+                # 페이지 전체가 아니라 그림 영역만 렌더링
+                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=region, alpha=False)
+                data = pix.tobytes("png")
+                sha1 = _sha1(data)
+                if sha1 in seen:
+                    continue
+                seen.add(sha1)
+
+                image_path = out_dir / f"{stem}_reg{n}.png"
+                image_path.write_bytes(data)
+                yield PdfFigure(
+                    image_path=str(image_path),
+                    source=SourceRef(source_pdf=str(pdf_path), page_number=page_number,
+                                     image_path=str(image_path), image_sha1=sha1, bbox=_bbox(region)),
+                    kind="region",
+                    label=label,
+                )
+
+
+def iter_folder_figures(pdf_dir: Path, out_dir: Path, ocr_dir: Optional[Path] = None, shard=None,
+                        **kwargs) -> Iterator[PdfFigure]:
+    # shard: fs_scan.Shard (PDF 파일명 해시로 분할, None이면 전체)
+    from fs_scan import in_shard
+    pdf_paths = sorted(p for p in Path(pdf_dir).glob("*.pdf") if in_shard(p.name, None, shard))
+    for pdf_path in pdf_paths:
+        ocr_root = Path(ocr_dir) / pdf_path.stem if ocr_dir else None
+        yield from iter_pdf_figures(pdf_path, Path(out_dir) / pdf_path.stem, ocr_root=ocr_root, **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf_dir", type=str, required=True, help="Directory containing .pdf files")
+    parser.add_argument("--out_dir", type=str, required=True, help="Output directory for extracted figures")
+    parser.add_argument("--ocr_dir", type=str, default=None, help="deepseek-ocr.py output root (for grounding boxes)")
+    parser.add_argument("--min_side", type=int, default=128)
+    args = parser.parse_args()
+    for fig in iter_folder_figures(Path(args.pdf_dir), Path(args.out_dir),
+                                   Path(args.ocr_dir) if args.ocr_dir else None, min_side=args.min_side):
+        print(f"{fig.kind:<8} p{fig.source.page_number:<4} {fig.image_path}")
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+PDF 페이지 렌더링 워커 (deepseek-ocr.py 파이프라인용)
+- 렌더 프로세스 풀에서 실행되므로 fitz 외의 무거운 모듈(torch 등)은 import하지 않음
+- 결과는 파일 경로가 아니라 메모리(bytes)로 넘김
+- analyze_page(): 텍스트 레이어/이미지 면적/썸네일 픽셀 분산으로 페이지 유형(blank|sparse|normal|dense) 판정
+"""
+import time
+from typing import Any, Dict, Optional
+
+import fitz
+
+# 페이지 분석 임계값
+THUMB_DPI = 18
+INK_LEVEL = 160              # 썸네일 그레이값이 이보다 어두우면 "잉크"로 간주
+BLANK_INK_RATIO = 0.003
+BLANK_STD = 4.0
+SCANNED_IMAGE_COVERAGE = 0.8 # 텍스트 레이어 없이 이미지가 이 이상 덮으면 스캔 페이지
+DENSE_IMAGE_COVERAGE = 0.2
+DENSE_DRAWINGS = 150
+DENSE_WORDS = 700
+DENSE_SCANNED_INK_RATIO = 0.12
+SPARSE_WORDS = 120
+SPARSE_INK_RATIO = 0.03
+
+# 워커 프로세스마다 최근에 연 문서 하나만 유지 (fitz.Document는 스레드/프로세스 간 공유 불가)
+_DOC_CACHE: Dict[str, Any] = {}
+
+
+def _open_doc(pdf_path: str):
+    doc = _DOC_CACHE.get(pdf_path)
+    if doc is None:
+        for d in _DOC_CACHE.values():
+            d.close()
+        _DOC_CACHE.clear()
+        doc = fitz.open(pdf_path)
+        _DOC_CACHE[pdf_path] = doc
+    return doc
+
+
+def _image_coverage(page) -> float:
+    page_rect = page.rect
+    page_area = abs(page_rect) or 1.0
+    covered = 0.0
+    for info in page.get_image_info():
+        r = fitz.Rect(info["bbox"]) & page_rect
+        if not r.is_empty:
+            covered += abs(r)
+    return min(1.0, covered / page_area)
+
+
+def analyze_page(page) -> Dict[str, Any]:
+    words = len(page.get_text("words"))
+    image_coverage = _image_coverage(page)
+    drawings = len(page.get_cdrawings())
+
+    thumb = page.get_pixmap(matrix=fitz.Matrix(THUMB_DPI / 72.0, THUMB_DPI / 72.0),
+                            colorspace=fitz.csGRAY, alpha=False)
+    samples = thumb.samples
+    n = len(samples) or 1
+    mean = sum(samples) / n
+    var = max(0.0, sum(v * v for v in samples) / n - mean * mean)
+    ink_ratio = sum(1 for v in samples if v < INK_LEVEL) / n
+
+    scanned = words == 0 and image_coverage >= SCANNED_IMAGE_COVERAGE
+    if words == 0 and ink_ratio < BLANK_INK_RATIO and var ** 0.5 < BLANK_STD:
+        kind = "blank"
+    elif ((not scanned and image_coverage >= DENSE_IMAGE_COVERAGE) or drawings >= DENSE_DRAWINGS
+          or words >= DENSE_WORDS or (scanned and ink_ratio >= DENSE_SCANNED_INK_RATIO)):
+        kind = "dense"
+    elif (words < SPARSE_WORDS and ink_ratio < SPARSE_INK_RATIO and drawings < DENSE_DRAWINGS // 10
+          and (scanned or image_coverage < 0.05)):
+        kind = "sparse"
+    else:
+        kind = "normal"
+
+    return {
+        "kind": kind,
+        "words": words,
+        "image_coverage": round(image_coverage, 4),
+        "drawings": drawings,
+        "ink_ratio": round(ink_ratio, 4),
+        "pixel_std": round(var ** 0.5, 2),
+        "scanned": scanned,
+    }
+
+
+def render_page(pdf_path: str, page_idx: int, dpi: int, png_path: Optional[str] = None,
+                profile_dpi: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    페이지 하나를 렌더링해 비압축 PPM bytes로 반환합니다.
+    - png_path가 주어지면 page_XXXX.png만 저장하고 image_bytes는 None (압축 비용은 렌더 워커가 부담)
+    - profile_dpi({kind: dpi})가 주어지면 analyze_page 결과에 따라 DPI를 고르고, blank 페이지는 렌더링하지 않음
+    """
+    t0 = time.perf_counter()
+    doc = _open_doc(pdf_path)
+    page = doc.load_page(page_idx)
+
+    analysis = None
+    if profile_dpi is not None:
+        analysis = analyze_page(page)
+        if analysis["kind"] == "blank":
+            return {
+                "page_idx": page_idx,
+                "image_bytes": None,
+                "png_path": None,
+                "dpi": None,
+                "analysis": analysis,
+                "analyze_sec": time.perf_counter() - t0,
+                "render_sec": 0.0,
+                "png_sec": 0.0,
+                "encode_sec": 0.0,
+            }
+        dpi = profile_dpi.get(analysis["kind"], dpi)
+    ta = time.perf_counter()
+
+    zoom = dpi / 72.0
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    t1 = time.perf_counter()
+
+    if png_path:
+        pix.save(png_path)
+    t2 = time.perf_counter()
+
+    # PNG를 저장했으면 호출 측이 파일 경로를 쓰므로 PPM 인코딩/IPC 생략
+    image_bytes = None if png_path else pix.tobytes("ppm")
+    t3 = time.perf_counter()
+
+    return {
+        "page_idx": page_idx,
+        "image_bytes": image_bytes,
+        "png_path": png_path,
+        "width": pix.width,
+        "height": pix.height,
+        "dpi": dpi,
+        "analysis": analysis,
+        "analyze_sec": ta - t0,
+        "render_sec": t1 - ta,
+        "png_sec": t2 - t1,
+        "encode_sec": t3 - t2,
+    }
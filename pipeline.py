@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+PDF → RAG용 final JSON 스트리밍 오케스트레이터
+    ocr(deepseek-ocr) → figures(pdf_figures) → step1(runner) → step2(runner_summary)  →  final(build_final_jsons --join)
+    → 키워드 역색인(keyword_index)
+- 단계마다 워커 스레드 수를 따로 지정하고, 단계 사이는 크기 제한 큐로 연결 (하류가 밀리면 상류가 대기)
+- 문서 하나의 OCR이 끝나는 즉시 그 문서의 그림이 Step1로 넘어가므로 GPU OCR과 VLM 차트 파싱이 겹쳐서 실행됨
+- 진행 상황(큐 길이/처리 수/처리량/가동률)을 PIPELINE_PROGRESS_SEC마다 단계별로 출력
+- 각 단계는 기존 산출물(page_XXXX.md, out/json, out/summary)이 있으면 건너뛰므로 중단 후 재실행 시 이어서 처리
+사용:
+    python pipeline.py
+"""
+import importlib
+import os
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional
+
+from config import (
+    BACKEND, CASCADE_BACKEND, INPUT_PDF_DIR, OUTPUT_FIGURE_DIR, OUTPUT_JSON_DIR, OUTPUT_SUMMARY_DIR, OUTPUT_INDEX_DIR,
+    OUTPUT_VECTOR_DIR,
+    PDF_FIGURE_MIN_SIDE, PDF_FIGURE_DPI,
+    DEEPSEEK_RENDER_WORKERS, DEEPSEEK_SCRATCH_DIR, DEEPSEEK_MD_FSYNC_PAGES,
+    PIPELINE_OCR_ADAPTIVE, PIPELINE_OCR_WORKERS, PIPELINE_FIGURE_WORKERS, PIPELINE_STEP1_WORKERS, PIPELINE_STEP2_WORKERS,
+    PIPELINE_QUEUE_SIZE, PIPELINE_PROGRESS_SEC, PIPELINE_OUT_DIR,
+)
+
+_DONE = object()
+
+
+class Stage:
+    """
+    fn(item)이 내놓는 결과(iterable)를 모든 하류 단계의 입력 큐로 넘기는 워커 스레드 묶음.
+    - 상류 단계가 모두 끝나면 워커 수만큼 종료 표시를 넣고, 워커가 끝나면 하류로 종료를 전파
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Optional[Iterable[Any]]], workers: int = 1,
+                 maxsize: int = PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inbox: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+        self.downstream: List["Stage"] = []
+        self.upstream_open = 0
+        self.threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+        self.emitted = 0
+        self.busy = 0
+        self.busy_sec = 0.0      # fn 실행 시간 (하류 큐 대기 제외)
+        self.blocked_sec = 0.0   # 하류 큐가 가득 차서 기다린 시간
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to(self, other: "Stage") -> "Stage":
+        self.downstream.append(other)
+        other.upstream_open += 1
+        return other
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def _emit(self, out: Any) -> float:
+        t0 = time.perf_counter()
+        for d in self.downstream:
+            d.inbox.put(out)
+        blocked = time.perf_counter() - t0
+        with self._lock:
+            self.emitted += 1
+            self.blocked_sec += blocked
+        return blocked
+
+    def _loop(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+            with self._lock:
+                self.busy += 1
+            t0 = time.perf_counter()
+            blocked = 0.0
+            ok = True
+            try:
+                for out in self.fn(item) or ():
+                    blocked += self._emit(out)
+            except Exception as e:
+                ok = False
+                print(f"    * [{self.name}] 실패 ({item}): {e}")
+            with self._lock:
+                self.busy -= 1
+                self.busy_sec += time.perf_counter() - t0 - blocked
+                if ok:
+                    self.done += 1
+                else:
+                    self.failed += 1
+
+    def upstream_finished(self):
+        with self._lock:
+            self.upstream_open -= 1
+            last = self.upstream_open <= 0
+        if last:
+            for _ in self.threads:
+                self.inbox.put(_DONE)
+
+    def join(self):
+        for t in self.threads:
+            t.join()
+        self.finished_at = time.perf_counter()
+        for d in self.downstream:
+            d.upstream_finished()
+
+    def status(self, now: float) -> str:
+        elapsed = max(1e-6, (self.finished_at or now) - (self.started_at or now))
+        rate = 60.0 * self.done / elapsed
+        util = 100.0 * self.busy_sec / (elapsed * self.workers)
+        state = "done" if self.finished_at else f"busy {self.busy}/{self.workers}"
+        return (f"{self.name:<8} q {self.inbox.qsize():>3}/{self.inbox.maxsize:<3} {state:<10} "
+                f"done {self.done:>5} fail {self.failed:>3} out {self.emitted:>5}  "
+                f"{rate:7.1f}/min  util {util:5.1f}%  blocked {self.blocked_sec:6.1f}s")
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], progress_sec: float = PIPELINE_PROGRESS_SEC):
+        self.stages = stages
+        self.progress_sec = progress_sec
+        self._stop = threading.Event()
+
+    def print_progress(self):
+        now = time.perf_counter()
+        t0 = min(s.started_at or now for s in self.stages)
+        print(f"[pipeline {now - t0:8.1f}s]")
+        for s in self.stages:
+            print("   " + s.status(now))
+
+    def _monitor(self):
+        while not self._stop.wait(self.progress_sec):
+            self.print_progress()
+
+    def run(self, items: Iterable[Any]):
+        """items를 첫 단계에 넣고 모든 단계가 끝날 때까지 기다립니다. (stages는 위상 정렬 순서)"""
+        head = self.stages[0]
+        head.upstream_open += 1
+        for s in self.stages:
+            s.start()
+        monitor = threading.Thread(target=self._monitor, name="pipeline-progress", daemon=True)
+        if self.progress_sec > 0:
+            monitor.start()
+        try:
+            for item in items:
+                head.inbox.put(item)
+            head.upstream_finished()
+            for s in self.stages:
+                s.join()
+        finally:
+            self._stop.set()
+        self.print_progress()
+
+
+# =========================
+# Stage functions
+# =========================
+
+def ocr_devices() -> List[Optional[str]]:
+    # OCR 워커는 장치당 하나: 같은 GPU에 모델을 여러 벌 올리면 메모리만 늘고 처리량은 그대로
+    import torch
+    n = torch.cuda.device_count() if torch.cuda.is_available() else 0
+    return [f"cuda:{i}" for i in range(n)] or [None]
+
+
+def make_ocr_fn(ds, pools: list, devices: Optional[List[Optional[str]]] = None):
+    # 워커 스레드마다 모델/렌더 풀을 하나씩 유지, 모델은 devices[워커 순번]에 로드 (None = 기본 장치)
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing as mp
+
+    devices = devices or [None]
+    local = threading.local()
+    pools_lock = threading.Lock()
+
+    def ocr(pdf_path: Path):
+        if not hasattr(local, "model"):
+            with pools_lock:
+                device = devices[len(pools) % len(devices)]
+            local.model, local.tokenizer = ds.load_model(device)
+            local.pool = ProcessPoolExecutor(max_workers=max(1, DEEPSEEK_RENDER_WORKERS),
+                                             mp_context=mp.get_context("spawn"))
+            with pools_lock:
+                pools.append(local.pool)
+        start_page, end_page = ds.resolve_page_range(pdf_path)
+        assembler = ds.MarkdownAssembler(DEEPSEEK_MD_FSYNC_PAGES)
+        ds.process_shard((pdf_path, start_page, end_page), local.model, local.tokenizer, local.pool,
+                         DEEPSEEK_SCRATCH_DIR, assembler, adaptive=PIPELINE_OCR_ADAPTIVE)
+        complete = assembler.advance(pdf_path)
+        assembler.close()
+        if complete:
+            yield pdf_path
+
+    return ocr
+
+
+def make_figures_fn(ds):
+    from pdf_figures import iter_pdf_figures
+
+    def figures(pdf_path: Path):
+        yield from iter_pdf_figures(pdf_path, Path(OUTPUT_FIGURE_DIR) / pdf_path.stem,
+                                    ocr_root=ds.output_root_for(pdf_path),
+                                    min_side=PDF_FIGURE_MIN_SIDE, region_dpi=PDF_FIGURE_DPI)
+
+    return figures
+
+
+def make_step1_fn(vlm_lock):
+    import runner
+
+    def step1(fig):
+        json_path = runner.json_path_for(fig.image_path)
+        if not os.path.exists(json_path):
+            with vlm_lock:
+                json_path = runner.process_path(fig.image_path, source=fig.source)
+        if json_path:
+            yield json_path
+
+    return step1
+
+
+def make_step2_fn(vlm_lock):
+    import runner_summary
+
+    def step2(json_path: str):
+        base = os.path.splitext(os.path.basename(json_path))[0]
+        if os.path.exists(os.path.join(OUTPUT_SUMMARY_DIR, f"{base}.summary.txt")):
+            return
+        with vlm_lock:
+            runner_summary.process_json(json_path)
+
+    return step2
+
+
+def main():
+    pdf_paths = sorted(Path(INPUT_PDF_DIR).glob("*.pdf"))
+    if not pdf_paths:
+        raise FileNotFoundError(f"No PDF files found in: {INPUT_PDF_DIR}")
+
+    ds = importlib.import_module("deepseek-ocr")
+    ds.base_output_dir.mkdir(parents=True, exist_ok=True)
+    os.makedirs(OUTPUT_JSON_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_SUMMARY_DIR, exist_ok=True)
+
+    # HF 백엔드는 프로세스 안의 Qwen 모델 하나를 Step1/Step2가 공유하므로 호출을 직렬화
+    # (원격 백엔드는 워커 수만큼 동시 요청, 캐스케이드 한쪽이 hf여도 직렬화)
+    vlm_lock = threading.Lock() if "hf" in (BACKEND, CASCADE_BACKEND) else nullcontext()
+
+    pools: list = []
+    devices = ocr_devices()
+    ocr_workers = min(max(1, PIPELINE_OCR_WORKERS), len(devices))
+    if ocr_workers < PIPELINE_OCR_WORKERS:
+        print(f"⚠️ PIPELINE_OCR_WORKERS={PIPELINE_OCR_WORKERS} → {ocr_workers} (장치당 OCR 워커 하나, "
+              f"보이는 장치: {', '.join(d or 'cpu' for d in devices)})")
+    ocr = Stage("ocr", make_ocr_fn(ds, pools, devices), ocr_workers)
+    figures = Stage("figures", make_figures_fn(ds), PIPELINE_FIGURE_WORKERS)
+    step1 = Stage("step1", make_step1_fn(vlm_lock), PIPELINE_STEP1_WORKERS)
+    step2 = Stage("step2", make_step2_fn(vlm_lock), PIPELINE_STEP2_WORKERS)
+    ocr.to(figures).to(step1).to(step2)
+
+    print(f"🧩 {len(pdf_paths)} PDF(s), workers: ocr {ocr.workers}, figures {figures.workers}, "
+          f"step1 {step1.workers}, step2 {step2.workers} (backend={BACKEND})")
+    try:
+        Pipeline([ocr, figures, step1, step2]).run(pdf_paths)
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+    import runner
+    runner.print_run_stats()
+
+    # 최종 JSON: 완성된 문서 md({stem}_{start}-{end}.md)만 파싱 + 그림 조인, 변경된 문서만 다시 파싱
+    from build_final_jsons import run as build_final
+    build_final(ds.base_output_dir, Path(PIPELINE_OUT_DIR), pattern="*_*-*.md", incremental=True,
+                graph_json_dir=Path(OUTPUT_JSON_DIR), graph_summary_dir=Path(OUTPUT_SUMMARY_DIR))
+
+    # 차트 키워드 역색인: 이번 실행에서 새로 생긴 Step1 JSON만 새 세그먼트로 추가
+    from keyword_index import update_index
+    r = update_index(Path(OUTPUT_JSON_DIR), Path(OUTPUT_INDEX_DIR))
+    print(f"[index] +{r['added']} charts, live {r['live']}, segments {r['segments']}  {r['sec']:.2f}s")
+
+    # 요약/본문 청크 벡터 색인: 내용이 바뀐 레코드만 임베딩해 뒤에 덧붙임
+    from vector_index import update_vector_index
+    r = update_vector_index(Path(OUTPUT_SUMMARY_DIR), Path(PIPELINE_OUT_DIR) / "final", Path(OUTPUT_VECTOR_DIR))
+    print(f"[vindex] +{r['added']} records, deleted {r['deleted']}, live {r['live']}  {r['sec']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
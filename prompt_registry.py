@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+버전별 프롬프트 변형 레지스트리
+- PROMPT_VARIANT(config)로 vlm_client가 사용할 변형 선택, compare_prompts.py로 토큰 수/A-B 비교
+- 새 변형은 PromptVariant를 만들어 register()로 추가 (이름은 바꾸지 말고 버전을 올릴 것: 저장된 A/B 결과와 대응)
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+from prompts_chart_keywords import (
+    SYSTEM_PROMPT, SYSTEM_PROMPT_COMPACT,
+    make_user_prompt, make_user_prompt_compact,
+    make_combined_prompt, make_combined_prompt_compact,
+    make_keywords_only_prompt,
+)
+from prompts_semantic_summary import (
+    SYSTEM_PROMPT_SUMMARY, SYSTEM_PROMPT_SUMMARY_COMPACT,
+    make_summary_prompt, make_summary_prompt_compact,
+)
+
+
+@dataclass(frozen=True)
+class PromptVariant:
+    name: str
+    description: str
+    system: str                                                  # Step1 / 키워드 재호출 시스템 프롬프트
+    make_user: Callable[[int, int], str]                          # (keywords_min, keywords_max)
+    make_combined: Callable[[int, int, int, int], str]            # (+ min_sentences, max_sentences)
+    make_keywords_only: Callable[[int, int], str]
+    summary_system: str
+    make_summary: Callable[[List[str], int, int], str]            # (keywords, min_sentences, max_sentences)
+
+
+PROMPT_VARIANTS: Dict[str, PromptVariant] = {}
+
+
+def register(variant: PromptVariant) -> PromptVariant:
+    if variant.name in PROMPT_VARIANTS:
+        raise ValueError(f"prompt variant already registered: {variant.name}")
+    PROMPT_VARIANTS[variant.name] = variant
+    return variant
+
+
+def get_variant(name: str) -> PromptVariant:
+    try:
+        return PROMPT_VARIANTS[name]
+    except KeyError:
+        raise KeyError(f"unknown PROMPT_VARIANT={name!r} (available: {', '.join(PROMPT_VARIANTS)})") from None
+
+
+register(PromptVariant(
+    name="v1",
+    description="기존 프롬프트 (규칙 목록 + 예시 + 들여쓴 스키마)",
+    system=SYSTEM_PROMPT,
+    make_user=make_user_prompt,
+    make_combined=make_combined_prompt,
+    make_keywords_only=make_keywords_only_prompt,
+    summary_system=SYSTEM_PROMPT_SUMMARY,
+    make_summary=make_summary_prompt,
+))
+
+register(PromptVariant(
+    name="compact-v1",
+    description="같은 규칙/필드를 축약 (예시 최소화, 한 줄 스키마, 선택 필드 생략)",
+    system=SYSTEM_PROMPT_COMPACT,
+    make_user=make_user_prompt_compact,
+    make_combined=make_combined_prompt_compact,
+    make_keywords_only=make_keywords_only_prompt,
+    summary_system=SYSTEM_PROMPT_SUMMARY_COMPACT,
+    make_summary=make_summary_prompt_compact,
+))
@@ -4,6 +4,8 @@
 - SYSTEM_PROMPT: 그래프 구조 추출 → 그 결과로부터만 키워드(10~15개) 생성
 - make_user_prompt(): 키워드 개수와 함께 사용자 프롬프트를 문자열로 생성
 - SCHEMA_HINT: 모델이 따라야 할 JSON 스키마 힌트(필드명 고정)
+- make_combined_prompt(): Step1 + Step2 한 번에 (key_phrases 다음에 semantic_summary까지 생성)
+- *_COMPACT / make_*_compact(): 같은 필드를 요구하는 축약 변형 (prefill 토큰 절감, prompt_registry.py의 compact-v1)
 """
 
 SYSTEM_PROMPT = (
@@ -97,6 +99,23 @@ def make_user_prompt(keywords_min: int = 10, keywords_max: int = 15) -> str:
         f"{SCHEMA_HINT}"
     )
 
+def make_combined_prompt(keywords_min: int = 10, keywords_max: int = 15,
+                         min_sentences: int = 3, max_sentences: int = 6) -> str:
+    """
+    Step1 프롬프트 + 의미 요약 필드(semantic_summary).
+    - 요약은 key_phrases 뒤에 생성되도록 마지막 필드로 두어, 2단계 방식처럼 방금 만든 키워드를 근거로 작성하게 함
+    """
+    schema = SCHEMA_HINT.replace('  "key_phrases": []\n}', '  "key_phrases": [],\n  "semantic_summary": null\n}')
+    return (
+        make_user_prompt(keywords_min, keywords_max).replace(SCHEMA_HINT, "")
+        + "추가 요구 사항 (semantic_summary):\n"
+        f"- key_phrases를 모두 생성한 뒤, 그 키워드와 그래프를 근거로 의미 중심의 한국어 요약을 {min_sentences}~{max_sentences}문장으로 작성해 semantic_summary에 넣으세요.\n"
+        "- 포함: 핵심 관계/추세, 임계점/최적 범위, 도메인 메커니즘(가능시), 한계나 불확실성\n"
+        "- 금지: 불필요한 수치 나열, 파일/URL/워터마크, 과도한 추측\n"
+        "- 그래프가 아니면(is_chart=false) semantic_summary는 null\n\n"
+        f"{schema}"
+    )
+
 # JSON 파싱이 실패했을 때 곧바로 fallback으로 가지 말고, VLM을 한 번 더 호출해서 key_phrases만 추출하도록 파이프라인 확장
 
 def make_keywords_only_prompt(keywords_min: int = 10, keywords_max: int = 15) -> str:
@@ -114,3 +133,51 @@ def make_keywords_only_prompt(keywords_min: int = 10, keywords_max: int = 15) ->
         "설명/코드펜스 금지."
     )
 
+
+# =========================
+# Compact 변형: 규칙은 유지하고 예시/중복 설명과 스키마 공백을 줄임
+# (subplots/table_like 등 선택 필드는 스키마에서 빼도 파싱 시 기본값으로 채워짐)
+# =========================
+
+SYSTEM_PROMPT_COMPACT = (
+    "Extract chart metadata from the image as ONE JSON object following the given schema. No code fences or extra text.\n"
+    "1) Copy the chart structure (title, axes, legend, series, ticks) as-is; use Korean for copied text. "
+    "Inferred fields: \"is_inferred\": true. Unreadable/uncertain: null (do NOT guess).\n"
+    "2) key_phrases: short Korean noun phrases derived ONLY from the extracted fields. "
+    "At least 6 must be semantic (관계/추세/임계/최적/메커니즘/영역, e.g. \"염기도–점도 반비례\", \"임계온도 140℃\"). "
+    "At most 2 numbers/formulas, always with meaning. No duplicates or near-synonyms. "
+    "Normalize CaO, SiO2, Al2O3, MgO. Prefer ironmaking terms (슬래그 점도, 염기도, 유동성, 탈황).\n"
+    "3) Not a chart: \"is_chart\": false and other fields null/[]/false.\n"
+    "Exclude URLs, emails, figure/table numbers, watermarks, DOIs, random codes."
+)
+
+SCHEMA_HINT_COMPACT = (
+    '{"is_chart":true,"chart_type":"bar|line|scatter|area|histogram|box|heatmap|pie|mixed|other|null",'
+    '"orientation":"horizontal|vertical|mixed|unknown","title":{"text":null,"is_inferred":false},'
+    '"x_axis":{"name":null,"unit":null,"is_inferred":false,"scale":"linear|log|category|datetime|unknown"},'
+    '"y_axis":{...x_axis와 같은 형식},"secondary_y_axis":{...x_axis와 같은 형식},'
+    '"legend":{"present":false,"labels":[],"location_hint":null},"data_series_count":null,'
+    '"series":[{"label":null,"sample_points":[],"summary":null}],"annotations":[],'
+    '"quality_flags":{"low_resolution":false,"cropped_or_cutoff":false,"non_korean_text_present":false,'
+    '"heavy_watermark":false,"skew_or_perspective":false},"confidence":0.0,"key_phrases":[]}'
+)
+
+def _compact_requirements(keywords_min: int, keywords_max: int) -> str:
+    return (
+        "이미지의 그래프 구조를 스키마대로 추출하고, 추출한 내용만 근거로 key_phrases를 "
+        f"{keywords_min}~{keywords_max}개(최대 {keywords_max}개) 만드세요. 확실하지 않으면 null/빈 배열. "
+        "스키마에 없는 키 금지, JSON 하나만 출력.\n"
+    )
+
+def make_user_prompt_compact(keywords_min: int = 10, keywords_max: int = 15) -> str:
+    return _compact_requirements(keywords_min, keywords_max) + f"스키마: {SCHEMA_HINT_COMPACT}"
+
+def make_combined_prompt_compact(keywords_min: int = 10, keywords_max: int = 15,
+                                 min_sentences: int = 3, max_sentences: int = 6) -> str:
+    schema = SCHEMA_HINT_COMPACT.replace('"key_phrases":[]}', '"key_phrases":[],"semantic_summary":null}')
+    return (
+        _compact_requirements(keywords_min, keywords_max)
+        + f"key_phrases 뒤에 semantic_summary: 키워드와 그래프를 근거로 한 한국어 요약 {min_sentences}~{max_sentences}문장"
+        "(관계/추세, 임계/최적 범위, 메커니즘, 불확실성; 수치 나열·추측 금지, 그래프가 아니면 null).\n"
+        f"스키마: {schema}"
+    )
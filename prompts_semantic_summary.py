@@ -3,6 +3,7 @@
 Step 2: 이미지 + 키워드 기반 의미 요약(semantic summary) 프롬프트
 - SYSTEM_PROMPT_SUMMARY: 의미 중심 도메인 요약
 - make_summary_prompt(): 사용자 프롬프트
+- SYSTEM_PROMPT_SUMMARY_COMPACT / make_summary_prompt_compact(): 축약 변형 (prompt_registry.py의 compact-v1)
 """
 from typing import List
 
@@ -30,3 +31,17 @@ def make_summary_prompt(keywords: List[str], min_sentences: int = 3, max_sentenc
         f"{kw_block}\n"
         "\n출력 형태: 순수 한국어 요약문만 출력 (코드펜스/메타데이터 금지)"
     )
+
+SYSTEM_PROMPT_SUMMARY_COMPACT = (
+    "Write a concise Korean semantic summary of an ironmaking/steelmaking chart from the image and the given keywords: "
+    "관계/추세/임계/최적/메커니즘/영역. State uncertainty explicitly. "
+    "No OCR noise, file names, URLs, or data not supported by the chart."
+)
+
+def make_summary_prompt_compact(keywords: List[str], min_sentences: int = 3, max_sentences: int = 6) -> str:
+    kw = [k for k in (keywords or []) if isinstance(k, str)]
+    return (
+        f"키워드를 근거로 {min_sentences}~{max_sentences}문장 한국어 요약만 출력 "
+        "(수치 나열/추측/코드펜스 금지).\n"
+        f"키워드: {', '.join(kw) if kw else '(없음)'}"
+    )
@@ -1,26 +1,30 @@
-import os, json, time
-from typing import List
+import argparse, os, json, threading, time
+from collections import deque
+from typing import Callable, Iterable, Iterator, Optional
 from config import (
     BACKEND, INPUT_MODE, INPUT_IMAGE_DIR, INPUT_IMAGE_PATH,
-    OUTPUT_JSON_DIR, OUTPUT_RAW_DIR,
-    SAVE_NON_CHART_JSON, SAVE_RAW_RESPONSE
+    INPUT_PDF_DIR, PDF_OCR_DIR, PDF_FIGURE_MIN_SIDE, PDF_FIGURE_DPI, INPUT_QUEUE_FILE,
+    OUTPUT_JSON_DIR, OUTPUT_RAW_DIR, OUTPUT_FIGURE_DIR, OUTPUT_SUMMARY_DIR,
+    SAVE_NON_CHART_JSON, SAVE_RAW_RESPONSE, STEP1_WITH_SUMMARY, SHARD, HF_PREFETCH
+)
+from vlm_client import (
+    infer_chart_metadata_cascade, prefetch_hf_inputs, hf_stats_report, hedge_stats_report, cascade_stats_report
 )
-from vlm_client import infer_chart_metadata_from_image
 from schemas import to_json_dict
+from fs_scan import Shard, in_shard, iter_files, parse_shard, root_of
+from figure_join import output_stem
 
 SUPPORTED_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
 
+# 실행 전체 집계 (JSON 파싱 실패 중 잘린 JSON 복구로 살린 비율, 생략된 키워드 재호출 수)
+RUN_STATS = {"images": 0, "json_parse_error": 0, "json_salvaged": 0, "keywords_retry": 0, "keywords_retry_avoided": 0}
+_RUN_STATS_LOCK = threading.Lock()   # pipeline.py step1 워커 스레드가 동시에 갱신 (원격 백엔드는 호출이 직렬화되지 않음)
+
 def _ensure_dirs():
     os.makedirs(OUTPUT_JSON_DIR, exist_ok=True)
     os.makedirs(OUTPUT_RAW_DIR, exist_ok=True)
-
-def _list_images(folder: str) -> List[str]:
-    images = []
-    for root, _, files in os.walk(folder):
-        for fn in files:
-            if os.path.splitext(fn)[1].lower() in SUPPORTED_EXTS:
-                images.append(os.path.join(root, fn))
-    return sorted(images)
+    if STEP1_WITH_SUMMARY:
+        os.makedirs(OUTPUT_SUMMARY_DIR, exist_ok=True)
 
 def _save_json(meta, out_path: str):
     with open(out_path, "w", encoding="utf-8") as f:
@@ -36,31 +40,76 @@ def _save_raw_pair(base_name: str, raw_text: str, raw_http_json: dict):
         json.dump(raw_http_json or {}, f, ensure_ascii=False, indent=2)
     print(f"    + 원본 응답 저장: {raw_txt_path}, {raw_json_path}")
 
+def _save_summary_text(base_name: str, summary_text: str):
+    # runner_summary.py와 같은 경로/형식 (STEP1_WITH_SUMMARY)
+    path = os.path.join(OUTPUT_SUMMARY_DIR, f"{base_name}.summary.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(summary_text or "")
+    print(f"    + 의미 요약 저장: {path}")
+
 def _is_supported(path: str) -> bool:
     return os.path.splitext(path)[1].lower() in SUPPORTED_EXTS
 
-def process_path(img_path: str):
+def json_path_for(img_path: str) -> str:
+    # 파일명만 쓰면 images/0.jpg 같은 크롭끼리 덮어쓰므로 경로 해시를 붙임 (figure_join.output_stem)
+    return os.path.join(OUTPUT_JSON_DIR, f"{output_stem(img_path)}.json")
+
+def process_path(img_path: str, source=None):
+    # 저장된 JSON 경로를 반환 (실패/미저장 시 None)
     print(f"  - 분석: {img_path}")
-    base = os.path.splitext(os.path.basename(img_path))[0]
+    base = output_stem(img_path)
 
     raw_text_backup = ""
     raw_http_backup: dict = {}
 
     try:
         t0 = time.perf_counter()
-        meta, raw_text, raw_http, timings = infer_chart_metadata_from_image(img_path)
+        meta, raw_text, raw_http, timings = infer_chart_metadata_cascade(img_path, source=source)
         t1 = time.perf_counter()
         raw_text_backup, raw_http_backup = raw_text, raw_http
 
         gen_sec = timings.get("gen_sec", 0.0)
         struct_sec = timings.get("struct_sec", 0.0)
         retry_flag = " (kw-retry)" if timings.get("keywords_retry") else ""
+        if timings.get("json_salvaged"):
+            retry_flag += " (json-salvaged)"
+        with _RUN_STATS_LOCK:
+            RUN_STATS["images"] += 1
+            for key in ("json_parse_error", "json_salvaged", "keywords_retry", "keywords_retry_avoided"):
+                RUN_STATS[key] += int(bool(timings.get(key)))
         print(f"    + time: gen {gen_sec:.2f}s, struct {struct_sec:.2f}s, total {(t1 - t0):.2f}s{retry_flag}")
-
+        decode = timings.get("decode")
+        if decode:
+            ow, oh = decode["orig_size"]
+            dw, dh = decode["decoded_size"]
+            print(f"    + decode: {decode['decode_sec']:.2f}s  {ow}x{oh} → {dw}x{dh} (frame {decode['frame']}), "
+                  f"RSS +{decode['rss_delta_mb']:.1f}MB, "
+                  f"{'peak' if decode.get('peak_rss_scope') == 'section' else 'lifetime peak'} {decode['peak_rss_mb']:.1f}MB")
+        hf = timings.get("hf")
+        if hf:
+            accel = f", accel peak {hf['peak_accel_mb']:.0f}MB" if hf.get("peak_accel_mb") is not None else ""
+            print(f"    + hf: vision {hf['vision_tokens']} tok + text {hf['text_tokens']} tok, "
+                  f"pixel_values {hf['pixel_values_shape']}, prefill {hf['prefill_sec']:.2f}s, "
+                  f"decode {hf['decode_sec']:.2f}s ({hf['new_tokens']} tok){accel}")
+        hedge = timings.get("hedge")
+        if hedge:
+            print(f"    + hedge: {hedge['winner']} won ({hedge['target']}), hedged after {hedge['delay_sec']:.1f}s, "
+                  f"total {hedge['sec']:.2f}s")
+        cascade = timings.get("cascade")
+        if cascade and cascade["reasons"]:
+            tier2 = f"{cascade['tier2_sec']:.2f}s" + (f" (실패: {cascade['tier2_error']})" if cascade.get("tier2_error") else "")
+            print(f"    + cascade: 승격 ({', '.join(cascade['reasons'])}) tier1 {cascade['tier1_sec']:.2f}s, "
+                  f"tier2 {tier2} → {cascade['tier']} 결과 사용")
+
+        json_path = None
         if meta.is_chart or SAVE_NON_CHART_JSON:
-            _save_json(meta, os.path.join(OUTPUT_JSON_DIR, f"{base}.json"))
+            json_path = json_path_for(img_path)
+            _save_json(meta, json_path)
+        if meta.semantic_summary:
+            _save_summary_text(base, meta.semantic_summary)
         if SAVE_RAW_RESPONSE:
             _save_raw_pair(base, raw_text, raw_http)
+        return json_path
 
     except Exception as e:
         print(f"    * step1 실패: {e}")
@@ -69,13 +118,73 @@ def process_path(img_path: str):
                 raw_text_backup = f"[EXCEPTION] {repr(e)}"
             _save_raw_pair(base, raw_text_backup, raw_http_backup)
 
-def process_folder(img_dir: str):
-    print(f"[Images folder] {img_dir}  (backend={BACKEND})")
-    images = _list_images(img_dir)
-    if not images:
+def print_run_stats():
+    s = RUN_STATS
+    for report in (hf_stats_report(), hedge_stats_report(), cascade_stats_report()):
+        if report:
+            print(report)
+    if not s["images"]:
+        return
+    rate = 100.0 * s["json_salvaged"] / s["json_parse_error"] if s["json_parse_error"] else 0.0
+    print(f"[Step1 stats] images {s['images']}, json_parse_error {s['json_parse_error']}, "
+          f"salvaged {s['json_salvaged']} ({rate:.1f}%), kw-retry calls {s['keywords_retry']}, "
+          f"kw-retry avoided {s['keywords_retry_avoided']}")
+
+def _with_prefetch(items: Iterable, path_of: Callable = lambda x: x) -> Iterator:
+    # HF 백엔드: 현재 항목을 처리(generate)하는 동안 다음 HF_PREFETCH개의 입력을 미리 준비 (입력은 K개만 앞서 읽음)
+    if HF_PREFETCH <= 0 or BACKEND != "hf":
+        yield from items
+        return
+    pending = deque()
+    for item in items:
+        pending.append(item)
+        if len(pending) <= HF_PREFETCH:
+            continue
+        prefetch_hf_inputs([path_of(x) for x in pending])
+        yield pending.popleft()
+    while pending:
+        prefetch_hf_inputs([path_of(x) for x in pending])
+        yield pending.popleft()
+
+def _shard_label(shard: Optional[Shard]) -> str:
+    return f", shard {shard}" if shard else ""
+
+def process_folder(img_dir: str, shard: Optional[Shard] = None):
+    # 전체 목록을 만들지 않고 찾는 즉시 처리 (순서는 파일 시스템 순서)
+    print(f"[Images folder] {img_dir}  (backend={BACKEND}{_shard_label(shard)})")
+    n = 0
+    for img in _with_prefetch(iter_files(img_dir, SUPPORTED_EXTS, shard=shard)):
+        process_path(img)
+        n += 1
+    if n == 0:
         print("이미지 파일이 없습니다. PNG/JPG/JPEG/BMP/TIF/TIFF/WEBP 지원.")
+
+def process_pdfs(pdf_dir: str, shard: Optional[Shard] = None):
+    # PDF에서 그림을 직접 추출하면서 곧바로 Step1에 투입 (출처: source_pdf/page_number/bbox), 샤드는 PDF 단위
+    from pdf_figures import iter_folder_figures
+    print(f"[PDF folder] {pdf_dir}  (backend={BACKEND}{_shard_label(shard)})")
+    n = 0
+    figures = iter_folder_figures(pdf_dir, OUTPUT_FIGURE_DIR, PDF_OCR_DIR if os.path.isdir(PDF_OCR_DIR) else None,
+                                  shard=shard, min_side=PDF_FIGURE_MIN_SIDE, region_dpi=PDF_FIGURE_DPI)
+    for fig in _with_prefetch(figures, lambda f: f.image_path):
+        print(f"  [{fig.kind}] {os.path.basename(fig.source.source_pdf)} p.{fig.source.page_number}")
+        process_path(fig.image_path, source=fig.source)
+        n += 1
+    if n == 0:
+        print("PDF에서 추출된 그림이 없습니다.")
+
+def process_queue(queue_file: str, shard: Optional[Shard] = None):
+    # build_final_jsons.py --join이 남긴 "Step1 결과가 없는 그림" 목록만 처리
+    # 샤드는 폴더 모드와 같은 키: 경로가 속한 입력 루트(이미지/OCR 출력/그림 폴더) 기준 상대 경로
+    from figure_join import read_queue
+    print(f"[Step1 queue] {queue_file}  (backend={BACKEND}{_shard_label(shard)})")
+    roots = (INPUT_IMAGE_DIR, PDF_OCR_DIR, OUTPUT_FIGURE_DIR)
+    images = [p for p in read_queue(queue_file)
+              if in_shard(p, root_of(p, roots), shard) and os.path.exists(p) and _is_supported(p)]
+    if not images:
+        print("큐에 처리할 이미지가 없습니다.")
         return
-    for img in images:
+    for img in _with_prefetch(images):
         process_path(img)
 
 def process_single(img_path: str):
@@ -87,14 +196,23 @@ def process_single(img_path: str):
     process_path(img_path)
 
 def main():
+    # 나머지 설정은 환경 변수(config.py)로, 여러 노드 분할만 인자로도 지정
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shard", type=str, default=SHARD, help="i/N: 상대 경로 해시로 N대 중 i번째 몫만 처리 (기본 SHARD)")
+    shard = parse_shard(parser.parse_args().shard)
     _ensure_dirs()
     mode = os.environ.get("INPUT_MODE", "folder").lower()
     if mode == "folder":
-        process_folder(os.environ.get("INPUT_IMAGE_DIR", "./data/images"))
+        process_folder(os.environ.get("INPUT_IMAGE_DIR", "./data/images"), shard)
     elif mode == "single":
         process_single(os.environ.get("INPUT_IMAGE_PATH", "./data/sample.png"))
+    elif mode == "pdf":
+        process_pdfs(INPUT_PDF_DIR, shard)
+    elif mode == "queue":
+        process_queue(INPUT_QUEUE_FILE, shard)
     else:
-        print(f"알 수 없는 INPUT_MODE='{mode}' (folder|single 중 선택)")
+        print(f"알 수 없는 INPUT_MODE='{mode}' (folder|single|pdf|queue 중 선택)")
+    print_run_stats()
 
 if __name__ == "__main__":
     main()
@@ -1,25 +1,16 @@
-import os, json, time
-from typing import List
+import argparse, os, json, time
 from config import (
     BACKEND,
     OUTPUT_JSON_DIR, OUTPUT_RAW_DIR, OUTPUT_SUMMARY_DIR,
-    SAVE_RAW_RESPONSE
+    SAVE_RAW_RESPONSE, STEP1_WITH_SUMMARY, SHARD
 )
-from vlm_client import generate_semantic_summary
+from vlm_client import generate_semantic_summary, hedge_stats_report
+from fs_scan import iter_files, parse_shard
 
 def _ensure_dirs():
     os.makedirs(OUTPUT_SUMMARY_DIR, exist_ok=True)
     os.makedirs(OUTPUT_RAW_DIR, exist_ok=True)
 
-def _list_jsons(folder: str) -> List[str]:
-    out = []
-    if not os.path.isdir(folder):
-        return out
-    for fn in os.listdir(folder):
-        if fn.lower().endswith(".json"):
-            out.append(os.path.join(folder, fn))
-    return sorted(out)
-
 def _save_raw_pair(base_name: str, raw_text: str, raw_http_json: dict):
     raw_txt_path = os.path.join(OUTPUT_RAW_DIR, f"{base_name}.summary.raw.txt")
     raw_json_path = os.path.join(OUTPUT_RAW_DIR, f"{base_name}.summary.raw.http.json")
@@ -43,6 +34,7 @@ def _load_meta(json_path: str):
     return img, kws
 
 def process_json(json_path: str):
+    # 요약 파일명은 JSON과 같은 stem (runner.json_path_for → figure_join.output_stem 규칙)
     base = os.path.splitext(os.path.basename(json_path))[0]
     print(f"  - 요약: {json_path}")
 
@@ -68,14 +60,24 @@ def process_json(json_path: str):
         print(f"    * step2 실패: {e}")
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shard", type=str, default=SHARD, help="i/N: JSON 파일명 해시로 N대 중 i번째 몫만 처리 (기본 SHARD)")
+    shard = parse_shard(parser.parse_args().shard)
     _ensure_dirs()
-    print(f"[Summary from JSONs] {OUTPUT_JSON_DIR}  (backend={BACKEND})")
-    jsons = _list_jsons(OUTPUT_JSON_DIR)
-    if not jsons:
-        print("요약할 JSON이 없습니다. 먼저 runner.py를 실행하여 분석 결과를 생성하세요.")
-        return
-    for jp in jsons:
+    print(f"[Summary from JSONs] {OUTPUT_JSON_DIR}  (backend={BACKEND}{f', shard {shard}' if shard else ''})")
+    n = 0
+    for jp in iter_files(OUTPUT_JSON_DIR, {".json"}, recursive=False, shard=shard):
+        n += 1
+        # STEP1_WITH_SUMMARY로 이미 저장된 요약은 다시 만들지 않음
+        base = os.path.splitext(os.path.basename(jp))[0]
+        if STEP1_WITH_SUMMARY and os.path.exists(os.path.join(OUTPUT_SUMMARY_DIR, f"{base}.summary.txt")):
+            continue
         process_json(jp)
+    if n == 0:
+        print("요약할 JSON이 없습니다. 먼저 runner.py를 실행하여 분석 결과를 생성하세요.")
+    report = hedge_stats_report()
+    if report:
+        print(report)
 
 if __name__ == "__main__":
     main()
@@ -96,6 +96,7 @@ class ChartMetadata:
     confidence: float = 0.0
     source: SourceRef = field(default_factory=SourceRef)
     key_phrases: List[str] = field(default_factory=list)
+    semantic_summary: Optional[str] = None   # STEP1_WITH_SUMMARY=true일 때 Step1에서 함께 생성
 
 def to_json_dict(meta: ChartMetadata) -> Dict[str, Any]:
     def _normalize(obj):
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+의미 요약(out/summary/*.summary.txt)과 본문 청크(final/texts_final.json) 벡터 색인
+- 임베더: VECTOR_EMBEDDER로 교체 가능
+    hashing            토큰(keyword_index.tokenize) 해싱 벡터 — 모델/네트워크 없이 동작 (기본)
+    st:<모델 경로>      sentence-transformers 로컬 모델
+    <모듈>:<팩토리>     dim, name 속성과 embed(texts) -> (n, dim) 배열을 가진 객체를 돌려주는 함수
+- 저장 (out/vindex):
+    vectors.f16   float16 행렬 (np.memmap, 행 = 레코드, append 전용)
+    ids.jsonl / ids.off   행별 {id, source, ref, sha1, preview}와 줄 오프셋
+    meta.json     임베더/차원/행 수/삭제 행/IVF 정보
+    ivf_centroids.npy, ivf_assign.i32   (선택) IVF 중심과 행별 리스트 번호
+- 증분: 내용 해시가 바뀌었거나 새로 생긴 레코드만 임베딩해서 뒤에 붙이고, 이전 행은 삭제 표시
+  삭제 행이 많아지면 임베딩을 다시 하지 않고 살아 있는 행만 복사해 압축
+- 검색: 블록 단위 행렬곱으로 전체 brute-force top-k, IVF가 있으면 nprobe개 리스트만 탐색
+사용:
+    python vector_index.py build [--ivf 256]
+    python vector_index.py query "염기도가 높을수록 점도가 낮아지는 그래프" -k 10
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import math
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    OUTPUT_SUMMARY_DIR, PIPELINE_OUT_DIR,
+    OUTPUT_VECTOR_DIR, VECTOR_EMBEDDER, VECTOR_DIM, VECTOR_BATCH,
+)
+from keyword_index import tokenize
+
+INDEX_VERSION = 1
+BLOCK_ROWS = 8192                  # 검색 시 한 번에 float32로 올리는 행 수
+RAM_CACHE_MB = 1024                # float32 사본이 이보다 작으면 메모리에 올려 변환 비용 생략
+COMPACT_DELETED_RATIO = 0.25
+PREVIEW_CHARS = 160
+
+
+# =========================
+# Embedders
+# =========================
+
+class HashingEmbedder:
+    """토큰 해싱(부호 포함) + log tf + L2 정규화. 의미 유사도는 약하지만 오프라인에서 항상 동작"""
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[str, int] = {}
+            for tok in tokenize(text):
+                counts[tok] = counts.get(tok, 0) + 1
+            for tok, c in counts.items():
+                h = zlib.crc32(tok.encode("utf-8"))
+                out[row, h % self.dim] += (1.0 if h & 0x80000000 else -1.0) * (1.0 + math.log(c))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_path: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_path)
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+        self.name = f"st:{model_path}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vecs = self.model.encode(texts, batch_size=len(texts), normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vecs, dtype=np.float32)
+
+
+def load_embedder(spec: str = VECTOR_EMBEDDER):
+    if spec == "hashing":
+        return HashingEmbedder()
+    if spec.startswith("st:"):
+        return SentenceTransformerEmbedder(spec[3:])
+    module, _, factory = spec.partition(":")
+    if not factory:
+        raise ValueError(f"VECTOR_EMBEDDER 형식 오류: {spec} (hashing | st:<모델> | <모듈>:<팩토리>)")
+    return getattr(importlib.import_module(module), factory)()
+
+
+def _normalize_rows(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    return vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+
+
+# =========================
+# Records
+# =========================
+
+def _sha1_text(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def iter_summary_records(summary_dir: Path) -> Iterator[Dict[str, Any]]:
+    if not summary_dir.is_dir():
+        return
+    for path in sorted(summary_dir.glob("*.summary.txt")):
+        text = path.read_text(encoding="utf-8").strip()
+        if text:
+            stem = path.name[:-len(".summary.txt")]
+            yield {"id": f"summary:{stem}", "source": "summary", "ref": str(path), "text": text}
+
+
+def iter_chunk_records(final_dir: Path) -> Iterator[Dict[str, Any]]:
+    # jsonl 출력(build_final_jsons --format jsonl)이 있으면 스트리밍으로 읽음
+    jsonl_path, json_path = final_dir / "texts_final.jsonl", final_dir / "texts_final.json"
+    if jsonl_path.exists():
+        from build_final_jsons import iter_jsonl
+        records: Iterable[Dict[str, Any]] = iter_jsonl(jsonl_path)
+    elif json_path.exists():
+        records = json.loads(json_path.read_text(encoding="utf-8"))
+    else:
+        return
+    for rec in records:
+        text = (rec.get("text") or "").strip()
+        if text and rec.get("id"):
+            yield {"id": rec["id"], "source": "text", "ref": rec.get("filename"), "text": text}
+
+
+# =========================
+# Storage
+# =========================
+
+class VectorStore:
+    def __init__(self, index_dir: Path):
+        self.dir = Path(index_dir)
+        self.meta_path = self.dir / "meta.json"
+        self.meta: Dict[str, Any] = {}
+        if self.meta_path.exists():
+            self.meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        if self.meta.get("version") != INDEX_VERSION:
+            self.meta = {}
+
+    @property
+    def count(self) -> int:
+        return self.meta.get("count", 0)
+
+    @property
+    def dim(self) -> int:
+        return self.meta.get("dim", 0)
+
+    def reset(self, embedder_name: str, dim: int):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for name in ("vectors.f16", "ids.jsonl", "ids.off", "ivf_centroids.npy", "ivf_assign.i32"):
+            (self.dir / name).unlink(missing_ok=True)
+        self.meta = {"version": INDEX_VERSION, "embedder": embedder_name, "dim": dim, "count": 0,
+                     "deleted": [], "ivf": None}
+        self.save_meta()
+
+    def save_meta(self):
+        tmp = self.meta_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.meta_path)
+
+    def vectors(self) -> np.ndarray:
+        if not self.count:
+            return np.zeros((0, self.dim), dtype=np.float16)
+        return np.memmap(self.dir / "vectors.f16", dtype="<f2", mode="r", shape=(self.count, self.dim))
+
+    def _offsets(self) -> np.ndarray:
+        return np.fromfile(self.dir / "ids.off", dtype="<u8", count=self.count + 1)
+
+    def iter_sidecar(self) -> Iterator[Dict[str, Any]]:
+        if not self.count:
+            return
+        with open(self.dir / "ids.jsonl", "rb") as f:
+            for _, line in zip(range(self.count), f):
+                yield json.loads(line)
+
+    def sidecar(self, rows: Iterable[int]) -> List[Dict[str, Any]]:
+        offsets = self._offsets()
+        out = []
+        with open(self.dir / "ids.jsonl", "rb") as f:
+            for row in rows:
+                f.seek(int(offsets[row]))
+                out.append(json.loads(f.read(int(offsets[row + 1] - offsets[row]))))
+        return out
+
+    def append(self, vecs: np.ndarray, entries: List[Dict[str, Any]], assign: Optional[np.ndarray] = None):
+        """벡터 → 사이드카 → (IVF 배정) 순으로 쓰고 마지막에 meta.count를 올림 (중간에 끊기면 뒤쪽 쓰레기는 무시됨)"""
+        n0 = self.count
+        with open(self.dir / "vectors.f16", "r+b" if n0 else "wb") as f:
+            f.seek(n0 * self.dim * 2)
+            f.write(np.ascontiguousarray(vecs, dtype="<f2").tobytes())
+            f.truncate()
+        pos = int(np.fromfile(self.dir / "ids.off", dtype="<u8", count=1, offset=n0 * 8)[0]) if n0 else 0
+        new_off = [] if n0 else [0]
+        with open(self.dir / "ids.jsonl", "r+b" if n0 else "wb") as f:
+            f.seek(pos)
+            for e in entries:
+                line = json.dumps(e, ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                pos += len(line)
+                new_off.append(pos)
+            f.truncate()
+        with open(self.dir / "ids.off", "r+b" if n0 else "wb") as f:
+            f.seek((n0 + 1) * 8 if n0 else 0)
+            f.write(np.asarray(new_off, dtype="<u8").tobytes())
+            f.truncate()
+        if assign is not None:
+            with open(self.dir / "ivf_assign.i32", "r+b" if n0 else "wb") as f:
+                f.seek(n0 * 4)
+                f.write(np.asarray(assign, dtype="<i4").tobytes())
+                f.truncate()
+        self.meta["count"] = n0 + len(entries)
+        self.save_meta()
+
+    def ivf_centroids(self) -> Optional[np.ndarray]:
+        if not self.meta.get("ivf"):
+            return None
+        return np.load(self.dir / "ivf_centroids.npy")
+
+    def ivf_assign(self) -> np.ndarray:
+        return np.fromfile(self.dir / "ivf_assign.i32", dtype="<i4", count=self.count)
+
+
+# =========================
+# IVF
+# =========================
+
+def _assign(vecs: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmax(np.asarray(vecs, dtype=np.float32) @ centroids.T, axis=1).astype(np.int32)
+
+
+def train_ivf(store: VectorStore, nlist: int, iters: int = 10, sample: int = 65536, seed: int = 0):
+    """구면 k-means(내적)로 중심을 학습하고 전체 행을 다시 배정합니다. 임베딩은 다시 하지 않습니다."""
+    vecs = store.vectors()
+    n = vecs.shape[0]
+    nlist = max(1, min(nlist, n))
+    rng = np.random.default_rng(seed)
+    idx = np.sort(rng.choice(n, size=min(n, max(sample, nlist)), replace=False))
+    train = np.asarray(vecs[idx], dtype=np.float32)
+    centroids = train[rng.choice(train.shape[0], size=nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(train, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, train)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        sums[empty] = train[rng.choice(train.shape[0], size=int(empty.sum()))]   # 빈 리스트는 임의 점으로 재시작
+        centroids = _normalize_rows(sums)
+
+    assign = np.concatenate([_assign(vecs[s:s + BLOCK_ROWS], centroids) for s in range(0, n, BLOCK_ROWS)])
+    np.save(store.dir / "ivf_centroids.npy", centroids)
+    assign.astype("<i4").tofile(store.dir / "ivf_assign.i32")
+    store.meta["ivf"] = {"nlist": nlist, "trained_on": n}
+    store.save_meta()
+
+
+# =========================
+# Build (incremental)
+# =========================
+
+def _compact(store: VectorStore):
+    # 살아 있는 행만 새 파일로 복사 (임베딩 재계산 없음)
+    deleted = set(store.meta["deleted"])
+    live = np.asarray([r for r in range(store.count) if r not in deleted], dtype=np.int64)
+    vecs = store.vectors()
+    entries = list(store.iter_sidecar())
+    assign = store.ivf_assign() if store.meta.get("ivf") else None
+    centroids = store.ivf_centroids()
+    ivf = store.meta.get("ivf")
+
+    tmp = VectorStore(store.dir / "compact.tmp")
+    tmp.reset(store.meta["embedder"], store.dim)
+    for s in range(0, len(live), BLOCK_ROWS):
+        rows = live[s:s + BLOCK_ROWS]
+        tmp.append(np.asarray(vecs[rows]), [entries[r] for r in rows], assign[rows] if assign is not None else None)
+    del vecs
+    if centroids is not None:
+        np.save(tmp.dir / "ivf_centroids.npy", centroids)
+        tmp.meta["ivf"] = ivf
+        tmp.save_meta()
+    for name in ("vectors.f16", "ids.jsonl", "ids.off", "ivf_centroids.npy", "ivf_assign.i32"):
+        src = tmp.dir / name
+        if src.exists():
+            os.replace(src, store.dir / name)
+    os.replace(tmp.meta_path, store.meta_path)
+    tmp.dir.rmdir()
+    store.meta = json.loads(store.meta_path.read_text(encoding="utf-8"))
+
+
+def update_vector_index(summary_dir: Path = Path(OUTPUT_SUMMARY_DIR),
+                        final_dir: Path = Path(PIPELINE_OUT_DIR) / "final",
+                        index_dir: Path = Path(OUTPUT_VECTOR_DIR),
+                        embedder=None, batch: int = VECTOR_BATCH,
+                        rebuild: bool = False, ivf: int = 0) -> Dict[str, Any]:
+    """
+    요약/청크 레코드를 색인에 반영합니다. 내용 해시가 같은 레코드는 다시 임베딩하지 않습니다.
+    - ivf > 0: 갱신 후 IVF(nlist=ivf)를 다시 학습
+    반환: {"added", "deleted", "live", "compacted", "embed_sec", "sec"}
+    """
+    t0 = time.perf_counter()
+    embedder = embedder or load_embedder()
+    store = VectorStore(index_dir)
+    if rebuild or not store.meta or store.meta["embedder"] != embedder.name or store.dim != embedder.dim:
+        store.reset(embedder.name, embedder.dim)
+
+    # id → (최신 행, 내용 해시). 같은 id의 이전 행은 이미 삭제 표시됨
+    current: Dict[str, Tuple[int, str]] = {}
+    for row, e in enumerate(store.iter_sidecar()):
+        current[e["id"]] = (row, e["sha1"])
+    deleted = set(store.meta["deleted"])
+    centroids = store.ivf_centroids()
+
+    seen = set()
+    added = 0
+    embed_sec = 0.0
+    pending: List[Dict[str, Any]] = []
+
+    def flush():
+        nonlocal added, embed_sec
+        if not pending:
+            return
+        te = time.perf_counter()
+        vecs = _normalize_rows(embedder.embed([r["text"] for r in pending]))
+        embed_sec += time.perf_counter() - te
+        entries = [{"id": r["id"], "source": r["source"], "ref": r["ref"], "sha1": r["sha1"],
+                    "preview": r["text"][:PREVIEW_CHARS]} for r in pending]
+        store.append(vecs, entries, _assign(vecs, centroids) if centroids is not None else None)
+        added += len(pending)
+        pending.clear()
+
+    records = iter_chunk_records(Path(final_dir))
+    for rec in (r for src in (iter_summary_records(Path(summary_dir)), records) for r in src):
+        if rec["id"] in seen:
+            continue
+        seen.add(rec["id"])
+        rec["sha1"] = _sha1_text(rec["text"])
+        old = current.get(rec["id"])
+        if old is not None and old[1] == rec["sha1"] and old[0] not in deleted:
+            continue
+        if old is not None:
+            deleted.add(old[0])
+        pending.append(rec)
+        if len(pending) >= batch:
+            store.meta["deleted"] = sorted(deleted)
+            flush()
+    store.meta["deleted"] = sorted(deleted)
+    flush()
+
+    # 사라진 레코드(삭제된 요약/문서) 표시
+    for rid, (row, _) in current.items():
+        if rid not in seen:
+            deleted.add(row)
+    store.meta["deleted"] = sorted(deleted)
+    store.save_meta()
+
+    compacted = False
+    if store.count and len(deleted) / store.count > COMPACT_DELETED_RATIO:
+        _compact(store)
+        compacted = True
+    if ivf > 0 and store.count:
+        train_ivf(store, ivf)
+
+    return {"added": added, "deleted": len(store.meta["deleted"]), "live": store.count - len(store.meta["deleted"]),
+            "compacted": compacted, "embed_sec": embed_sec, "sec": time.perf_counter() - t0}
+
+
+# =========================
+# Search
+# =========================
+
+class VectorIndex:
+    """vectors.f16를 memmap으로 열어 블록 단위로 검색합니다. 색인이 갱신되면 새로 열어야 반영됩니다."""
+
+    def __init__(self, index_dir: Path = Path(OUTPUT_VECTOR_DIR), embedder=None):
+        self.store = VectorStore(index_dir)
+        if not self.store.meta:
+            raise FileNotFoundError(f"vector index not found: {index_dir}")
+        self.embedder = embedder or load_embedder()
+        if self.embedder.name != self.store.meta["embedder"]:
+            raise RuntimeError(f"embedder mismatch: index={self.store.meta['embedder']}, current={self.embedder.name}")
+        self.vecs = self.store.vectors()
+        if self.vecs.size * 4 <= RAM_CACHE_MB * 2**20:
+            self.vecs = np.asarray(self.vecs, dtype=np.float32)
+        self.alive = np.ones(self.store.count, dtype=bool)
+        self.alive[np.asarray(self.store.meta["deleted"], dtype=np.int64)] = False
+        self.centroids = self.store.ivf_centroids()
+        if self.centroids is not None:
+            assign = self.store.ivf_assign()
+            self.ivf_order = np.argsort(assign, kind="stable")
+            self.ivf_bounds = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(self.centroids)))])
+
+    def _topk_rows(self, q: np.ndarray, rows: Optional[np.ndarray], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        n = self.store.count if rows is None else len(rows)
+        for s in range(0, n, BLOCK_ROWS):
+            block_rows = np.arange(s, min(n, s + BLOCK_ROWS)) if rows is None else rows[s:s + BLOCK_ROWS]
+            block = self.vecs[s:s + BLOCK_ROWS] if rows is None else self.vecs[block_rows]
+            scores = np.asarray(block, dtype=np.float32) @ q
+            scores[~self.alive[block_rows]] = -np.inf
+            if len(scores) > k:
+                part = np.argpartition(-scores, k)[:k]
+                block_rows, scores = block_rows[part], scores[part]
+            best_rows = np.concatenate([best_rows, block_rows])
+            best_scores = np.concatenate([best_scores, scores])
+        order = np.lexsort((best_rows, -best_scores))[:k]
+        keep = np.isfinite(best_scores[order])
+        return best_rows[order][keep], best_scores[order][keep]
+
+    def search(self, query: str, k: int = 10, nprobe: int = 8, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        if not self.store.count:
+            return []
+        q = _normalize_rows(self.embedder.embed([query]))[0]
+        fetch = k if source is None else k * 4
+        rows = None
+        if self.centroids is not None and nprobe > 0:
+            lists = np.argsort(-(self.centroids @ q))[:nprobe]
+            rows = np.sort(np.concatenate([self.ivf_order[self.ivf_bounds[c]:self.ivf_bounds[c + 1]] for c in lists]))
+        top_rows, top_scores = self._topk_rows(q, rows, fetch)
+        results = []
+        for entry, score in zip(self.store.sidecar(top_rows), top_scores):
+            if source is not None and entry["source"] != source:
+                continue
+            results.append({**entry, "score": round(float(score), 4)})
+            if len(results) >= k:
+                break
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="요약/본문 청크 벡터 색인 생성/조회")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="summary/*.summary.txt + final/texts_final.json → 벡터 색인 (증분)")
+    p_build.add_argument("--summary_dir", type=str, default=OUTPUT_SUMMARY_DIR)
+    p_build.add_argument("--final_dir", type=str, default=str(Path(PIPELINE_OUT_DIR) / "final"))
+    p_build.add_argument("--index_dir", type=str, default=OUTPUT_VECTOR_DIR)
+    p_build.add_argument("--batch", type=int, default=VECTOR_BATCH)
+    p_build.add_argument("--ivf", type=int, default=0, help="IVF 리스트 수 (0=IVF 학습 안 함)")
+    p_build.add_argument("--rebuild", action="store_true")
+    p_query = sub.add_parser("query", help="유사 레코드 검색")
+    p_query.add_argument("text", type=str)
+    p_query.add_argument("-k", type=int, default=10)
+    p_query.add_argument("--nprobe", type=int, default=8, help="IVF가 있을 때 탐색할 리스트 수 (0=전체)")
+    p_query.add_argument("--source", type=str, default=None, choices=["summary", "text"])
+    p_query.add_argument("--index_dir", type=str, default=OUTPUT_VECTOR_DIR)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        r = update_vector_index(Path(args.summary_dir), Path(args.final_dir), Path(args.index_dir),
+                                batch=args.batch, rebuild=args.rebuild, ivf=args.ivf)
+        print(f"[vindex] +{r['added']} records (embed {r['embed_sec']:.2f}s), live {r['live']}, "
+              f"deleted {r['deleted']}{' (compacted)' if r['compacted'] else ''}  {r['sec']:.2f}s → {args.index_dir}")
+        return
+
+    t0 = time.perf_counter()
+    index = VectorIndex(Path(args.index_dir))
+    t1 = time.perf_counter()
+    results = index.search(args.text, args.k, nprobe=args.nprobe, source=args.source)
+    t2 = time.perf_counter()
+    print(f"[query] {args.text!r}  open {1000 * (t1 - t0):.1f}ms, search {1000 * (t2 - t1):.1f}ms")
+    for r in results:
+        print(f"  {r['score']:.3f}  [{r['source']}] {r['id']}  {r['preview'][:80]!r}")
+
+
+if __name__ == "__main__":
+    main()
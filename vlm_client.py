@@ -1,23 +1,45 @@
-import os, json, time, base64, requests, hashlib, re
-from typing import Tuple, Dict, Any, List
+import os, json, time, base64, requests, hashlib, re, threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager, nullcontext
+from dataclasses import replace
+from typing import Tuple, Dict, Any, List, Optional
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
 from PIL import Image, ImageFile
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
 from schemas import *
-from prompts_chart_keywords import SYSTEM_PROMPT, make_user_prompt, make_keywords_only_prompt
-from prompts_semantic_summary import SYSTEM_PROMPT_SUMMARY, make_summary_prompt
+from prompt_registry import get_variant
 from config import (
     BACKEND,
     HF_MODEL_ID, HF_DTYPE, HF_DEVICE_MAP, HF_TRUST_REMOTE_CODE, HF_MAX_NEW_TOKENS, HF_USE_FLASH_ATTN, HF_OFFLOAD_FOLDER,
+    HF_IMAGE_MAX_SIDE, HF_PROFILE_CALL, HF_PROFILE_DIR, HF_VISION_ONNX, HF_VISION_ONNX_DIR, HF_VISION_ONNX_THREADS,
+    HF_COMPILE, HF_COMPILE_BUCKETS, HF_COMPILE_MODE, HF_PREFETCH, HF_PREFETCH_WORKERS,
     OLLAMA_HOST, OLLAMA_MODEL,
     OPENROUTER_API_KEY, OPENROUTER_MODEL, OPENROUTER_BASE_URL, OPENROUTER_HTTP_REFERER, OPENROUTER_TITLE, OPENROUTER_FORCE_JSON,
-    KEYWORDS_MIN, KEYWORDS_MAX, SUMMARY_MIN_SENT, SUMMARY_MAX_SENT,
+    HEDGE_ENABLE, HEDGE_PERCENTILE, HEDGE_MAX_RATIO, HEDGE_TARGETS, HEDGE_WARMUP, HEDGE_INITIAL_SEC,
+    CASCADE_BACKEND, CASCADE_MIN_CONFIDENCE, CASCADE_MIN_KEYWORDS, CASCADE_QUALITY_FLAGS,
+    KEYWORDS_MIN, KEYWORDS_MAX, SUMMARY_MIN_SENT, SUMMARY_MAX_SENT, STEP1_WITH_SUMMARY, PROMPT_VARIANT,
     DEBUG, DEBUG_TRACE
 )
 
-USER_PROMPT = make_user_prompt(KEYWORDS_MIN, KEYWORDS_MAX)
-KEYS_ONLY_PROMPT = make_keywords_only_prompt(KEYWORDS_MIN, KEYWORDS_MAX)
+_PROMPT_SETS: Dict[str, Dict[str, str]] = {}
+
+def prompt_set(variant: Optional[str] = None) -> Dict[str, str]:
+    """변형(기본 PROMPT_VARIANT)의 Step1 프롬프트 문자열. 요약 프롬프트는 키워드마다 달라 호출 시 생성"""
+    name = variant or PROMPT_VARIANT
+    if name not in _PROMPT_SETS:
+        v = get_variant(name)
+        _PROMPT_SETS[name] = {
+            "system": v.system,
+            "user": v.make_user(KEYWORDS_MIN, KEYWORDS_MAX),
+            "combined": v.make_combined(KEYWORDS_MIN, KEYWORDS_MAX, SUMMARY_MIN_SENT, SUMMARY_MAX_SENT),
+            "keywords_only": v.make_keywords_only(KEYWORDS_MIN, KEYWORDS_MAX),
+            "summary_system": v.summary_system,
+        }
+    return _PROMPT_SETS[name]
+
+prompt_set()   # 잘못된 PROMPT_VARIANT는 시작할 때 바로 실패
 
 def _torch_dtype_from_str(s):
     if s == "auto": return None
@@ -31,12 +53,120 @@ def _file_sha1(path: str) -> str:
             h.update(chunk)
     return h.hexdigest()
 
-def _safe_open_image(path: str, max_side: int = 2048) -> Image.Image:
-    img = Image.open(path).convert("RGB")
-    w, h = img.size
-    if max(w, h) > max_side:
-        r = max_side / float(max(w, h))
-        img = img.resize((int(w*r), int(h*r)))
+def _rss_mb() -> float:
+    # 현재 RSS (Linux /proc 기준, 그 외 플랫폼은 0)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+# 구간 최대 RSS: 구간 시작 때 VmHWM을 현재 RSS로 되돌리고(/proc/self/clear_refs에 5, Linux) 끝에서 VmHWM을 읽음
+# - 겹치는 구간(prefetch 스레드의 디코드 등)이 열려 있으면 되돌리지 않음 → 그 구간의 최대값을 낮추지 않음(과대 쪽으로만 오차)
+# - 되돌릴 수 없는 플랫폼이면 프로세스 전체 최대값(ru_maxrss) → 보고서에 "lifetime"으로 표시
+PEAK_RSS_SCOPE = "section"
+_RSS_LOCK = threading.Lock()
+_RSS_OPEN = 0
+
+def _reset_peak_rss():
+    global PEAK_RSS_SCOPE
+    if PEAK_RSS_SCOPE != "section":
+        return
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        PEAK_RSS_SCOPE = "lifetime"
+
+def _peak_rss_mb() -> float:
+    if PEAK_RSS_SCOPE == "section":
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    # 프로세스 최대 RSS (ru_maxrss: Linux KB, macOS bytes)
+    try:
+        import resource, sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return 0.0
+
+@contextmanager
+def _rss_section():
+    # with 블록 안에서 _peak_rss_mb()를 읽으면 블록 시작 이후의 최대 RSS
+    global _RSS_OPEN
+    with _RSS_LOCK:
+        if _RSS_OPEN == 0:
+            _reset_peak_rss()
+        _RSS_OPEN += 1
+    try:
+        yield
+    finally:
+        with _RSS_LOCK:
+            _RSS_OPEN -= 1
+
+def _select_frame(img: Image.Image, max_side: int) -> int:
+    # 다중 프레임 TIFF: 첫 페이지 기준. 같은 비율의 축소본(피라미드 TIFF)이 있으면 max_side 이상인 것 중 가장 작은 프레임
+    n = getattr(img, "n_frames", 1)
+    if n <= 1:
+        return 0
+    sizes = []
+    for i in range(n):
+        img.seek(i)
+        sizes.append(img.size)
+    w0, h0 = sizes[0]
+    best = 0
+    for i, (w, h) in enumerate(sizes):
+        same_ratio = abs(w * h0 - h * w0) <= 0.01 * w0 * h0
+        if same_ratio and max(w, h) >= min(max_side, max(w0, h0)) and w * h < sizes[best][0] * sizes[best][1]:
+            best = i
+    img.seek(best)
+    return best
+
+def _safe_open_image(path: str, max_side: int = 2048, stats: Optional[Dict[str, Any]] = None) -> Image.Image:
+    """
+    max_side에 가까운 해상도로 바로 디코드합니다.
+    - JPEG: draft()로 DCT 단계에서 1/2~1/8 축소 디코드
+    - JPEG2000: reduce-on-load
+    - 다중 프레임 TIFF: 첫 페이지(또는 피라미드 축소본) 프레임만 디코드
+    - 남은 축소는 reduce(정수 배 박스 축소) + BILINEAR
+    stats가 주어지면 디코드 시간/RSS/크기를 기록
+    """
+    with _rss_section() if stats is not None else nullcontext():
+        t0 = time.perf_counter()
+        rss0 = _rss_mb()
+        with Image.open(path) as src:
+            orig_size = src.size
+            frame = _select_frame(src, max_side)
+            w, h = src.size
+            scale = max_side / float(max(w, h))
+            if scale < 1.0:
+                if src.format == "JPEG":
+                    src.draft("RGB", (max(1, int(w * scale)), max(1, int(h * scale))))
+                elif src.format == "JPEG2000":
+                    factor = 0
+                    while max(w, h) >> (factor + 1) >= max_side:
+                        factor += 1
+                    src.reduce = factor
+            img = src.convert("RGB")
+        decoded_size = img.size
+        if max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.BILINEAR, reducing_gap=2.0)
+        if stats is not None:
+            stats.update({
+                "decode_sec": time.perf_counter() - t0,
+                "orig_size": list(orig_size),
+                "decoded_size": list(decoded_size),
+                "final_size": list(img.size),
+                "frame": frame,
+                "rss_delta_mb": round(_rss_mb() - rss0, 1),
+                "peak_rss_mb": round(_peak_rss_mb(), 1),
+                "peak_rss_scope": PEAK_RSS_SCOPE,
+            })
     return img
 
 def _strip_code_fences(t: str) -> str:
@@ -86,6 +216,66 @@ def _extract_json_object(text: str) -> dict:
     except Exception as e:
         raise JsonParseError(f"json.loads candidate failed: {e}", text)
 
+_JSON_CLOSERS = {"{": "}", "[": "]"}
+
+def _repair_truncated_json(text: str) -> Optional[dict]:
+    """
+    max_new_tokens에 걸려 중간에 끊긴 JSON 객체를 복구합니다.
+    - 문자열/배열/객체 중첩을 한 번 스캔하며 "여기서 잘라도 완전한 값만 남는" 마지막 위치를 기록
+      (쉼표 직전, 닫는 괄호 직후, 값 문자열이 닫힌 직후, 여는 괄호 직후)
+    - 그 위치에서 자르고 열린 배열/객체를 순서대로 닫아 파싱 → 완성된 필드(축/범례/시리즈/key_phrases 등)만 남김
+    복구할 수 없으면 None
+    """
+    s = _remove_bom_and_whitespace(_strip_code_fences(text))
+    start = s.find("{")
+    if start == -1:
+        return None
+    stack: List[str] = []
+    in_str = esc = str_is_key = False
+    expect_key = False
+    safe_end, safe_stack = None, ""
+    for i in range(start, len(s)):
+        ch = s[i]
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+                if not str_is_key:
+                    safe_end, safe_stack = i + 1, "".join(stack)
+            continue
+        if ch == '"':
+            in_str = True
+            str_is_key = bool(stack) and stack[-1] == "{" and expect_key
+        elif ch in "{[":
+            stack.append(ch)
+            expect_key = ch == "{"
+            safe_end, safe_stack = i + 1, "".join(stack)
+        elif ch in "}]":
+            if not stack or _JSON_CLOSERS[stack[-1]] != ch:
+                break
+            stack.pop()
+            expect_key = False
+            safe_end, safe_stack = i + 1, "".join(stack)
+            if not stack:
+                break
+        elif ch == ",":
+            if stack:
+                safe_end, safe_stack = i, "".join(stack)
+                expect_key = stack[-1] == "{"
+        elif ch == ":":
+            expect_key = False
+    if safe_end is None:
+        return None
+    candidate = s[start:safe_end] + "".join(_JSON_CLOSERS[c] for c in reversed(safe_stack))
+    try:
+        data = json.loads(candidate)
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
 def _parse_keywords_only(raw_text: str) -> List[str]:
     s = _remove_bom_and_whitespace(_strip_code_fences(raw_text))
     if not s:
@@ -129,6 +319,11 @@ def _filter_known_fields(cls, d: dict):
     allowed = set(f.name for f in cls.__dataclass_fields__.values())
     return {k: v for k, v in (d or {}).items() if k in allowed}
 
+def _quality_flags(d) -> QualityFlags:
+    # 모델이 "false" 같은 문자열로 내도 참으로 취급하지 않도록 true/"true"만 인정 (CASCADE_QUALITY_FLAGS 승격 기준)
+    flags = _filter_known_fields(QualityFlags, d if isinstance(d, dict) else {})
+    return QualityFlags(**{k: v is True or (isinstance(v, str) and v.strip().lower() == "true") for k, v in flags.items()})
+
 # backend helpers
 def _img_to_b64(path: str) -> str:
     with open(path, "rb") as f:
@@ -143,9 +338,12 @@ def _img_b64_data_url(path: str) -> str:
 # HF cache
 _HF_MODEL = None
 _HF_PROCESSOR = None
+_HF_COMPILE_READY = False
+_HF_STATIC_CACHES: Dict[int, Any] = {}
+HF_COMPILE_STATS: Dict[str, Any] = {}
 
 def _ensure_hf_loaded():
-    global _HF_MODEL, _HF_PROCESSOR
+    global _HF_MODEL, _HF_PROCESSOR, _HF_COMPILE_READY
     if _HF_MODEL is not None:
         return
     from transformers import AutoConfig, AutoProcessor
@@ -171,26 +369,401 @@ def _ensure_hf_loaded():
 
     _HF_MODEL = Qwen2_5_VLForConditionalGeneration.from_pretrained(HF_MODEL_ID, **common_kwargs)
     _HF_PROCESSOR = AutoProcessor.from_pretrained(HF_MODEL_ID, trust_remote_code=HF_TRUST_REMOTE_CODE)
+    if HF_VISION_ONNX:
+        from onnx_vision import attach_onnx_vision
+        attach_onnx_vision(_HF_MODEL, HF_VISION_ONNX_DIR, threads=HF_VISION_ONNX_THREADS)
+    if HF_COMPILE:
+        _HF_COMPILE_READY = _setup_hf_compile()
+        if _HF_COMPILE_READY:
+            _warmup_hf_compile()
+
+def _compile_buckets() -> List[int]:
+    return sorted(int(x) for x in HF_COMPILE_BUCKETS.split(",") if x.strip())
 
-def _call_hf(image_path: str, sys_prompt: str, user_prompt: str) -> Dict[str, Any]:
+def _setup_hf_compile() -> bool:
+    # generate()는 compile_config가 있고 캐시가 정적이면 decode 단계만 torch.compile된 forward로 실행 (prefill은 eager)
     import torch
-    _ensure_hf_loaded()
-    img = _safe_open_image(image_path)
+    try:
+        from transformers import CompileConfig, StaticCache  # noqa: F401
+    except ImportError:
+        print("[HF compile] 이 transformers 버전에는 CompileConfig가 없어 동적 캐시로 실행합니다.")
+        return False
+    devices = set(str(d) for d in (getattr(_HF_MODEL, "hf_device_map", None) or {}).values())
+    if len(devices) > 1:
+        print(f"[HF compile] 모델이 여러 장치에 나뉘어 있어({sorted(devices)}) 동적 캐시로 실행합니다.")
+        return False
+    mode = HF_COMPILE_MODE or ("reduce-overhead" if torch.cuda.is_available() else "default")
+    _HF_MODEL.generation_config.compile_config = CompileConfig(fullgraph=False, dynamic=False, mode=mode)
+    HF_COMPILE_STATS.update({"mode": mode, "buckets": {}, "static_calls": 0, "dynamic_calls": 0})
+    return True
+
+def _static_cache(bucket: int):
+    # 버킷마다 한 번 할당해 재사용 (같은 모양 → 컴파일된 그래프 재사용), 호출 전 0으로 초기화
+    from transformers import StaticCache
+    cache = _HF_STATIC_CACHES.get(bucket)
+    if cache is None:
+        cache = StaticCache(config=_HF_MODEL.config, max_batch_size=1, max_cache_len=bucket,
+                            device=_HF_MODEL.device, dtype=_HF_MODEL.dtype)
+        _HF_STATIC_CACHES[bucket] = cache
+    else:
+        cache.reset()
+    return cache
+
+def _pick_bucket(needed: int) -> Optional[int]:
+    return next((b for b in _compile_buckets() if b >= needed), None)
+
+def _warmup_hf_compile():
+    # 버킷마다 짧은 generate로 decode 그래프를 미리 컴파일 → 실제 호출은 컴파일 비용 없이 시작
+    import torch
+    img = Image.new("RGB", (448, 448), "white")
+    messages = [{"role": "user", "content": [{"type": "image", "image": img}, {"type": "text", "text": "chart?"}]}]
+    text = _HF_PROCESSOR.apply_chat_template(messages, add_generation_prompt=True, tokenize=False)
+    inputs = _HF_PROCESSOR(text=[text], images=[img], return_tensors="pt").to(_HF_MODEL.device)
+    t_all = time.perf_counter()
+    for bucket in _compile_buckets():
+        if bucket < inputs.input_ids.shape[1] + 4:
+            continue
+        t0 = time.perf_counter()
+        with torch.no_grad():
+            _HF_MODEL.generate(**inputs, max_new_tokens=4, do_sample=False, past_key_values=_static_cache(bucket))
+        HF_COMPILE_STATS["buckets"][bucket] = round(time.perf_counter() - t0, 2)
+        print(f"[HF compile] warm-up bucket {bucket}: {HF_COMPILE_STATS['buckets'][bucket]:.1f}s")
+    HF_COMPILE_STATS["warmup_sec"] = round(time.perf_counter() - t_all, 2)
+
+def _onnx_vision_sec() -> Optional[float]:
+    # ONNX 비전 타워를 쓰는 경우 직전 호출의 비전 인코딩 시간 (prefill에 포함됨)
+    from onnx_vision import OnnxVisionTower, find_visual
+    owner, attr = find_visual(_HF_MODEL)
+    tower = getattr(owner, attr)
+    return round(tower.last_sec, 4) if isinstance(tower, OnnxVisionTower) and tower.last_sec is not None else None
+
+# HF 호출별 계측 기록 (hf_stats_report()로 실행 끝에 집계)
+HF_CALL_STATS: List[Dict[str, Any]] = []
+
+def _accel_reset_peak(torch):
+    if torch.cuda.is_available():
+        for i in range(torch.cuda.device_count()):
+            torch.cuda.reset_peak_memory_stats(i)
+
+def _accel_peak_mb(torch) -> Optional[float]:
+    # CUDA: 모든 GPU의 최대 할당량 합 (device_map=auto 분산 포함), MPS: 드라이버 할당량, 그 외 None
+    if torch.cuda.is_available():
+        return sum(torch.cuda.max_memory_allocated(i) for i in range(torch.cuda.device_count())) / (1024 * 1024)
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available() and hasattr(torch, "mps"):
+        try:
+            return torch.mps.driver_allocated_memory() / (1024 * 1024)
+        except Exception:
+            return None
+    return None
+
+def _first_token_timer(torch):
+    # generate()가 토큰마다 호출하는 StoppingCriteria로 첫 토큰 시각 기록 → prefill / decode 시간 분리
+    from transformers import StoppingCriteria
+
+    class _FirstTokenTimer(StoppingCriteria):
+        def __init__(self):
+            self.t_first = None
+
+        def __call__(self, input_ids, scores, **kwargs):
+            if self.t_first is None:
+                if torch.cuda.is_available():
+                    torch.cuda.synchronize()
+                self.t_first = time.perf_counter()
+            return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+    return _FirstTokenTimer()
+
+def _vision_token_count(inputs) -> int:
+    image_token_id = getattr(_HF_MODEL.config, "image_token_id", None)
+    if image_token_id is not None:
+        return int((inputs["input_ids"] == image_token_id).sum())
+    grid = inputs.get("image_grid_thw")
+    if grid is None:
+        return 0
+    merge = getattr(getattr(_HF_PROCESSOR, "image_processor", None), "merge_size", 2)
+    return int(grid.prod(-1).sum()) // (merge * merge)
+
+def _hf_profiler(torch, call_idx: int):
+    if HF_PROFILE_CALL <= 0 or call_idx != HF_PROFILE_CALL:
+        return None
+    from torch.profiler import profile, ProfilerActivity
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    return profile(activities=activities, record_shapes=True, profile_memory=True)
+
+def _dump_profile(prof, torch, call_idx: int, image_path: str):
+    os.makedirs(HF_PROFILE_DIR, exist_ok=True)
+    base = os.path.splitext(os.path.basename(image_path))[0]
+    trace_path = os.path.join(HF_PROFILE_DIR, f"hf_call{call_idx:04d}_{base}.trace.json")
+    prof.export_chrome_trace(trace_path)
+    sort_by = "cuda_time_total" if torch.cuda.is_available() else "cpu_time_total"
+    print(prof.key_averages().table(sort_by=sort_by, row_limit=15))
+    print(f"    + profiler trace 저장: {trace_path}")
+
+# HF 입력 prefetch (HF_PREFETCH): (이미지, 프롬프트) → 준비 중/완료된 Future, 최대 HF_PREFETCH + 1개(현재 + 다음 K장)
+_HF_PREFETCH: "OrderedDict[Tuple[str, str, str], Future]" = OrderedDict()
+_HF_PREFETCH_LOCK = threading.Lock()
+_HF_PREFETCH_POOL: Optional[ThreadPoolExecutor] = None
+# processor(토크나이저)는 스레드 안전하지 않음 → prefetch 스레드와 메인 스레드 batch_decode가 함께 쓰지 않도록 직렬화
+_HF_PROCESSOR_LOCK = threading.Lock()
+# 가속기 유휴 시간 = 이전 generate 종료 → 다음 generate 시작 (전처리/저장/prefetch 대기 포함)
+HF_IDLE_STATS: Dict[str, Any] = {"last_end": None, "idle_sec": 0.0, "busy_sec": 0.0,
+                                 "prefetch_hit": 0, "prefetch_miss": 0, "prefetch_wait_sec": 0.0}
+
+def _prepare_hf_inputs(image_path: str, sys_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    # 디코드/리사이즈 + 채팅 템플릿 + processor 텐서화 (CPU). CUDA면 pinned memory로 옮겨 non_blocking 복사
+    # 디코드/리사이즈와 pin_memory는 락 밖에서 병렬로, processor 호출만 _HF_PROCESSOR_LOCK으로 직렬화
+    import torch
+    decode_stats: Dict[str, Any] = {}
+    img = _safe_open_image(image_path, max_side=HF_IMAGE_MAX_SIDE, stats=decode_stats)
     messages = [
         {"role": "system", "content": [{"type": "text", "text": sys_prompt}]},
         {"role": "user", "content": [{"type": "image", "image": img}, {"type": "text", "text": user_prompt}]},
     ]
-    text = _HF_PROCESSOR.apply_chat_template(messages, add_generation_prompt=True, tokenize=False)
-    inputs = _HF_PROCESSOR(text=[text], images=[img], return_tensors="pt").to(_HF_MODEL.device)
-    with torch.no_grad():
-        out = _HF_MODEL.generate(**inputs, max_new_tokens=HF_MAX_NEW_TOKENS, do_sample=False)
-    out_text = _HF_PROCESSOR.batch_decode(out[:, inputs.input_ids.shape[1]:], skip_special_tokens=True)[0].strip()
-    return {"backend": "hf", "model": HF_MODEL_ID, "message": {"content": out_text}}
+    t0 = time.perf_counter()
+    with _HF_PROCESSOR_LOCK:
+        text = _HF_PROCESSOR.apply_chat_template(messages, add_generation_prompt=True, tokenize=False)
+        inputs = _HF_PROCESSOR(text=[text], images=[img], return_tensors="pt")
+    pinned = _HF_MODEL.device.type == "cuda"
+    if pinned:
+        for k, v in inputs.items():
+            if isinstance(v, torch.Tensor):
+                inputs[k] = v.pin_memory()
+    return {"img": img, "decode_stats": decode_stats, "inputs": inputs, "pinned": pinned,
+            "preprocess_sec": time.perf_counter() - t0}
 
-def _call_ollama(image_path: str, sys_prompt: str, user_prompt: str) -> Dict[str, Any]:
-    url = f"{OLLAMA_HOST.rstrip('/')}/api/chat"
+def prefetch_hf_inputs(image_paths: List[str], with_summary: bool = STEP1_WITH_SUMMARY, variant: Optional[str] = None):
+    """
+    다음에 처리할 이미지들의 Step1(HF) 입력 준비를 예약 (HF_PREFETCH=0 또는 HF 백엔드가 아니면 무시)
+    - 이미 예약된 이미지는 건너뛰고, 대기열이 HF_PREFETCH + 1을 넘으면 가장 오래된 예약을 버림
+    """
+    global _HF_PREFETCH_POOL
+    if HF_PREFETCH <= 0 or BACKEND != "hf":
+        return
+    _ensure_hf_loaded()
+    prompts = prompt_set(variant)
+    user_prompt = prompts["combined"] if with_summary else prompts["user"]
+    with _HF_PREFETCH_LOCK:
+        if _HF_PREFETCH_POOL is None:
+            _HF_PREFETCH_POOL = ThreadPoolExecutor(max_workers=max(1, HF_PREFETCH_WORKERS), thread_name_prefix="hf-prefetch")
+        for path in image_paths:
+            key = (path, prompts["system"], user_prompt)
+            if key in _HF_PREFETCH:
+                continue
+            while len(_HF_PREFETCH) >= HF_PREFETCH + 1:
+                _, old = _HF_PREFETCH.popitem(last=False)
+                old.cancel()
+            _HF_PREFETCH[key] = _HF_PREFETCH_POOL.submit(_prepare_hf_inputs, *key)
+
+def _take_prefetched(image_path: str, sys_prompt: str, user_prompt: str) -> Optional[Dict[str, Any]]:
+    with _HF_PREFETCH_LOCK:
+        fut = _HF_PREFETCH.pop((image_path, sys_prompt, user_prompt), None)
+    if fut is None or fut.cancelled():
+        return None
+    t0 = time.perf_counter()
+    prep = fut.result()
+    prep["wait_sec"] = time.perf_counter() - t0
+    return prep
+
+def _call_hf(image_path: str, sys_prompt: str, user_prompt: str, prefetch: bool = False) -> Dict[str, Any]:
+    # prefetch=True: prefetch_hf_inputs가 예약하는 1차 Step1 호출만 hit/miss 집계 (키워드 재호출/요약/캐스케이드 제외)
+    import torch
+    _ensure_hf_loaded()
+    with _rss_section():
+        call_idx = len(HF_CALL_STATS) + 1
+        prep, prefetched = None, None
+        if prefetch and HF_PREFETCH > 0:
+            prep = _take_prefetched(image_path, sys_prompt, user_prompt)
+            prefetched = "hit" if prep is not None else "miss"
+            HF_IDLE_STATS[f"prefetch_{prefetched}"] += 1
+        if prep is None:
+            prep = _prepare_hf_inputs(image_path, sys_prompt, user_prompt)
+        HF_IDLE_STATS["prefetch_wait_sec"] += prep.get("wait_sec", 0.0)
+        img, decode_stats = prep["img"], prep["decode_stats"]
+        t0 = time.perf_counter()
+        inputs = prep["inputs"].to(_HF_MODEL.device, non_blocking=prep["pinned"])
+        t1 = time.perf_counter()
+
+        prompt_len = inputs.input_ids.shape[1]
+        gen_kwargs: Dict[str, Any] = {}
+        kv_cache = "dynamic"
+        if _HF_COMPILE_READY:
+            bucket = _pick_bucket(prompt_len + HF_MAX_NEW_TOKENS)
+            if bucket is not None:
+                gen_kwargs["past_key_values"] = _static_cache(bucket)
+                kv_cache = f"static-{bucket}"
+            HF_COMPILE_STATS["static_calls" if bucket is not None else "dynamic_calls"] += 1
+
+        timer = _first_token_timer(torch)
+        prof = _hf_profiler(torch, call_idx)
+        _accel_reset_peak(torch)
+        t2 = time.perf_counter()
+        idle = t2 - HF_IDLE_STATS["last_end"] if HF_IDLE_STATS["last_end"] is not None else None
+        with torch.no_grad(), (prof if prof is not None else nullcontext()):
+            out = _HF_MODEL.generate(**inputs, max_new_tokens=HF_MAX_NEW_TOKENS, do_sample=False,
+                                     stopping_criteria=[timer], **gen_kwargs)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        t3 = time.perf_counter()
+        HF_IDLE_STATS["last_end"] = t3
+        HF_IDLE_STATS["busy_sec"] += t3 - t2
+        HF_IDLE_STATS["idle_sec"] += idle or 0.0
+        if prof is not None:
+            _dump_profile(prof, torch, call_idx, image_path)
+
+        with _HF_PROCESSOR_LOCK:
+            out_text = _HF_PROCESSOR.batch_decode(out[:, prompt_len:], skip_special_tokens=True)[0].strip()
+
+        vision_tokens = _vision_token_count(inputs)
+        new_tokens = int(out.shape[1] - prompt_len)
+        t_first = timer.t_first or t3
+        accel_peak = _accel_peak_mb(torch)
+        pixel_values = inputs.get("pixel_values")
+        hf_stats = {
+            "call": call_idx,
+            "image_size": list(img.size),
+            "pixel_values_shape": list(pixel_values.shape) if pixel_values is not None else None,
+            "vision_tokens": vision_tokens,
+            "text_tokens": int(prompt_len - vision_tokens),
+            "new_tokens": new_tokens,
+            "preprocess_sec": round(prep["preprocess_sec"] + (t1 - t0), 4),
+            "accel_idle_sec": round(idle, 4) if idle is not None else None,
+            "prefetch": prefetched,
+            "prefill_sec": round(t_first - t2, 4),
+            "decode_sec": round(t3 - t_first, 4),
+            "vision_onnx_sec": _onnx_vision_sec() if HF_VISION_ONNX else None,
+            "kv_cache": kv_cache,
+            "decode_tok_s": round((new_tokens - 1) / (t3 - t_first), 2) if new_tokens > 1 and t3 > t_first else None,
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "peak_rss_scope": PEAK_RSS_SCOPE,
+            "peak_accel_mb": round(accel_peak, 1) if accel_peak is not None else None,
+        }
+    HF_CALL_STATS.append(hf_stats)
+    return {"backend": "hf", "model": HF_MODEL_ID, "message": {"content": out_text},
+            "image_decode": decode_stats, "hf_stats": hf_stats}
+
+def _pct(vals: List[float], q: float) -> float:
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(round(q * (len(vals) - 1))))]
+
+def hf_stats_report() -> str:
+    """HF 호출 계측 집계 (호출이 없으면 빈 문자열). 긴 변 구간별 표로 HF_IMAGE_MAX_SIDE/배치 크기 선택 근거 제공"""
+    rows = HF_CALL_STATS
+    if not rows:
+        return ""
+    lines = [f"[HF stats] calls {len(rows)}  (HF_IMAGE_MAX_SIDE={HF_IMAGE_MAX_SIDE}, HF_MAX_NEW_TOKENS={HF_MAX_NEW_TOKENS})",
+             f"   {'metric':<16}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}"]
+    for key in ("vision_tokens", "text_tokens", "new_tokens", "preprocess_sec", "accel_idle_sec", "prefill_sec",
+                "vision_onnx_sec", "decode_sec", "decode_tok_s", "peak_rss_mb", "peak_accel_mb"):
+        vals = [float(r[key]) for r in rows if r.get(key) is not None]
+        if not vals:
+            continue
+        if key == "peak_rss_mb" and PEAK_RSS_SCOPE != "section":
+            key = "lifetime_rss_mb"   # 구간 최대값을 잴 수 없어 프로세스 전체 최대값
+        lines.append(f"   {key:<16}{sum(vals) / len(vals):>10.2f}{_pct(vals, 0.5):>10.2f}"
+                     f"{_pct(vals, 0.95):>10.2f}{max(vals):>10.2f}")
+
+    buckets: Dict[int, List[Dict[str, Any]]] = {}
+    for r in rows:
+        long_side = max(r["image_size"])
+        edge = 512
+        while edge < long_side:
+            edge *= 2
+        buckets.setdefault(edge, []).append(r)
+    lines.append(f"   {'long side ≤':<12}{'calls':>7}{'vis tok':>10}{'prefill s':>11}{'decode s':>10}{'accel MB':>10}")
+    for edge in sorted(buckets):
+        b = buckets[edge]
+        accel = [r["peak_accel_mb"] for r in b if r.get("peak_accel_mb") is not None]
+        lines.append(f"   {edge:<12}{len(b):>7}{sum(r['vision_tokens'] for r in b) / len(b):>10.0f}"
+                     f"{sum(r['prefill_sec'] for r in b) / len(b):>11.2f}{sum(r['decode_sec'] for r in b) / len(b):>10.2f}"
+                     f"{(max(accel) if accel else float('nan')):>10.0f}")
+
+    idle = HF_IDLE_STATS
+    if idle["busy_sec"] > 0:
+        share = 100.0 * idle["idle_sec"] / (idle["idle_sec"] + idle["busy_sec"])
+        pf = (f", prefetch hit {idle['prefetch_hit']} / miss {idle['prefetch_miss']}, wait {idle['prefetch_wait_sec']:.2f}s"
+              if HF_PREFETCH > 0 else "  (HF_PREFETCH=0)")
+        lines.append(f"   accelerator idle {idle['idle_sec']:.2f}s ({share:.1f}% of wall time since first generate)"
+                     f", generate {idle['busy_sec']:.2f}s{pf}")
+
+    if HF_COMPILE_STATS:
+        c = HF_COMPILE_STATS
+        lines.append(f"   compiled decode ({c['mode']}): warm-up {c.get('warmup_sec', 0):.1f}s, "
+                     f"static {c['static_calls']} / dynamic {c['dynamic_calls']} call(s)  (buckets {HF_COMPILE_BUCKETS})")
+        by_cache: Dict[str, List[float]] = {}
+        for r in rows:
+            if r.get("decode_tok_s") is not None:
+                by_cache.setdefault(r.get("kv_cache", "dynamic"), []).append(r["decode_tok_s"])
+        for label in sorted(by_cache):
+            vals = by_cache[label]
+            lines.append(f"   {label:<16}calls {len(vals):>5}  decode tok/s mean {sum(vals) / len(vals):.2f}")
+    return "\n".join(lines)
+
+def _response_text(raw: Dict[str, Any], backend: str) -> str:
+    # hf 응답은 ollama와 같은 {"message": {"content"}} 모양
+    if backend == "openrouter":
+        return (raw.get("choices") or [{}])[0].get("message", {}).get("content", "") or ""
+    return (raw.get("message") or {}).get("content", "") or (raw.get("response") or "")
+
+class HedgeCancelled(Exception):
+    """헤지에서 진 쪽 스트리밍 요청을 중단했을 때"""
+
+def _ollama_stream(r, cancel: threading.Event) -> Dict[str, Any]:
+    # NDJSON 조각을 모아 stream=False 응답과 같은 모양으로 (마지막 조각의 prompt_eval_count 등 유지)
+    parts, last = [], {}
+    for line in r.iter_lines():
+        if cancel.is_set():
+            raise HedgeCancelled()
+        if not line:
+            continue
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise RuntimeError(f"ollama: {chunk['error']}")
+        parts.append((chunk.get("message") or {}).get("content") or "")
+        last = chunk
+    last["message"] = {"role": "assistant", "content": "".join(parts)}
+    return last
+
+def _openrouter_stream(r, cancel: threading.Event) -> Dict[str, Any]:
+    # SSE(data: ...) 조각을 모아 chat/completions 응답 모양으로. 대기 중 keep-alive 주석 줄마다 중단 여부 확인
+    parts, last, usage = [], {}, None
+    for line in r.iter_lines(decode_unicode=True):
+        if cancel.is_set():
+            raise HedgeCancelled()
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        if chunk.get("error"):
+            raise RuntimeError(f"openrouter: {chunk['error']}")
+        for choice in chunk.get("choices") or []:
+            parts.append((choice.get("delta") or {}).get("content") or "")
+        usage = chunk.get("usage") or usage
+        last = chunk
+    return {"id": last.get("id"), "model": last.get("model"), "usage": usage,
+            "choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]}
+
+def _post(url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]], cancel: Optional[threading.Event],
+          read_stream) -> Dict[str, Any]:
+    # cancel이 있으면 스트리밍으로 받아 조각마다 중단 여부 확인 → 진 쪽 연결을 닫아 스레드/서버 자원 반환
+    if cancel is None:
+        r = requests.post(url, json=payload, headers=headers, timeout=300)
+        r.raise_for_status()
+        return r.json()
+    with requests.post(url, json=dict(payload, stream=True), headers=headers, timeout=300, stream=True) as r:
+        r.raise_for_status()
+        return read_stream(r, cancel)
+
+def _call_ollama(image_path: str, sys_prompt: str, user_prompt: str,
+                 host: str = OLLAMA_HOST, model: str = OLLAMA_MODEL,
+                 cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    url = f"{host.rstrip('/')}/api/chat"
     payload = {
-        "model": OLLAMA_MODEL,
+        "model": model,
         "stream": False,
         "messages": [
             {"role": "system", "content": sys_prompt},
@@ -198,11 +771,10 @@ def _call_ollama(image_path: str, sys_prompt: str, user_prompt: str) -> Dict[str
         ],
         "options": {"temperature": 0}
     }
-    r = requests.post(url, json=payload, timeout=300)
-    r.raise_for_status()
-    return r.json()
+    return _post(url, payload, None, cancel, _ollama_stream)
 
-def _call_openrouter(image_path: str, sys_prompt: str, user_prompt: str, force_json=False) -> Dict[str, Any]:
+def _call_openrouter(image_path: str, sys_prompt: str, user_prompt: str, force_json=False,
+                     model: str = OPENROUTER_MODEL, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
     if not OPENROUTER_API_KEY:
         raise RuntimeError("OPENROUTER_API_KEY not set")
     headers = {
@@ -216,7 +788,7 @@ def _call_openrouter(image_path: str, sys_prompt: str, user_prompt: str, force_j
         {"type": "image_url", "image_url": {"url": _img_b64_data_url(image_path)}},
     ]
     payload = {
-        "model": OPENROUTER_MODEL,
+        "model": model,
         "temperature": 0,
         "messages": [
             {"role": "system", "content": sys_prompt},
@@ -225,52 +797,247 @@ def _call_openrouter(image_path: str, sys_prompt: str, user_prompt: str, force_j
     }
     if force_json:
         payload["response_format"] = {"type": "json_object"}
-    r = requests.post(f"{OPENROUTER_BASE_URL.rstrip('/')}/chat/completions", json=payload, headers=headers, timeout=300)
-    r.raise_for_status()
-    return r.json()
-
-def _primary_call_json(image_path: str) -> Dict[str, Any]:
-    if BACKEND == "ollama":
-        return _call_ollama(image_path, SYSTEM_PROMPT, USER_PROMPT)
-    elif BACKEND == "openrouter":
-        return _call_openrouter(image_path, SYSTEM_PROMPT, USER_PROMPT, force_json=OPENROUTER_FORCE_JSON)
+    return _post(f"{OPENROUTER_BASE_URL.rstrip('/')}/chat/completions", payload, headers, cancel, _openrouter_stream)
+
+# =========================
+# Hedged requests (ollama/openrouter)
+# =========================
+HEDGE_WINDOW = 200          # 분위수 계산에 쓰는 최근 1차 요청 수 (호출 종류별)
+HEDGE_REPORT_WINDOW = 10000 # 실행 끝 지연 분위수 보고에 남기는 최근 호출 수 (장시간 실행에서 메모리 고정)
+HEDGE_POOL_WORKERS = 32     # 진 쪽 요청은 다음 스트리밍 조각(또는 keep-alive)을 받을 때 중단되므로 그때까지는 스레드를 잡음
+
+_HEDGE_LOCK = threading.Lock()
+_HEDGE_POOL: Optional[ThreadPoolExecutor] = None
+_HEDGE_LAT: Dict[str, deque] = {}
+_HEDGE_RR = 0
+# calls: 전체 호출 / hedged: 복제 요청 수 (누적)
+# entries: 최근 HEDGE_REPORT_WINDOW건의 실제 지연(observed)과 1차 요청만 썼을 때의 지연(unhedged)
+HEDGE_STATS: Dict[str, Any] = {"calls": 0, "hedged": 0, "hedge_wins": 0, "skipped_budget": 0,
+                               "entries": deque(maxlen=HEDGE_REPORT_WINDOW)}
+
+def _parse_hedge_targets(spec: str) -> List[Tuple[str, Optional[str]]]:
+    targets = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        backend, _, value = item.partition("@")
+        backend = backend.strip().lower()
+        if backend not in ("ollama", "openrouter"):
+            raise ValueError(f"HEDGE_TARGETS: unsupported backend {backend!r} (ollama | openrouter)")
+        targets.append((backend, value.strip() or None))
+    return targets
+
+HEDGE_TARGET_LIST = _parse_hedge_targets(HEDGE_TARGETS)
+
+def _call_remote_backend(backend: str, target: Optional[str], image_path: str, sys_prompt: str, user_prompt: str,
+                         force_json: bool, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    # target: ollama면 host, openrouter면 model (None이면 config 값)
+    if backend == "ollama":
+        return _call_ollama(image_path, sys_prompt, user_prompt, host=target or OLLAMA_HOST, cancel=cancel)
+    return _call_openrouter(image_path, sys_prompt, user_prompt, force_json=force_json,
+                            model=target or OPENROUTER_MODEL, cancel=cancel)
+
+def _hedge_pool() -> ThreadPoolExecutor:
+    global _HEDGE_POOL
+    with _HEDGE_LOCK:
+        if _HEDGE_POOL is None:
+            _HEDGE_POOL = ThreadPoolExecutor(max_workers=HEDGE_POOL_WORKERS, thread_name_prefix="hedge")
+        return _HEDGE_POOL
+
+def _hedge_delay(kind: str) -> float:
+    lat = _HEDGE_LAT.get(kind)
+    if lat is None or len(lat) < HEDGE_WARMUP:
+        return HEDGE_INITIAL_SEC
+    return _pct(list(lat), HEDGE_PERCENTILE)
+
+def _take_hedge_budget() -> bool:
+    with _HEDGE_LOCK:
+        if HEDGE_STATS["hedged"] + 1 > HEDGE_MAX_RATIO * HEDGE_STATS["calls"]:
+            HEDGE_STATS["skipped_budget"] += 1
+            return False
+        HEDGE_STATS["hedged"] += 1
+        return True
+
+def _next_hedge_target(backend: str) -> Tuple[str, Optional[str]]:
+    # HEDGE_TARGETS가 비어 있으면 같은 백엔드/엔드포인트로 복제
+    global _HEDGE_RR
+    if not HEDGE_TARGET_LIST:
+        return backend, None
+    with _HEDGE_LOCK:
+        target = HEDGE_TARGET_LIST[_HEDGE_RR % len(HEDGE_TARGET_LIST)]
+        _HEDGE_RR += 1
+    return target
+
+def _as_backend_shape(raw: Dict[str, Any], src: str, dst: str) -> Dict[str, Any]:
+    # 다른 백엔드가 이긴 경우 호출부가 dst 기준으로 파싱할 수 있게 응답 모양을 맞춤
+    if src == dst:
+        return raw
+    text = _response_text(raw, src)
+    if dst == "openrouter":
+        return {"choices": [{"message": {"role": "assistant", "content": text}}], "hedge_raw": raw}
+    return {"message": {"role": "assistant", "content": text}, "hedge_raw": raw}
+
+def _hedged_call(kind: str, backend: str, image_path: str, sys_prompt: str, user_prompt: str,
+                 force_json: bool) -> Dict[str, Any]:
+    """
+    1차 요청이 최근 지연의 HEDGE_PERCENTILE 분위수 안에 끝나지 않으면 HEDGE_TARGETS로 복제 요청을 보내고
+    먼저 도착한 유효(내용이 비지 않은) 응답을 사용합니다. 복제 요청 비율은 HEDGE_MAX_RATIO로 제한합니다.
+    두 요청 모두 스트리밍으로 받으며, 이긴 쪽이 정해지면 진 쪽은 다음 조각에서 연결을 닫고 스레드를 돌려줍니다.
+    """
+    pool = _hedge_pool()
+    t0 = time.perf_counter()
+    kind = f"{backend}:{kind}"
+    entry = {"kind": kind, "t0": t0, "observed": None, "unhedged": None, "hedged": False}
+    with _HEDGE_LOCK:
+        HEDGE_STATS["calls"] += 1
+        HEDGE_STATS["entries"].append(entry)
+        delay = _hedge_delay(kind)
+
+    def _primary_done(_):
+        sec = time.perf_counter() - t0
+        entry["unhedged"] = sec
+        with _HEDGE_LOCK:
+            _HEDGE_LAT.setdefault(kind, deque(maxlen=HEDGE_WINDOW)).append(sec)
+
+    cancels = {"primary": threading.Event(), "hedge": threading.Event()}
+    primary = pool.submit(_call_remote_backend, backend, None, image_path, sys_prompt, user_prompt, force_json,
+                          cancels["primary"])
+    primary.add_done_callback(_primary_done)
+    done, _ = wait([primary], timeout=delay)
+    if done or not _take_hedge_budget():
+        raw = primary.result()
+        entry["observed"] = time.perf_counter() - t0
+        return raw
+
+    entry["hedged"] = True
+    hedge_backend, target = _next_hedge_target(backend)
+    hedge = pool.submit(_call_remote_backend, hedge_backend, target, image_path, sys_prompt, user_prompt, force_json,
+                        cancels["hedge"])
+    roles = {primary: ("primary", backend), hedge: ("hedge", hedge_backend)}
+    fallback, error = None, None
+    for fut in as_completed(roles):
+        role, src = roles[fut]
+        try:
+            raw = fut.result()
+        except Exception as e:
+            error = error or e
+            continue
+        if not _response_text(raw, src).strip():
+            fallback = fallback or (raw if src == backend else None)
+            continue
+        for other, (other_role, _) in roles.items():
+            if other is not fut:
+                cancels[other_role].set()
+                other.cancel()
+        entry["observed"] = time.perf_counter() - t0
+        if role == "hedge":
+            with _HEDGE_LOCK:
+                HEDGE_STATS["hedge_wins"] += 1
+        raw = _as_backend_shape(raw, src, backend)
+        raw["hedge"] = {"winner": role, "target": f"{hedge_backend}@{target}" if target else hedge_backend,
+                        "delay_sec": round(delay, 3), "sec": round(entry["observed"], 3)}
+        return raw
+    entry["observed"] = time.perf_counter() - t0
+    if fallback is not None:
+        return fallback
+    raise error
+
+def _remote_call(kind: str, backend: str, image_path: str, sys_prompt: str, user_prompt: str,
+                 force_json: bool = False) -> Dict[str, Any]:
+    if HEDGE_ENABLE:
+        return _hedged_call(kind, backend, image_path, sys_prompt, user_prompt, force_json)
+    return _call_remote_backend(backend, None, image_path, sys_prompt, user_prompt, force_json)
+
+def hedge_stats_report() -> str:
+    """
+    헤지 집계 (헤지를 켜지 않았으면 빈 문자열). 호출/복제 수는 누적, 지연 분위수는 최근 HEDGE_REPORT_WINDOW건 기준.
+    unhedged는 1차 요청만 기다렸을 때의 지연(미완료는 경과 시간)
+    """
+    s = HEDGE_STATS
+    if not s["calls"]:
+        return ""
+    now = time.perf_counter()
+    with _HEDGE_LOCK:
+        recent = list(s["entries"])
+    entries = [e for e in recent if e["observed"] is not None]
+    if not entries:
+        return ""
+    pending = sum(1 for e in entries if e["unhedged"] is None)
+    observed = [e["observed"] for e in entries]
+    unhedged = [e["unhedged"] if e["unhedged"] is not None else now - e["t0"] for e in entries]
+    win_rate = 100.0 * s["hedge_wins"] / s["hedged"] if s["hedged"] else 0.0
+    lines = [f"[Hedge] calls {s['calls']}, hedged {s['hedged']} ({100.0 * s['hedged'] / s['calls']:.1f}%, "
+             f"budget {100.0 * HEDGE_MAX_RATIO:.1f}%), hedge wins {s['hedge_wins']} ({win_rate:.1f}%), "
+             f"skipped by budget {s['skipped_budget']}",
+             f"   {'latency s':<12}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+    for name, vals in (("hedged", observed), ("unhedged", unhedged)):
+        lines.append(f"   {name:<12}{_pct(vals, 0.5):>9.2f}{_pct(vals, 0.95):>9.2f}{_pct(vals, 0.99):>9.2f}{max(vals):>9.2f}")
+    p99_h, p99_u = _pct(observed, 0.99), _pct(unhedged, 0.99)
+    cut = 100.0 * (p99_u - p99_h) / p99_u if p99_u > 0 else 0.0
+    lines.append(f"   p99 {p99_u:.2f}s → {p99_h:.2f}s (-{cut:.1f}%)"
+                 + (f"  (최근 {len(recent)}건)" if s["calls"] > len(recent) else "")
+                 + (f"  (1차 요청 {pending}건 미완료: 경과 시간으로 계산)" if pending else ""))
+    return "\n".join(lines)
+
+def _primary_call_json(image_path: str, with_summary: bool = False, backend: str = BACKEND,
+                       variant: Optional[str] = None) -> Dict[str, Any]:
+    prompts = prompt_set(variant)
+    user_prompt = prompts["combined"] if with_summary else prompts["user"]
+    if backend in ("ollama", "openrouter"):
+        return _remote_call("primary", backend, image_path, prompts["system"], user_prompt,
+                            force_json=backend == "openrouter" and OPENROUTER_FORCE_JSON)
     else:
-        return _call_hf(image_path, SYSTEM_PROMPT, USER_PROMPT)
+        return _call_hf(image_path, prompts["system"], user_prompt, prefetch=backend == BACKEND)
 
-def _keywords_only_call(image_path: str) -> Dict[str, Any]:
-    if BACKEND == "ollama":
-        return _call_ollama(image_path, SYSTEM_PROMPT, KEYS_ONLY_PROMPT)
-    elif BACKEND == "openrouter":
-        return _call_openrouter(image_path, SYSTEM_PROMPT, KEYS_ONLY_PROMPT, force_json=False)
+def _keywords_only_call(image_path: str, backend: str = BACKEND, variant: Optional[str] = None) -> Dict[str, Any]:
+    prompts = prompt_set(variant)
+    if backend in ("ollama", "openrouter"):
+        return _remote_call("keywords_only", backend, image_path, prompts["system"], prompts["keywords_only"])
     else:
-        return _call_hf(image_path, SYSTEM_PROMPT, KEYS_ONLY_PROMPT)
-
-def _summary_call(image_path: str, keywords: List[str]) -> Dict[str, Any]:
-    prompt = make_summary_prompt(keywords, SUMMARY_MIN_SENT, SUMMARY_MAX_SENT)
-    if BACKEND == "ollama":
-        return _call_ollama(image_path, SYSTEM_PROMPT_SUMMARY, prompt)
-    elif BACKEND == "openrouter":
-        return _call_openrouter(image_path, SYSTEM_PROMPT_SUMMARY, prompt, force_json=False)
+        return _call_hf(image_path, prompts["system"], prompts["keywords_only"])
+
+def _summary_call(image_path: str, keywords: List[str], variant: Optional[str] = None) -> Dict[str, Any]:
+    system = prompt_set(variant)["summary_system"]
+    prompt = get_variant(variant or PROMPT_VARIANT).make_summary(keywords, SUMMARY_MIN_SENT, SUMMARY_MAX_SENT)
+    if BACKEND in ("ollama", "openrouter"):
+        return _remote_call("summary", BACKEND, image_path, system, prompt)
     else:
-        return _call_hf(image_path, SYSTEM_PROMPT_SUMMARY, prompt)
+        return _call_hf(image_path, system, prompt)
+
+def prompt_tokens_used(raw: Dict[str, Any], backend: str) -> Optional[int]:
+    """응답에 기록된 실제 입력 토큰 수 (이미지 토큰 포함, 알 수 없으면 None)"""
+    if backend == "openrouter":
+        return (raw.get("usage") or {}).get("prompt_tokens")
+    if backend == "ollama":
+        return raw.get("prompt_eval_count")
+    hf = raw.get("hf_stats") or {}
+    return hf["vision_tokens"] + hf["text_tokens"] if "text_tokens" in hf else None
 
 @retry(stop=stop_after_attempt(3), wait=wait_fixed(1), retry=retry_if_exception_type((RuntimeError,)))
-def infer_chart_metadata_from_image(image_path: str) -> Tuple[ChartMetadata, str, Dict[str, Any], Dict[str, float]]:
+def infer_chart_metadata_from_image(image_path: str, source: Optional[SourceRef] = None,
+                                    with_summary: Optional[bool] = None,
+                                    backend: str = BACKEND, variant: Optional[str] = None
+                                    ) -> Tuple[ChartMetadata, str, Dict[str, Any], Dict[str, float]]:
+    # with_summary=None이면 STEP1_WITH_SUMMARY 설정을 따름 / backend: 캐스케이드에서 단계별 백엔드 지정
+    # variant: 프롬프트 변형 (None이면 PROMPT_VARIANT, compare_prompts.py A/B용)
+    if with_summary is None:
+        with_summary = STEP1_WITH_SUMMARY
     t0 = time.perf_counter()
-    raw_http = _primary_call_json(image_path)
-    if BACKEND == "ollama":
-        raw_text = (raw_http.get("message") or {}).get("content", "") or (raw_http.get("response") or "")
-    elif BACKEND == "openrouter":
-        raw_text = (raw_http.get("choices") or [{}])[0].get("message", {}).get("content", "")
-    else:
-        raw_text = (raw_http.get("message") or {}).get("content", "")
+    raw_http = _primary_call_json(image_path, with_summary, backend, variant)
+    raw_text = _response_text(raw_http, backend)
     t1 = time.perf_counter()
 
+    salvaged = False
     try:
         data = _extract_json_object(raw_text)
         parse_failed = False
     except JsonParseError:
-        parse_failed = True
+        # 잘린 출력이면 완성된 필드만 살려서 사용 (키워드 재호출은 key_phrases가 비었을 때만)
+        data = _repair_truncated_json(raw_text)
+        parse_failed = not data
+        salvaged = not parse_failed
+    if parse_failed:
         data = {
             "is_chart": False,
             "chart_type": None,
@@ -303,15 +1070,11 @@ def infer_chart_metadata_from_image(image_path: str) -> Tuple[ChartMetadata, str
         }
 
     keywords_retry = False
-    if parse_failed:
+    retry_needed = parse_failed or (salvaged and not data.get("key_phrases"))
+    if retry_needed:
         try:
-            kw_http = _keywords_only_call(image_path)
-            if BACKEND == "ollama":
-                kw_text = (kw_http.get("message") or {}).get("content", "") or (kw_http.get("response") or "")
-            elif BACKEND == "openrouter":
-                kw_text = (kw_http.get("choices") or [{}])[0].get("message", {}).get("content", "")
-            else:
-                kw_text = (kw_http.get("message") or {}).get("content", "")
+            kw_http = _keywords_only_call(image_path, backend, variant)
+            kw_text = _response_text(kw_http, backend)
             kws = _parse_keywords_only(kw_text)
             if kws:
                 data["key_phrases"] = kws
@@ -323,7 +1086,14 @@ def infer_chart_metadata_from_image(image_path: str) -> Tuple[ChartMetadata, str
 
     data.setdefault("source", {})
     data["source"]["image_path"] = image_path
-    data["source"]["image_sha1"] = _file_sha1(image_path)
+    data["source"]["image_sha1"] = (source.image_sha1 if source is not None else None) or _file_sha1(image_path)
+    # PDF에서 추출한 그림이면 source_pdf/page_number/bbox 출처를 그대로 유지
+    source_ref = SourceRef(image_path=image_path, image_sha1=data["source"]["image_sha1"])
+    if source is not None:
+        source_ref = replace(source, image_path=image_path, image_sha1=data["source"]["image_sha1"])
+
+    summary_text = data.get("semantic_summary") if with_summary else None
+    summary_text = summary_text.strip() or None if isinstance(summary_text, str) else None
 
     title_d = data.get("title") or {}
     meta = ChartMetadata(
@@ -344,21 +1114,120 @@ def infer_chart_metadata_from_image(image_path: str) -> Tuple[ChartMetadata, str
         grid_present=data.get("grid_present"),
         background_image_present=data.get("background_image_present"),
         caption_nearby=data.get("caption_nearby"),
+        quality_flags=_quality_flags(data.get("quality_flags")),
         key_phrases=list(data.get("key_phrases") or []),
         confidence=float(data.get("confidence", 0.0)),
-        source=SourceRef(image_path=image_path, image_sha1=data["source"]["image_sha1"]),
+        source=source_ref,
+        semantic_summary=summary_text,
     )
 
     t2 = time.perf_counter()
-    timings = {"gen_sec": (t1 - t0), "struct_sec": (t2 - t1), "keywords_retry": keywords_retry}
+    timings = {"gen_sec": (t1 - t0), "struct_sec": (t2 - t1), "keywords_retry": keywords_retry,
+               "json_parse_error": parse_failed or salvaged, "json_salvaged": salvaged,
+               "keywords_retry_avoided": salvaged and not retry_needed}
+    primary = raw_http.get("primary") if keywords_retry else raw_http
+    decode = primary.get("image_decode")
+    if decode:
+        timings["decode"] = decode
+    if primary.get("hf_stats"):
+        timings["hf"] = primary["hf_stats"]
+    if primary.get("hedge"):
+        timings["hedge"] = primary["hedge"]
+    timings["prompt_variant"] = variant or PROMPT_VARIANT
+    timings["prompt_tokens"] = prompt_tokens_used(primary, backend)
     return meta, raw_text, raw_http, timings
 
-def generate_semantic_summary(image_path: str, keywords: List[str]) -> tuple[str, Dict[str, Any]]:
-    raw = _summary_call(image_path, keywords or [])
-    if BACKEND == "ollama":
-        text = (raw.get("message") or {}).get("content", "") or (raw.get("response") or "")
-    elif BACKEND == "openrouter":
-        text = (raw.get("choices") or [{}])[0].get("message", {}).get("content", "")
-    else:
-        text = (raw.get("message") or {}).get("content", "")
-    return (text or "").strip(), raw
+def generate_semantic_summary(image_path: str, keywords: List[str],
+                              variant: Optional[str] = None) -> tuple[str, Dict[str, Any]]:
+    raw = _summary_call(image_path, keywords or [], variant)
+    return _response_text(raw, BACKEND).strip(), raw
+
+# =========================
+# Cascade (BACKEND → CASCADE_BACKEND)
+# =========================
+_CASCADE_LOCK = threading.Lock()
+# tiers: 백엔드별 호출 수/누적 초, reasons: 승격 사유별 건수, kept_tier1: 승격했지만 1단계 결과를 유지한 수
+CASCADE_STATS: Dict[str, Any] = {"images": 0, "escalated": 0, "kept_tier1": 0, "reasons": {}, "tiers": {}}
+
+def _escalation_reasons(meta: ChartMetadata, timings: Dict[str, Any]) -> List[str]:
+    reasons = []
+    if timings.get("json_parse_error") and not timings.get("json_salvaged"):
+        reasons.append("parse_error")
+    if (meta.confidence or 0.0) < CASCADE_MIN_CONFIDENCE:
+        reasons.append("low_confidence")
+    if meta.is_chart and len(meta.key_phrases or []) < CASCADE_MIN_KEYWORDS:
+        reasons.append("few_keywords")
+    reasons += [f"flag:{f}" for f in CASCADE_QUALITY_FLAGS if getattr(meta.quality_flags, f, False)]
+    return reasons
+
+def _record_tier(backend: str, sec: float):
+    tier = CASCADE_STATS["tiers"].setdefault(backend, {"calls": 0, "sec": 0.0})
+    tier["calls"] += 1
+    tier["sec"] += sec
+
+def infer_chart_metadata_cascade(image_path: str, source: Optional[SourceRef] = None,
+                                 with_summary: Optional[bool] = None) -> Tuple[ChartMetadata, str, Dict[str, Any], Dict[str, float]]:
+    """
+    BACKEND로 Step1을 실행하고, 파싱 실패/낮은 confidence/부족한 key_phrases/CASCADE_QUALITY_FLAGS에 걸리면
+    CASCADE_BACKEND로 다시 실행합니다. CASCADE_BACKEND가 비어 있으면 infer_chart_metadata_from_image와 같습니다.
+    """
+    if not CASCADE_BACKEND or CASCADE_BACKEND == BACKEND:
+        return infer_chart_metadata_from_image(image_path, source=source, with_summary=with_summary)
+    t0 = time.perf_counter()
+    meta, raw_text, raw_http, timings = infer_chart_metadata_from_image(image_path, source=source, with_summary=with_summary)
+    t1 = time.perf_counter()
+    reasons = _escalation_reasons(meta, timings)
+    with _CASCADE_LOCK:
+        CASCADE_STATS["images"] += 1
+        _record_tier(BACKEND, t1 - t0)
+        if reasons:
+            CASCADE_STATS["escalated"] += 1
+            for r in reasons:
+                CASCADE_STATS["reasons"][r] = CASCADE_STATS["reasons"].get(r, 0) + 1
+    cascade = {"tier": BACKEND, "reasons": reasons, "tier1_sec": round(t1 - t0, 3)}
+    if not reasons:
+        timings["cascade"] = cascade
+        return meta, raw_text, raw_http, timings
+
+    try:
+        meta2, raw_text2, raw_http2, timings2 = infer_chart_metadata_from_image(
+            image_path, source=source, with_summary=with_summary, backend=CASCADE_BACKEND)
+    except Exception as e:
+        meta2, cascade["tier2_error"] = None, repr(e)
+    t2 = time.perf_counter()
+    cascade["tier2_sec"] = round(t2 - t1, 3)
+    with _CASCADE_LOCK:
+        _record_tier(CASCADE_BACKEND, t2 - t1)
+        # 2단계가 실패했거나 1단계는 파싱됐는데 2단계만 파싱에 실패하면 1단계 결과 유지
+        keep_tier1 = meta2 is None or ("parse_error" not in reasons and "parse_error" in _escalation_reasons(meta2, timings2))
+        if keep_tier1:
+            CASCADE_STATS["kept_tier1"] += 1
+    if keep_tier1:
+        timings["cascade"] = cascade
+        return meta, raw_text, raw_http, timings
+    cascade["tier"] = CASCADE_BACKEND
+    timings2["cascade"] = cascade
+    raw_text2 = raw_text2 + f"\n\n---\n[tier1 {BACKEND}]\n" + (raw_text or "")
+    return meta2, raw_text2, {"tier1": raw_http, "tier2": raw_http2}, timings2
+
+def cascade_stats_report() -> str:
+    """캐스케이드 집계 (CASCADE_BACKEND를 쓰지 않았으면 빈 문자열). 처리량은 단계별 누적 시간 기준(순차)"""
+    s = CASCADE_STATS
+    if not s["images"]:
+        return ""
+    lines = [f"[Cascade] {BACKEND} → {CASCADE_BACKEND}  images {s['images']}, escalated {s['escalated']} "
+             f"({100.0 * s['escalated'] / s['images']:.1f}%), kept tier1 {s['kept_tier1']}"]
+    if s["reasons"]:
+        lines.append("   reasons: " + ", ".join(f"{k} {v}" for k, v in sorted(s["reasons"].items(), key=lambda kv: -kv[1])))
+    lines.append(f"   {'tier':<14}{'calls':>7}{'mean s':>9}{'img/s':>9}")
+    total = 0.0
+    for name in (BACKEND, CASCADE_BACKEND):
+        tier = s["tiers"].get(name)
+        if not tier:
+            continue
+        total += tier["sec"]
+        lines.append(f"   {name:<14}{tier['calls']:>7}{tier['sec'] / tier['calls']:>9.2f}"
+                     f"{(tier['calls'] / tier['sec'] if tier['sec'] else 0.0):>9.2f}")
+    lines.append(f"   effective     {s['images'] / total if total else 0.0:.2f} img/s "
+                 f"({total / s['images']:.2f}s/image)")
+    return "\n".join(lines)